@@ -0,0 +1,5 @@
+"""End-to-end benchmarks against local stand-ins for every external service.
+
+Run from the repository root with ``python -m benchmarks``; see
+``benchmarks/run.py`` for the options.
+"""
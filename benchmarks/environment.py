@@ -0,0 +1,198 @@
+import os
+import sys
+import copy
+import shutil
+import logging
+import tempfile
+from typing import Dict, Any, List, Optional
+
+import yaml
+
+from .fakes.imap import FakeIMAPServer, synthetic_mailbox
+from .fakes.nas import install_local_smbclient, populate_share
+from .fakes.ollama import FakeOllama
+from .fakes.social import FakeSocialAPI
+
+logger = logging.getLogger(__name__)
+
+BASE_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'config', 'config.yaml')
+
+DEFAULT_OPTIONS = {
+    'messages': 500,  # synthetic mailbox size
+    'threads': 50,  # email threads the mailbox is spread over
+    'attachment_every': 10,  # every n-th message carries an attachment
+    'imap_latency': 0.002,  # seconds per IMAP command
+    'llm_latency': 0.05,  # seconds to first token
+    'token_rate': 200.0,  # generated tokens per second (0 = unthrottled)
+    'response_tokens': 64,
+    'social_latency': 0.01,  # seconds per social API request
+    'social_posts': 500,
+    'nas_directories': 20,
+    'nas_files': 25,  # per directory
+}
+
+
+class BenchmarkEnvironment:
+    """Stand-ins for every external service and a config pointing at them.
+
+    Entering starts a fake Ollama server, an IMAP server seeded with a
+    synthetic mailbox and the mock social APIs, fills a temporary directory
+    that the local smbclient stand-in serves as the NAS, writes a
+    config.yaml with every data path inside the temporary directory and
+    points the environment at all of it. Because the ollama client reads
+    OLLAMA_HOST and the NAS integration imports smbclient when it is loaded, the
+    application must only be imported once the environment is entered.
+    """
+
+    def __init__(self, options: Optional[Dict[str, Any]] = None):
+        self.options = {**DEFAULT_OPTIONS, **(options or {})}
+        self.root: Optional[str] = None
+        self.config: Dict[str, Any] = {}
+        self.ollama: Optional[FakeOllama] = None
+        self.imap: Optional[FakeIMAPServer] = None
+        self.social: Optional[FakeSocialAPI] = None
+        self.share: Dict[str, Any] = {}
+        self.message_count = 0
+        self._saved_env: Dict[str, Optional[str]] = {}
+
+    @property
+    def nas_root(self) -> str:
+        return os.path.join(self.root, 'nas')
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.root, *parts)
+
+    def mailbox(self, count: int) -> List[bytes]:
+        """The next count synthetic messages, continuing the existing threads"""
+        messages = synthetic_mailbox(count, start=self.message_count, threads=self.options['threads'],
+                                     attachment_every=self.options['attachment_every'])
+        self.message_count += count
+        return messages
+
+    def __enter__(self) -> 'BenchmarkEnvironment':
+        if 'ollama' in sys.modules:
+            logger.warning("ollama was imported before the benchmark environment; "
+                           "it may not use the fake server")
+        self.root = tempfile.mkdtemp(prefix='assist-bench-')
+        options = self.options
+        self.ollama = FakeOllama(latency=options['llm_latency'], token_rate=options['token_rate'],
+                                 response_tokens=options['response_tokens']).start()
+        self.imap = FakeIMAPServer(latency=options['imap_latency']).start()
+        self.imap.add_messages(self.mailbox(options['messages']))
+        self.social = FakeSocialAPI(posts=options['social_posts'],
+                                    latency=options['social_latency']).start()
+        install_local_smbclient()
+        self.share = populate_share(self.nas_root, options['nas_directories'], options['nas_files'])
+        self.config = self._build_config()
+        config_path = self.path('config.yaml')
+        with open(config_path, 'w') as f:
+            yaml.safe_dump(self.config, f)
+        self._set_env(config_path)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for key, value in self._saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        for server in (self.social, self.imap, self.ollama):
+            if server:
+                server.stop()
+        if self.root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def _set_env(self, config_path: str) -> None:
+        email = self.config['integrations']['email']
+        nas = self.config['integrations']['nas']
+        # load_config prefers these over the file, so a developer's .env must not leak in
+        values = {
+            'CONFIG_PATH': config_path,
+            'OLLAMA_HOST': self.ollama.url,
+            'LLM_MODEL': self.config['llm']['model'],
+            'NAS_HOST': nas['host'],
+            'NAS_SHARE': nas['share'],
+            'NAS_MOUNT_POINT': nas['mount_point'],
+            'NAS_USERNAME': '',
+            'NAS_PASSWORD': '',
+            'EMAIL_SERVER': email['server'],
+            'EMAIL_PORT': str(email['port']),
+            'EMAIL_USERNAME': email['username'],
+            'EMAIL_PASSWORD': email['password'],
+            'EMAIL_USE_SSL': 'false',
+            # Any non-empty credentials; the mock APIs do not check them
+            'TWITTER_API_KEY': 'benchmark',
+            'TWITTER_API_SECRET': 'benchmark',
+            'TWITTER_ACCESS_TOKEN': 'benchmark',
+            'TWITTER_ACCESS_TOKEN_SECRET': 'benchmark',
+            'FACEBOOK_ACCESS_TOKEN': 'benchmark',
+            'API_WORKERS': '1',
+            'API_DEBUG': 'false',
+        }
+        for key, value in values.items():
+            self._saved_env.setdefault(key, os.environ.get(key))
+            os.environ[key] = value
+
+    def _build_config(self) -> Dict[str, Any]:
+        with open(BASE_CONFIG) as f:
+            config = copy.deepcopy(yaml.safe_load(f))
+        host, port = self.imap.address
+        email_index = self.path('data', 'email_index.db')
+
+        config['llm']['model'] = 'bench-model'
+        config['memory']['vector_db_path'] = self.path('data', 'vector_db')
+
+        agents = config['agents']
+        agents['email']['index_path'] = email_index
+        agents['document'].update({
+            'watch_directories': [os.path.join(self.nas_root, 'documents')],
+            'manifest_path': self.path('data', 'document_manifest.db'),
+        })
+        agents['document']['ocr'].update({
+            'enabled': False,
+            'cache_path': self.path('data', 'extraction_cache.db'),
+        })
+
+        integrations = config['integrations']
+        integrations['nas'].update({
+            'host': 'localhost',
+            'share': 'bench',
+            'mount_point': self.nas_root,
+            'index_path': self.path('data', 'nas_index.db'),
+            'snapshot_path': self.path('data', 'nas_snapshot.db'),
+            'sync_manifest_path': self.path('data', 'nas_sync.db'),
+        })
+        integrations['email'].update({
+            'server': host,
+            'port': port,
+            'use_ssl': False,
+            'username': 'bench',
+            'password': 'bench',
+            'attachment_dir': self.path('data', 'attachments'),
+            'index_path': email_index,
+            'folders': ['INBOX'],
+            'max_emails': self.options['messages'],
+        })
+        social = integrations['social_media']
+        social['state_path'] = self.path('data', 'social_state.db')
+        social['twitter']['base_url'] = self.social.twitter_url
+        social['facebook']['base_url'] = self.social.facebook_url
+        for platform in ('twitter', 'facebook'):
+            social[platform].update({
+                # Monitors must not race the measured requests
+                'poll_interval': 3600,
+                'min_interval': 3600,
+                # Client-side pacing to real API quotas would dominate the timings
+                'requests_per_second': 1000.0,
+                'burst': 100,
+            })
+
+        config['notifications']['path'] = self.path('data', 'notifications.db')
+        config['api']['workers'] = 1
+        config['api']['cluster'].update({
+            'lock_path': self.path('data', 'leader.lock'),
+            'bus_path': self.path('data', 'event_bus.db'),
+        })
+        config['logging']['file'] = self.path('logs', 'app.log')
+        return config
@@ -0,0 +1 @@
+"""Local stand-ins for Ollama, IMAP, the SMB share and the social APIs"""
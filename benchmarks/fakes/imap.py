@@ -0,0 +1,309 @@
+import re
+import time
+import random
+import threading
+import socketserver
+from email.message import EmailMessage
+from email.parser import BytesHeaderParser
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+
+from .ollama import WORDS
+
+FETCH_ITEM_RE = re.compile(
+    r'(BODY(?:\.PEEK)?\[(?P<section>[^\]]*)\](?:<(?P<offset>\d+)\.(?P<length>\d+)>)?|RFC822)',
+    re.IGNORECASE
+)
+QUOTED_RE = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+
+class StoredMessage:
+    __slots__ = ('uid', 'data', 'flags', 'message_id')
+
+    def __init__(self, uid: int, data: bytes, flags: Optional[Set[str]] = None):
+        self.uid = uid
+        self.data = data
+        self.flags = set(flags or ())
+        self.message_id = (BytesHeaderParser().parsebytes(data)['message-id'] or '').strip()
+
+
+class Mailbox:
+    def __init__(self, uidvalidity: int):
+        self.uidvalidity = uidvalidity
+        self.messages: List[StoredMessage] = []
+        self.next_uid = 1
+
+    def append(self, data: bytes, flags: Optional[Set[str]] = None) -> int:
+        uid = self.next_uid
+        self.next_uid += 1
+        self.messages.append(StoredMessage(uid, data, flags))
+        return uid
+
+    def select(self, uid_set: str) -> List[StoredMessage]:
+        """Messages in a UID set; ``n:*`` always includes the newest message"""
+        if not self.messages:
+            return []
+        newest = self.messages[-1].uid
+        ranges = []
+        for part in uid_set.split(','):
+            low, _, high = part.partition(':')
+            low = newest if low == '*' else int(low)
+            high = low if not high else newest if high == '*' else int(high)
+            ranges.append((min(low, high), max(low, high)))
+        return [message for message in self.messages
+                if any(low <= message.uid <= high for low, high in ranges)]
+
+    def expunge(self, messages: Optional[List[StoredMessage]] = None) -> None:
+        candidates = set(id(message) for message in messages) if messages is not None else None
+        self.messages = [message for message in self.messages
+                         if '\\Deleted' not in message.flags
+                         or (candidates is not None and id(message) not in candidates)]
+
+
+class IMAPHandler(socketserver.StreamRequestHandler):
+    """One IMAP session: just enough of RFC 3501 (plus UIDPLUS/MOVE) for the client"""
+
+    # Responses are written whole (untagged lines, then the tagged one) and
+    # sent at once, so delayed ACKs never add to the measured latency
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def setup(self) -> None:
+        super().setup()
+        self.selected: Optional[str] = None
+
+    @property
+    def fake(self) -> 'FakeIMAPServer':
+        return self.server.fake
+
+    def send(self, line: str) -> None:
+        self.wfile.write(line.encode('utf-8') + b'\r\n')
+
+    def handle(self) -> None:
+        self.send('* OK [CAPABILITY IMAP4rev1 UIDPLUS MOVE] Fake IMAP server ready')
+        self.wfile.flush()
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, _, rest = line.decode('utf-8', 'replace').rstrip('\r\n').partition(' ')
+            command, _, args = rest.partition(' ')
+            command = command.upper()
+            if command == 'UID':
+                sub, _, args = args.partition(' ')
+                command = f'UID_{sub.upper()}'
+            self.fake.round_trip()
+            handler = getattr(self, f'cmd_{command.lower()}', None)
+            if handler is None:
+                self.send(f'{tag} BAD Unknown command {command}')
+                self.wfile.flush()
+                continue
+            with self.fake.lock:
+                status = handler(args) or 'OK'
+            self.send(f'{tag} {status} {command.replace("_", " ")} completed')
+            self.wfile.flush()
+            if command == 'LOGOUT':
+                return
+
+    @property
+    def mailbox(self) -> Mailbox:
+        return self.fake.mailboxes[self.selected]
+
+    def cmd_capability(self, args: str):
+        self.send('* CAPABILITY IMAP4rev1 UIDPLUS MOVE')
+
+    def cmd_noop(self, args: str):
+        pass
+
+    def cmd_login(self, args: str):
+        pass
+
+    def cmd_logout(self, args: str):
+        self.send('* BYE Logging out')
+
+    def cmd_select(self, args: str):
+        name = args.strip().strip('"')
+        if name not in self.fake.mailboxes:
+            return 'NO [NONEXISTENT]'
+        self.selected = name
+        mailbox = self.mailbox
+        self.send('* FLAGS (\\Answered \\Flagged \\Deleted \\Seen \\Draft)')
+        self.send(f'* {len(mailbox.messages)} EXISTS')
+        self.send('* 0 RECENT')
+        self.send(f'* OK [UIDVALIDITY {mailbox.uidvalidity}] UIDs valid')
+        self.send(f'* OK [UIDNEXT {mailbox.next_uid}] Predicted next UID')
+        return 'OK [READ-WRITE]'
+
+    cmd_examine = cmd_select
+
+    def cmd_close(self, args: str):
+        if self.selected:
+            self.mailbox.expunge()
+        self.selected = None
+
+    def cmd_expunge(self, args: str):
+        self.mailbox.expunge()
+
+    def cmd_uid_search(self, args: str):
+        mailbox = self.mailbox
+        if 'HEADER' in args.upper():
+            wanted = {value.replace('\\"', '"') for value in QUOTED_RE.findall(args)}
+            matches = [message for message in mailbox.messages if message.message_id in wanted]
+        elif args.upper().startswith('UID '):
+            matches = mailbox.select(args.split()[1])
+        else:
+            # ALL; date criteria are not evaluated, every message is recent here
+            matches = mailbox.messages
+        self.send('* SEARCH' + ''.join(f' {message.uid}' for message in matches))
+
+    def cmd_uid_fetch(self, args: str):
+        uid_set, _, items = args.partition(' ')
+        match = FETCH_ITEM_RE.search(items)
+        positions = {id(message): seq for seq, message in enumerate(self.mailbox.messages, 1)}
+        for message in self.mailbox.select(uid_set):
+            attributes = f'UID {message.uid}'
+            if 'FLAGS' in items.upper():
+                attributes += f' FLAGS ({" ".join(sorted(message.flags))})'
+            if match:
+                name, data = self._section(message, match)
+                self.wfile.write(
+                    f'* {positions[id(message)]} FETCH ({attributes} {name} {{{len(data)}}}\r\n'.encode('utf-8')
+                    + data + b')\r\n'
+                )
+            else:
+                self.send(f'* {positions[id(message)]} FETCH ({attributes})')
+            if match and 'PEEK' not in match.group(0).upper():
+                message.flags.add('\\Seen')
+
+    @staticmethod
+    def _section(message: StoredMessage, match) -> tuple:
+        section = (match.group('section') or '').upper()
+        if match.group(0).upper() == 'RFC822':
+            return 'RFC822', message.data
+        if section.startswith('HEADER.FIELDS'):
+            return (f'BODY[{match.group("section")}]',
+                    f'Message-ID: {message.message_id}\r\n\r\n'.encode('utf-8'))
+        if match.group('offset') is not None:
+            offset, length = int(match.group('offset')), int(match.group('length'))
+            return f'BODY[]<{offset}>', message.data[offset:offset + length]
+        return 'BODY[]', message.data
+
+    def cmd_uid_store(self, args: str):
+        uid_set, operation, flags = args.split(' ', 2)
+        flags = set(flags.strip('()').split())
+        for message in self.mailbox.select(uid_set):
+            if operation.upper().startswith('+'):
+                message.flags |= flags
+            elif operation.upper().startswith('-'):
+                message.flags -= flags
+            else:
+                message.flags = set(flags)
+
+    def cmd_uid_copy(self, args: str):
+        uid_set, _, target = args.partition(' ')
+        destination = self.fake.mailbox(target.strip().strip('"'))
+        for message in self.mailbox.select(uid_set):
+            destination.append(message.data, message.flags)
+
+    def cmd_uid_move(self, args: str):
+        uid_set = args.partition(' ')[0]
+        self.cmd_uid_copy(args)
+        moved = self.mailbox.select(uid_set)
+        for message in moved:
+            message.flags.add('\\Deleted')
+        self.mailbox.expunge(moved)
+
+    def cmd_uid_expunge(self, args: str):
+        self.mailbox.expunge(self.mailbox.select(args.strip()))
+
+
+class FakeIMAPServer:
+    """Plain-text IMAP server holding mailboxes in memory.
+
+    Every command waits ``latency`` seconds before it is answered, which
+    stands in for the network round trip to a real server; ``round_trips``
+    counts commands so benchmarks can report them per synced message.
+    """
+
+    def __init__(self, latency: float = 0.0, uidvalidity: int = 1,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.latency = latency
+        self.uidvalidity = uidvalidity
+        self.lock = threading.Lock()
+        self.mailboxes: Dict[str, Mailbox] = {}
+        self.round_trips = 0
+        self._server = socketserver.ThreadingTCPServer((host, port), IMAPHandler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread: Optional[threading.Thread] = None
+        self.mailbox('INBOX')
+
+    @property
+    def address(self) -> tuple:
+        return self._server.server_address[:2]
+
+    def mailbox(self, name: str) -> Mailbox:
+        if name not in self.mailboxes:
+            self.mailboxes[name] = Mailbox(self.uidvalidity)
+        return self.mailboxes[name]
+
+    def add_messages(self, messages: List[bytes], mailbox: str = 'INBOX') -> None:
+        with self.lock:
+            target = self.mailbox(mailbox)
+            for data in messages:
+                target.append(data)
+
+    def round_trip(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.round_trips += 1
+
+    def start(self) -> 'FakeIMAPServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        name='FakeIMAPServer')
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+
+def synthetic_mailbox(count: int,
+                      start: int = 0,
+                      threads: int = 50,
+                      body_words: int = 200,
+                      attachment_every: int = 0,
+                      attachment_size: int = 64 * 1024,
+                      seed: int = 0) -> List[bytes]:
+    """RFC 5322 messages ``start`` to ``start + count``, grouped into threads.
+
+    Message ``i`` belongs to thread ``i % threads`` and replies to the
+    previous message of that thread, so thread indexing has real work.
+    Every ``attachment_every``-th message carries a binary attachment.
+    """
+    generator = random.Random(seed + start)
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    messages = []
+    for i in range(start, start + count):
+        thread = i % threads
+        message = EmailMessage()
+        message['From'] = f'sender{thread % 7}@example.com'
+        message['To'] = 'bench@example.com'
+        message['Subject'] = ('Re: ' if i >= threads else '') + f'Topic {thread}: {generator.choice(WORDS)}'
+        message['Date'] = format_datetime(base + timedelta(minutes=i))
+        message['Message-ID'] = f'<{i}.bench@example.com>'
+        if i >= threads:
+            parents = [f'<{j}.bench@example.com>' for j in range(thread, i, threads)]
+            message['In-Reply-To'] = parents[-1]
+            message['References'] = ' '.join(parents[-10:])
+        message.set_content(' '.join(generator.choice(WORDS) for _ in range(body_words)))
+        if attachment_every and i % attachment_every == 0:
+            message.add_attachment(generator.randbytes(attachment_size), maintype='application',
+                                   subtype='octet-stream', filename=f'attachment-{i}.bin')
+        messages.append(message.as_bytes())
+    return messages
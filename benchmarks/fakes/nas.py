@@ -0,0 +1,87 @@
+import os
+import sys
+import types
+import random
+import shutil
+from typing import Dict, Any
+
+from .ollama import WORDS
+
+
+def _noop(*args, **kwargs) -> None:
+    return None
+
+
+def _open_file(path: str, mode: str = 'r', buffering: int = -1, encoding=None,
+               errors=None, newline=None, **kwargs):
+    # smbclient-only keyword arguments (share_access, ...) have no local meaning
+    return open(path, mode, buffering, encoding, errors, newline)
+
+
+def local_smbclient() -> types.ModuleType:
+    """An ``smbclient`` module whose calls act on local paths.
+
+    The integrations address the share through paths under the mount
+    point, so pointing ``mount_point`` at a temporary directory and
+    installing this module makes that directory the NAS.
+    """
+    module = types.ModuleType('smbclient')
+    module.__doc__ = 'Local filesystem stand-in for smbclient (benchmarks only)'
+    module.ClientConfig = _noop
+    module.register_session = _noop
+    module.reset_connection_cache = _noop
+    module.delete_session = _noop
+    module.mount = _noop
+    module.unmount = _noop
+    module.open_file = _open_file
+    module.scandir = os.scandir
+    module.listdir = os.listdir
+    module.stat = os.stat
+    module.remove = os.remove
+    module.unlink = os.unlink
+    module.rmdir = os.rmdir
+    module.rename = os.rename
+    module.replace = os.replace
+    module.copyfile = shutil.copyfile
+    module.makedirs = lambda path, exist_ok=False, **kwargs: os.makedirs(path, exist_ok=exist_ok)
+    module.mkdir = lambda path, **kwargs: os.mkdir(path)
+    module.path = types.SimpleNamespace(exists=os.path.exists, isdir=os.path.isdir,
+                                        isfile=os.path.isfile, getsize=os.path.getsize)
+    return module
+
+
+def install_local_smbclient() -> None:
+    """Route every smbclient import in this process to the local stand-in.
+
+    Must run before the integrations are imported. smbprotocol's exception
+    module is only provided when smbprotocol itself is not installed.
+    """
+    sys.modules['smbclient'] = local_smbclient()
+    try:
+        import smbprotocol.exceptions  # noqa: F401
+    except ImportError:
+        exceptions = types.ModuleType('smbprotocol.exceptions')
+        exceptions.SMBConnectionClosed = type('SMBConnectionClosed', (ConnectionError,), {})
+        package = types.ModuleType('smbprotocol')
+        package.exceptions = exceptions
+        sys.modules['smbprotocol'] = package
+        sys.modules['smbprotocol.exceptions'] = exceptions
+
+
+def populate_share(root: str,
+                   directories: int = 20,
+                   files_per_directory: int = 50,
+                   file_words: int = 400,
+                   seed: int = 0) -> Dict[str, Any]:
+    """Fill a directory with a ``documents/<dir>/<file>.txt`` tree of text files"""
+    generator = random.Random(seed)
+    total_bytes = 0
+    for d in range(directories):
+        directory = os.path.join(root, 'documents', f'folder-{d:03d}')
+        os.makedirs(directory, exist_ok=True)
+        for f in range(files_per_directory):
+            text = ' '.join(generator.choice(WORDS) for _ in range(file_words))
+            with open(os.path.join(directory, f'note-{f:04d}.txt'), 'w') as handle:
+                handle.write(text)
+            total_bytes += len(text)
+    return {'directories': directories, 'files': directories * files_per_directory, 'bytes': total_bytes}
@@ -0,0 +1,126 @@
+import json
+import time
+import random
+import hashlib
+from datetime import datetime, timezone
+from typing import Iterable, List
+
+from .http import FakeHTTPServer, JSONHandler
+
+WORDS = (
+    "the meeting notes invoice project deadline review draft report budget "
+    "schedule update contract photo backup summary question answer follow "
+    "team client quarter plan release issue fix design travel receipt"
+).split()
+
+
+class OllamaHandler(JSONHandler):
+    def do_GET(self) -> None:
+        self.fake.count_request()
+        if self.route == '/api/tags':
+            self.send_json({'models': [self.fake.model_entry(name) for name in self.fake.models]})
+        elif self.route == '/api/version':
+            self.send_json({'version': '0.0.0-fake'})
+        else:
+            self.send_json({'error': 'not found'}, status=404)
+
+    def do_HEAD(self) -> None:
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self) -> None:
+        self.fake.count_request()
+        request = self.read_json()
+        if self.route == '/api/chat':
+            self.generate(request, lambda text, done: {
+                'message': {'role': 'assistant', 'content': text}
+            })
+        elif self.route == '/api/generate':
+            self.generate(request, lambda text, done: {'response': text})
+        elif self.route == '/api/embeddings':
+            self.send_json({'embedding': self.fake.embedding(request.get('prompt', ''))})
+        elif self.route == '/api/embed':
+            inputs = request.get('input', '')
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self.send_json({'model': request.get('model'),
+                            'embeddings': [self.fake.embedding(text) for text in inputs]})
+        elif self.route == '/api/pull':
+            self.fake.models.append(request.get('model') or request.get('name'))
+            self.send_json({'status': 'success'})
+        elif self.route == '/api/show':
+            self.send_json({'modelfile': '', 'parameters': '', 'template': '', 'details': {}})
+        else:
+            self.send_json({'error': 'not found'}, status=404)
+
+    def generate(self, request, payload) -> None:
+        fake = self.fake
+        model = request.get('model')
+        started = time.perf_counter()
+
+        def chunk(text: str, done: bool) -> dict:
+            message = {'model': model, 'created_at': datetime.now(timezone.utc).isoformat(),
+                       **payload(text, done), 'done': done}
+            if done:
+                message.update(done_reason='stop', eval_count=fake.response_tokens,
+                               total_duration=int((time.perf_counter() - started) * 1e9))
+            return message
+
+        time.sleep(fake.latency)
+        if request.get('stream', True):
+            self.start_chunked('application/x-ndjson')
+            for token in fake.tokens():
+                fake.pace()
+                self.send_chunk(json.dumps(chunk(token, False)).encode('utf-8') + b'\n')
+            self.send_chunk(json.dumps(chunk('', True)).encode('utf-8') + b'\n')
+            self.send_chunk(b'')
+        else:
+            text = ''
+            for token in fake.tokens():
+                fake.pace()
+                text += token
+            self.send_json(chunk(text, True))
+
+
+class FakeOllama(FakeHTTPServer):
+    """Ollama API stand-in with configurable latency and generation speed.
+
+    ``latency`` is the delay before the first token (prompt evaluation),
+    after which ``response_tokens`` tokens are produced at ``token_rate``
+    tokens per second (0 for as fast as possible). Embeddings are
+    deterministic pseudo-random vectors derived from the text.
+    """
+
+    handler = OllamaHandler
+
+    def __init__(self,
+                 models: Iterable[str] = ('bench-model',),
+                 latency: float = 0.05,
+                 token_rate: float = 100.0,
+                 response_tokens: int = 64,
+                 embedding_dim: int = 384,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.models: List[str] = list(models)
+        self.latency = latency
+        self.token_rate = token_rate
+        self.response_tokens = response_tokens
+        self.embedding_dim = embedding_dim
+        self._random = random.Random(0)
+
+    @staticmethod
+    def model_entry(name: str) -> dict:
+        # Older clients read 'name', newer ones 'model'
+        return {'name': name, 'model': name, 'modified_at': '2024-01-01T00:00:00Z',
+                'size': 0, 'digest': hashlib.sha256(name.encode()).hexdigest(), 'details': {}}
+
+    def tokens(self) -> List[str]:
+        return [' ' + self._random.choice(WORDS) for _ in range(self.response_tokens)]
+
+    def pace(self) -> None:
+        if self.token_rate:
+            time.sleep(1 / self.token_rate)
+
+    def embedding(self, text: str) -> List[float]:
+        generator = random.Random(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest())
+        return [generator.uniform(-1, 1) for _ in range(self.embedding_dim)]
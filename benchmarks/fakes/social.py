@@ -0,0 +1,126 @@
+import time
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+from urllib.parse import parse_qs
+
+from .http import FakeHTTPServer, JSONHandler
+from .ollama import WORDS
+
+TWITTER_PREFIX = '/1.1'
+FACEBOOK_PREFIX = '/v3.1'
+
+
+class SocialHandler(JSONHandler):
+    def do_GET(self) -> None:
+        self.dispatch()
+
+    def do_POST(self) -> None:
+        self.dispatch()
+
+    def dispatch(self) -> None:
+        fake = self.fake
+        fake.count_request()
+        time.sleep(fake.latency)
+        body = self.read_body()
+        route = (self.command, self.route)
+        if route == ('GET', f'{TWITTER_PREFIX}/statuses/home_timeline.json'):
+            self.send_json(fake.home_timeline(self.query()), headers={
+                'x-rate-limit-remaining': str(fake.rate_limit),
+                'x-rate-limit-reset': str(int(time.time()) + 900)
+            })
+        elif route == ('POST', f'{TWITTER_PREFIX}/statuses/update.json'):
+            self.send_json(fake.add_tweet(self._form(body).get('status', '')))
+        elif route == ('GET', f'{FACEBOOK_PREFIX}/me/feed'):
+            self.send_json(fake.feed(self.query(), f"{fake.url}{FACEBOOK_PREFIX}/me/feed"))
+        elif route == ('POST', f'{FACEBOOK_PREFIX}/me/feed'):
+            self.send_json({'id': fake.add_post(self._form(body).get('message', ''))['id']})
+        else:
+            self.send_json({'error': 'not found'}, status=404)
+
+    @staticmethod
+    def _form(body: bytes) -> Dict[str, str]:
+        return {key: values[-1] for key, values in parse_qs(body.decode('utf-8')).items()}
+
+
+class FakeSocialAPI(FakeHTTPServer):
+    """Twitter v1.1 and Facebook Graph stand-ins on one local server.
+
+    Point ``twitter.base_url`` at ``url + '/1.1'`` and ``facebook.base_url``
+    at ``url + '/v3.1'``. Both start with ``posts`` synthetic posts; posts
+    made through the API are added to the same timelines. Twitter responses
+    report ``rate_limit`` requests left in a 15-minute window; the client
+    paces itself by that, so keep it high unless pacing is what is measured.
+    """
+
+    handler = SocialHandler
+
+    def __init__(self, posts: int = 500, latency: float = 0.01, rate_limit: int = 1_000_000, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self._random = random.Random(0)
+        self._posts_lock = threading.Lock()
+        self._base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.tweets: List[Dict[str, Any]] = []
+        self.posts: List[Dict[str, Any]] = []
+        for _ in range(posts):
+            self.add_tweet(self._text())
+            self.add_post(self._text())
+
+    @property
+    def twitter_url(self) -> str:
+        return self.url + TWITTER_PREFIX
+
+    @property
+    def facebook_url(self) -> str:
+        return self.url + FACEBOOK_PREFIX
+
+    def _text(self) -> str:
+        return ' '.join(self._random.choice(WORDS) for _ in range(20))
+
+    def add_tweet(self, text: str) -> Dict[str, Any]:
+        with self._posts_lock:
+            tweet_id = 1_000_000 + len(self.tweets)
+            created = self._base + timedelta(minutes=len(self.tweets))
+            tweet = {
+                'id': tweet_id, 'id_str': str(tweet_id), 'text': text, 'full_text': text,
+                'created_at': created.strftime('%a %b %d %H:%M:%S %z %Y'),
+                'user': {'screen_name': f'user{tweet_id % 17}'},
+                'retweet_count': tweet_id % 5, 'favorite_count': tweet_id % 11
+            }
+            self.tweets.append(tweet)
+            return tweet
+
+    def add_post(self, message: str) -> Dict[str, Any]:
+        with self._posts_lock:
+            created = self._base + timedelta(minutes=len(self.posts))
+            post = {
+                'id': f'100_{len(self.posts)}', 'message': message,
+                'created_time': created.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'likes': {'summary': {'total_count': len(self.posts) % 13}}
+            }
+            self.posts.append(post)
+            return post
+
+    def home_timeline(self, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        count = int(params.get('count', 20))
+        since_id = int(params.get('since_id', 0))
+        max_id = int(params.get('max_id', 1 << 62))
+        with self._posts_lock:
+            matching = [tweet for tweet in reversed(self.tweets) if since_id < tweet['id'] <= max_id]
+        return matching[:count]
+
+    def feed(self, params: Dict[str, str], url: str) -> Dict[str, Any]:
+        limit = int(params.get('limit', 25))
+        offset = int(params.get('offset', 0))
+        since = int(params.get('since', 0))
+        with self._posts_lock:
+            matching = [post for post in reversed(self.posts)
+                        if datetime.strptime(post['created_time'], '%Y-%m-%dT%H:%M:%S%z').timestamp() > since]
+        page = matching[offset:offset + limit]
+        response: Dict[str, Any] = {'data': page, 'paging': {}}
+        if offset + limit < len(matching):
+            response['paging']['next'] = f"{url}?limit={limit}&since={since}&offset={offset + limit}"
+        return response
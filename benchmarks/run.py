@@ -0,0 +1,118 @@
+"""Run the benchmark suites and record the results.
+
+    python -m benchmarks                      # every suite, default sizes
+    python -m benchmarks -s email_sync -s api --requests 500
+    python -m benchmarks --llm-latency 0.5 --token-rate 30 --label "slow model"
+
+Each run is appended to the history file and compared with the latest
+earlier run of the same parameters; metrics that moved past the
+threshold in the wrong direction are flagged (and fail the run with
+``--fail-on-regression``).
+"""
+import os
+import sys
+import asyncio
+import logging
+import argparse
+import traceback
+from typing import Dict, Any, List
+
+from .environment import BenchmarkEnvironment, DEFAULT_OPTIONS as ENVIRONMENT_OPTIONS
+from .stats import BenchmarkResult, ResultHistory, compare, skipped
+from .suites import SUITES, DEFAULT_OPTIONS as SUITE_OPTIONS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_HISTORY = os.path.join(REPO_ROOT, 'benchmarks', 'results', 'history.jsonl')
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-s', '--suite', action='append', choices=list(SUITES),
+                        help="suite to run (repeatable; default: all)")
+    for name, default in {**ENVIRONMENT_OPTIONS, **SUITE_OPTIONS}.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default,
+                            dest=name, metavar=type(default).__name__.upper(),
+                            help=f"default: {default}")
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help="results file (JSON lines)")
+    parser.add_argument('--no-save', action='store_true', help="compare only, do not record the run")
+    parser.add_argument('--label', help="free-form note stored with the run")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="relative change counted as a regression (default: 0.10)")
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help="exit with status 1 when a regression is flagged")
+    parser.add_argument('-v', '--verbose', action='store_true', help="show application logs")
+    return parser.parse_args(argv)
+
+
+async def run_suites(names: List[str], options: Dict[str, Any]) -> List[BenchmarkResult]:
+    results: List[BenchmarkResult] = []
+    with BenchmarkEnvironment({key: options[key] for key in ENVIRONMENT_OPTIONS}) as env:
+        for name in names:
+            print(f"Running {name}...", file=sys.stderr, flush=True)
+            try:
+                results.extend(await SUITES[name](env, options))
+            except Exception as e:
+                # One broken suite still leaves the others' numbers
+                traceback.print_exc()
+                results.append(skipped(name, f"failed: {type(e).__name__}: {e}"))
+    return results
+
+
+def _format(value, digits: int = 1) -> str:
+    return '-' if value is None else f"{value:.{digits}f}"
+
+
+def print_results(results: List[BenchmarkResult]) -> None:
+    header = f"{'benchmark':<32} {'count':>7} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} " \
+             f"{'errors':>6} {'rss MB':>8} {'ΔMB':>7}"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        if result.skipped:
+            print(f"{result.name:<32} skipped ({result.skipped})")
+            continue
+        print(f"{result.name:<32} {result.count:>7} {_format(result.throughput):>10} "
+              f"{_format(result.p50_ms, 2):>9} {_format(result.p99_ms, 2):>9} {result.errors:>6} "
+              f"{_format(result.rss_mb):>8} {_format(result.rss_delta_mb):>7}")
+
+
+def print_comparison(previous: Dict[str, Any], changes) -> int:
+    print(f"\nCompared with {previous['timestamp']} ({previous.get('commit') or 'unknown commit'}"
+          f"{', ' + previous['label'] if previous.get('label') else ''}):")
+    regressions = 0
+    for name, metric, old, new, change, worse in changes:
+        if worse:
+            regressions += 1
+        marker = 'REGRESSION' if worse else ''
+        print(f"  {name:<32} {metric:<13} {old:>10.2f} -> {new:>10.2f} {change:>+8.1%} {marker}")
+    print(f"{regressions} regression(s)")
+    return regressions
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR,
+                        format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    # The application is imported as the src package from the repository root
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+    names = args.suite or list(SUITES)
+    options = {key: getattr(args, key) for key in {**ENVIRONMENT_OPTIONS, **SUITE_OPTIONS}}
+    results = asyncio.run(run_suites(names, options))
+    print_results(results)
+
+    history = ResultHistory(args.history)
+    params = {'suites': sorted(names), **{key: value for key, value in options.items() if key != 'timeout'}}
+    run = history.record(params, results, label=args.label)
+    previous = history.latest(run['profile'])
+    regressions = 0
+    if previous:
+        regressions = print_comparison(previous, compare(previous, run, args.threshold))
+    else:
+        print("\nNo earlier run with these parameters to compare against.")
+    if not args.no_save:
+        history.append(run)
+        print(f"Recorded in {os.path.relpath(args.history)} (profile {run['profile']})")
+    return 1 if regressions and args.fail_on_regression else 0
@@ -0,0 +1,70 @@
+"""Cold start of the API in a fresh interpreter, for the startup suite.
+
+    python -m benchmarks.startup_probe [--disable email --disable social_media]
+
+Run from the repository root inside a BenchmarkEnvironment (whose
+variables it inherits). Prints one JSON object: seconds until
+``src.api.main`` is imported, until the app serves requests and until
+the LLM engine and memory system are loaded, plus which heavyweight
+modules the import alone pulled in.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+
+# Client libraries whose import cost startup used to pay up front
+HEAVY_MODULES = ('chromadb', 'sentence_transformers', 'torch', 'ollama', 'httpx', 'watchdog',
+                 'src.integrations.nas_integration', 'src.integrations.email_sync',
+                 'src.integrations.social_media_integration')
+
+
+def _disable(integrations) -> None:
+    """Point CONFIG_PATH at a copy of the config with integrations disabled"""
+    import yaml
+    with open(os.environ['CONFIG_PATH']) as f:
+        config = yaml.safe_load(f)
+    for name in integrations:
+        config['integrations'][name]['enabled'] = False
+    handle, path = tempfile.mkstemp(suffix='.yaml', dir=os.path.dirname(os.environ['CONFIG_PATH']))
+    with os.fdopen(handle, 'w') as f:
+        yaml.safe_dump(config, f)
+    os.environ['CONFIG_PATH'] = path
+
+
+async def _serve(started: float, timings: dict) -> None:
+    from src.api import main as api_main
+    timings['import'] = time.perf_counter() - started
+    timings['imported_modules'] = [name for name in HEAVY_MODULES if name in sys.modules]
+    async with api_main.lifespan(api_main.app):
+        timings['serving'] = time.perf_counter() - started
+        container = api_main.app.state.container
+        await container.core_ready.wait()
+        timings['core_ready'] = time.perf_counter() - started
+        timings['core_available'] = container.rag is not None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--disable', action='append', default=[], help="integration to disable")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.CRITICAL)
+    if args.disable:
+        _disable(args.disable)
+    # The local NAS stand-in replaces smbclient; installed before the clock starts
+    from .fakes.nas import install_local_smbclient
+    install_local_smbclient()
+
+    timings = {}
+    started = time.perf_counter()
+    asyncio.run(_serve(started, timings))
+    print(json.dumps(timings))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import platform
+import resource
+import subprocess
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+# Metrics compared between runs, and whether a higher value is better
+COMPARED_METRICS = {
+    'throughput': True,
+    'p50_ms': False,
+    'p99_ms': False,
+    'rss_delta_mb': False,
+}
+# RSS deltas below this many MB are noise
+MIN_RSS_CHANGE_MB = 5.0
+
+
+def rss_mb() -> float:
+    """Current resident set size, falling back to the peak where /proc is missing"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def percentile(samples: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of unsorted samples"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    count: int = 0
+    elapsed: float = 0.0
+    throughput: float = 0.0  # operations per second of wall time
+    p50_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+    mean_ms: Optional[float] = None
+    max_ms: Optional[float] = None
+    errors: int = 0
+    rss_mb: float = 0.0
+    rss_delta_mb: float = 0.0
+    extra: Dict[str, Any] = field(default_factory=dict)
+    skipped: Optional[str] = None
+
+
+class Recorder:
+    """Latency samples and memory use for one benchmark.
+
+    The wall clock and RSS baseline start when the recorder is created;
+    ``measure`` times one operation. ``result`` summarizes everything
+    recorded so far, with throughput over wall time so concurrent
+    operations count in full.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples: List[float] = []
+        self.errors = 0
+        self._rss = rss_mb()
+        self._start = time.perf_counter()
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    @contextmanager
+    def measure(self):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.add(time.perf_counter() - start)
+
+    def result(self, count: Optional[int] = None, **extra) -> BenchmarkResult:
+        elapsed = time.perf_counter() - self._start
+        count = len(self.samples) if count is None else count
+        ms = [sample * 1000 for sample in self.samples]
+        current = rss_mb()
+        return BenchmarkResult(
+            name=self.name,
+            count=count,
+            elapsed=round(elapsed, 4),
+            throughput=round(count / elapsed, 2) if elapsed else 0.0,
+            p50_ms=_round(percentile(ms, 0.50)),
+            p99_ms=_round(percentile(ms, 0.99)),
+            mean_ms=_round(sum(ms) / len(ms)) if ms else None,
+            max_ms=_round(max(ms)) if ms else None,
+            errors=self.errors,
+            rss_mb=round(current, 1),
+            rss_delta_mb=round(current - self._rss, 1),
+            extra=extra
+        )
+
+
+def skipped(name: str, reason: str) -> BenchmarkResult:
+    return BenchmarkResult(name=name, skipped=reason)
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class ResultHistory:
+    """Benchmark runs appended to a JSON-lines file, one run per line.
+
+    Runs are grouped by a profile hashed from their parameters; a run is
+    only compared against the latest earlier run of the same profile, so
+    changing the mailbox size or latencies starts a new baseline.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def profile(params: Dict[str, Any]) -> str:
+        encoded = json.dumps(params, sort_keys=True).encode('utf-8')
+        return hashlib.blake2b(encoded, digest_size=6).hexdigest()
+
+    def runs(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def latest(self, profile: str) -> Optional[Dict[str, Any]]:
+        matching = [run for run in self.runs() if run.get('profile') == profile]
+        return matching[-1] if matching else None
+
+    def record(self, params: Dict[str, Any], results: List[BenchmarkResult],
+               label: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'label': label,
+            'profile': self.profile(params),
+            'params': params,
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count()
+            },
+            'results': {result.name: asdict(result) for result in results}
+        }
+
+    def append(self, run: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(run, sort_keys=True) + '\n')
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any],
+            threshold: float) -> List[Tuple[str, str, float, float, float, bool]]:
+    """(benchmark, metric, before, after, relative change, regressed) for shared metrics"""
+    changes = []
+    for name, result in current['results'].items():
+        before = previous['results'].get(name)
+        if not before or result.get('skipped') or before.get('skipped'):
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None or old == 0:
+                continue
+            change = (new - old) / abs(old)
+            worse = change < -threshold if higher_is_better else change > threshold
+            if metric == 'rss_delta_mb' and abs(new - old) < MIN_RSS_CHANGE_MB:
+                worse = False
+            changes.append((name, metric, old, new, change, worse))
+    return changes
@@ -0,0 +1,383 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import itertools
+from collections import Counter
+from typing import Dict, Any, List, Callable, Awaitable, Optional
+
+from .environment import BenchmarkEnvironment
+from .fakes.ollama import WORDS
+from .stats import BenchmarkResult, Recorder, skipped
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+Suite = Callable[[BenchmarkEnvironment, Dict[str, Any]], Awaitable[List[BenchmarkResult]]]
+
+# Benchmark suites by name, in the order they run
+SUITES: Dict[str, Suite] = {}
+
+DEFAULT_OPTIONS = {
+    'sync_rounds': 20,  # incremental syncs after the initial one
+    'sync_batch': 10,  # new messages delivered before each incremental sync
+    'memories': 100,  # store_memory calls
+    'chunks': 1000,  # document chunks ingested
+    'batch_size': 32,  # chunks per store_documents call
+    'queries': 100,  # retrievals of each kind
+    'tasks': 20,  # agent tasks of each kind
+    'requests': 200,  # requests per API endpoint
+    'concurrency': 10,  # concurrent API clients
+    'startup_runs': 3,  # cold starts per startup scenario
+    'timeout': 600.0,  # seconds before waiting on the system under test gives up
+}
+
+
+def suite(name: str):
+    def decorator(func: Suite) -> Suite:
+        SUITES[name] = func
+        return func
+    return decorator
+
+
+def _queries(count: int, seed: int = 1) -> List[str]:
+    generator = random.Random(seed)
+    return [' '.join(generator.choice(WORDS) for _ in range(5)) for _ in range(count)]
+
+
+def _missing(names: List[str], error: ImportError) -> List[BenchmarkResult]:
+    reason = f"missing dependency: {error.name or str(error)}"
+    return [skipped(name, reason) for name in names]
+
+
+def _unavailable(names: List[str], error: Exception) -> List[BenchmarkResult]:
+    # e.g. the embedding model cannot be downloaded
+    detail = (str(error).splitlines() or [''])[0][:120]
+    return [skipped(name, f"startup failed: {type(error).__name__}: {detail}") for name in names]
+
+
+@suite('email_sync')
+async def email_sync(env: BenchmarkEnvironment, options: Dict[str, Any]) -> List[BenchmarkResult]:
+    """Initial sync of the whole mailbox, then incremental syncs of new mail"""
+    from src.api.config import get_email_accounts
+    from src.integrations.email_integration import EmailIntegration
+    from src.integrations.email_store import EmailMetadataStore
+
+    class TimedEmailIntegration(EmailIntegration):
+        recorder: Optional[Recorder] = None
+
+        def _fetch_message(self, uid):
+            if self.recorder is None:
+                return super()._fetch_message(uid)
+            with self.recorder.measure():
+                return super()._fetch_message(uid)
+
+    # Its own index, so later suites still start from an unsynced mailbox
+    store = EmailMetadataStore(env.path('data', 'email_sync_bench.db'))
+    conn = TimedEmailIntegration(get_email_accounts(env.config)[0], store=store)
+    if not await conn.connect():
+        raise RuntimeError("Could not connect to the fake IMAP server")
+    try:
+        conn.recorder = Recorder('email_sync.initial')
+        round_trips = env.imap.round_trips
+        emails = await conn.fetch_new()
+        initial = conn.recorder.result(
+            count=len(emails),
+            round_trips_per_message=round((env.imap.round_trips - round_trips) / max(len(emails), 1), 2)
+        )
+
+        # Generated up front so message building is not timed
+        batches = [env.mailbox(options['sync_batch']) for _ in range(options['sync_rounds'])]
+        conn.recorder = None
+        incremental = Recorder('email_sync.incremental')
+        fetched = 0
+        for batch in batches:
+            env.imap.add_messages(batch)
+            with incremental.measure():
+                fetched += len(await conn.fetch_new())
+        return [initial, incremental.result(count=fetched, rounds=len(batches),
+                                            messages_per_round=options['sync_batch'])]
+    finally:
+        await conn.disconnect()
+
+
+def _document_chunks(env: BenchmarkEnvironment, count: int, size: int) -> List[Dict[str, Any]]:
+    chunks = []
+    for directory, _, files in sorted(os.walk(os.path.join(env.nas_root, 'documents'))):
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            with open(path) as f:
+                text = f.read()
+            for i in range(0, len(text), size):
+                chunks.append({'id': f'{path}:{i}', 'text': text[i:i + size],
+                               'metadata': {'path': path, 'offset': i}})
+                if len(chunks) == count:
+                    return chunks
+    return chunks
+
+
+@suite('memory')
+async def memory(env: BenchmarkEnvironment, options: Dict[str, Any]) -> List[BenchmarkResult]:
+    """Embedding, memory and document ingestion, and semantic retrieval"""
+    names = ['memory.startup', 'memory.store_memory', 'memory.ingest', 'memory.embed',
+             'memory.retrieve', 'memory.query_documents']
+    try:
+        from src.memory.memory_system import MemorySystem
+    except ImportError as e:
+        return _missing(names, e)
+
+    results = []
+    recorder = Recorder('memory.startup')
+    try:
+        with recorder.measure():
+            system = MemorySystem(env.config['memory'])
+    except Exception as e:
+        return _unavailable(names, e)
+    results.append(recorder.result())
+
+    recorder = Recorder('memory.store_memory')
+    for text in _queries(options['memories'], seed=2):
+        with recorder.measure():
+            system.store_memory(text, {'source': 'benchmark'})
+    results.append(recorder.result())
+
+    chunk_size = env.config['agents']['document'].get('chunk_size', 1000)
+    chunks = _document_chunks(env, options['chunks'], chunk_size)
+    batch_size = options['batch_size']
+    recorder = Recorder('memory.ingest')
+    for i in range(0, len(chunks), batch_size):
+        batch = chunks[i:i + batch_size]
+        with recorder.measure():
+            system.store_documents('benchmark_chunks', [chunk['id'] for chunk in batch],
+                                   [chunk['text'] for chunk in batch],
+                                   [chunk['metadata'] for chunk in batch])
+    # Throughput in chunks; latencies are per batch
+    results.append(recorder.result(count=len(chunks), batch_size=batch_size, chunk_chars=chunk_size))
+
+    queries = _queries(options['queries'])
+    recorder = Recorder('memory.embed')
+    for query in queries:
+        with recorder.measure():
+            system.embed(query)
+    results.append(recorder.result())
+
+    recorder = Recorder('memory.retrieve')
+    for query in queries:
+        with recorder.measure():
+            system.retrieve_memory(query, 8)
+    results.append(recorder.result())
+
+    recorder = Recorder('memory.query_documents')
+    for query in queries:
+        with recorder.measure():
+            system.query_documents('benchmark_chunks', query, 12)
+    results.append(recorder.result())
+    return results
+
+
+@suite('tasks')
+async def tasks(env: BenchmarkEnvironment, options: Dict[str, Any]) -> List[BenchmarkResult]:
+    """Agent tasks from enqueue to result: thread summaries and document indexing"""
+    names = ['tasks.summarize_thread', 'tasks.index_file']
+    try:
+        from src.api.config import get_email_accounts
+        from src.core.llm_engine import LLMEngine, ModelConfig
+        from src.core.agent_system import AgentSystem, Task
+        from src.memory.memory_system import MemorySystem
+        from src.integrations.email_integration import EmailIntegration
+    except ImportError as e:
+        return _missing(names, e)
+
+    # Threads to summarize come from the index the email agent reads
+    conn = EmailIntegration(get_email_accounts(env.config)[0])
+    if not await conn.connect():
+        raise RuntimeError("Could not connect to the fake IMAP server")
+    try:
+        await conn.fetch_new()
+    finally:
+        await conn.disconnect()
+
+    try:
+        llm = LLMEngine(ModelConfig(model_name=env.config['llm']['model']))
+        memory = MemorySystem(env.config['memory'])
+    except Exception as e:
+        return _unavailable(names, e)
+    completed: Dict[str, float] = {}
+    failed: Counter = Counter()
+    finished = asyncio.Event()
+    expected = 0
+
+    async def on_result(task, result) -> None:
+        completed[task.id] = time.perf_counter()
+        if not result.success:
+            failed[task.type] += 1
+        if len(completed) == expected:
+            finished.set()
+
+    system = AgentSystem(llm, memory, env.config['agents'], on_result=on_result)
+    await system.start()
+
+    count = options['tasks']
+    files = sorted(os.path.join(directory, filename)
+                   for directory, _, filenames in os.walk(os.path.join(env.nas_root, 'documents'))
+                   for filename in filenames)[:count]
+    workloads = {
+        'summarize_thread': [
+            {'action': 'summarize_thread', 'account': conn.account,
+             'message_id': f'<{thread}.bench@example.com>'}
+            for thread in range(min(count, env.options['threads']))
+        ],
+        'index_file': [{'action': 'index_file', 'file_path': path} for path in files],
+    }
+    agent_types = {'summarize_thread': 'email', 'index_file': 'document'}
+
+    results = []
+    try:
+        for kind, parameters in workloads.items():
+            recorder = Recorder(f'tasks.{kind}')
+            submitted: Dict[str, float] = {}
+            completed.clear()
+            finished.clear()
+            expected = len(parameters)
+            for i, params in enumerate(parameters):
+                task = Task(id=f'{kind}-{i}', type=agent_types[kind], parameters=params)
+                submitted[task.id] = time.perf_counter()
+                await system.task_queue.put(task)
+            await asyncio.wait_for(finished.wait(), options['timeout'])
+            for task_id, start in submitted.items():
+                recorder.add(completed[task_id] - start)
+            recorder.errors = failed.pop(agent_types[kind], 0)
+            # Latency includes time queued behind earlier tasks
+            results.append(recorder.result(queued=expected))
+    finally:
+        await system.stop()
+    return results
+
+
+async def _load(client, name: str, method: str, url: str, requests: int, concurrency: int,
+                before: Optional[Callable[[], None]] = None, **kwargs) -> BenchmarkResult:
+    """Issue requests from concurrent clients and record each one's latency"""
+    import httpx
+
+    recorder = Recorder(name)
+    issued = itertools.count()
+    statuses: Counter = Counter()
+
+    async def client_loop() -> None:
+        while next(issued) < requests:
+            if before:
+                before()
+            try:
+                with recorder.measure():
+                    response = await client.request(method, url, **kwargs)
+                    statuses[response.status_code] += 1
+                    response.raise_for_status()
+            except httpx.HTTPError:
+                pass
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return recorder.result(concurrency=concurrency, statuses=dict(statuses))
+
+
+async def _wait_for_initial_sync(container, timeout: float) -> None:
+    """Let the email scheduler's first sync finish so it does not skew the requests"""
+    if not container.email_sync:
+        return
+    pool = next(iter(container.email_sync.pools.values()))
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if container.email_sync.store.last_synced_uid(pool.name, 'INBOX'):
+            return
+        await asyncio.sleep(0.1)
+    logger.warning("Initial email sync still running; API timings include it")
+
+
+@suite('api')
+async def api(env: BenchmarkEnvironment, options: Dict[str, Any]) -> List[BenchmarkResult]:
+    """Endpoint latency through the full app, served from and past the response cache"""
+    try:
+        import httpx
+        from src.api import main as api_main
+    except ImportError as e:
+        return _missing(['api'], e)
+
+    requests, concurrency = options['requests'], options['concurrency']
+    first_file = sorted(os.listdir(os.path.join(env.nas_root, 'documents', 'folder-000')))[0]
+    # (name, service, method, url, cache endpoint, request arguments)
+    endpoints = [
+        ('nas_files', 'nas', 'GET', '/nas/files/documents/folder-000', 'nas_files', {}),
+        ('nas_file', 'nas', 'GET', f'/nas/file/documents/folder-000/{first_file}', None, {}),
+        ('email_messages', 'email_pool', 'GET', '/email/messages?limit=20', 'email_messages', {}),
+        ('twitter_timeline', 'social', 'GET', '/social/twitter/timeline', 'twitter_timeline', {}),
+        ('facebook_feed', 'social', 'GET', '/social/facebook/feed', 'facebook_feed', {}),
+        ('notifications', 'notifications', 'GET', '/notifications', None, {}),
+        ('chat', 'rag', 'POST', '/chat', None, {'json': {'message': 'summarize the project budget review'}}),
+    ]
+
+    results = []
+    app = api_main.app
+    async with api_main.lifespan(app):
+        container = app.state.container
+        await _wait_for_initial_sync(container, options['timeout'])
+        # The LLM engine and memory system load in the background
+        await asyncio.wait_for(container.core_ready.wait(), options['timeout'])
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://benchmark',
+                                     timeout=options['timeout']) as client:
+            for name, service, method, url, cache_endpoint, kwargs in endpoints:
+                if getattr(container, service) is None:
+                    results.append(skipped(f'api.{name}', f"{service} is not available"))
+                    continue
+                # Requests are few and slow with a real model behind /chat
+                count = max(requests // 10, 1) if name == 'chat' else requests
+                results.append(await _load(client, f'api.{name}', method, url, count,
+                                           concurrency, **kwargs))
+                if cache_endpoint:
+                    # Every request misses: the cost of the integration behind it
+                    results.append(await _load(
+                        client, f'api.{name}.uncached', method, url, max(requests // 4, 1), 1,
+                        before=lambda endpoint=cache_endpoint: container.response_cache.invalidate(
+                            endpoint, propagate=False),
+                        **kwargs
+                    ))
+    return results
+
+
+@suite('startup')
+async def startup(env: BenchmarkEnvironment, options: Dict[str, Any]) -> List[BenchmarkResult]:
+    """Cold start in fresh interpreters: import, serving requests, models loaded.
+
+    Runs with every integration enabled, and NAS-only with email and social
+    media disabled. The import result lists the heavyweight modules
+    imported before the app serves anything.
+    """
+    scenarios = [('startup', []), ('startup.nas_only', ['email', 'social_media'])]
+    results = []
+    for prefix, disabled in scenarios:
+        recorders = {stage: Recorder(f'{prefix}.{stage}') for stage in ('import', 'serving', 'core_ready')}
+        imported, core_available = set(), True
+        for _ in range(options['startup_runs']):
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, '-m', 'benchmarks.startup_probe',
+                *(f'--disable={name}' for name in disabled),
+                cwd=REPO_ROOT, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            stdout, stderr = await asyncio.wait_for(process.communicate(), options['timeout'])
+            if process.returncode:
+                logger.error(f"Startup probe failed: {stderr.decode(errors='replace')[-2000:]}")
+                for recorder in recorders.values():
+                    recorder.errors += 1
+                continue
+            timings = json.loads(stdout.decode().strip().splitlines()[-1])
+            for stage, recorder in recorders.items():
+                recorder.add(timings[stage])
+            imported.update(timings['imported_modules'])
+            core_available = core_available and timings['core_available']
+        results.append(recorders['import'].result(imported_modules=sorted(imported)))
+        results.append(recorders['serving'].result())
+        results.append(recorders['core_ready'].result(core_available=core_available))
+    return results
@@ -0,0 +1,155 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, AsyncIterator, Callable, Awaitable
+
+from ..core.rag_pipeline import RAGPipeline
+
+logger = logging.getLogger(__name__)
+
+
+class ChatError(Exception):
+    """A chat request that failed before its answer started streaming"""
+
+    def __init__(self, detail: str, status: int = 500):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+async def chat_messages(rag: RAGPipeline,
+                        message: str,
+                        history: List[Dict[str, str]]) -> AsyncIterator[Dict[str, Any]]:
+    """One chat answer as NDJSON messages: context, tokens, then done.
+
+    Raises ChatError before the first message if retrieval fails; errors
+    while generating are sent as an error message instead.
+    """
+    start = time.perf_counter()
+    try:
+        context = await rag.retrieve(message, rag.context_budget(message, history))
+    except Exception as e:
+        raise ChatError(str(e))
+    messages = rag.build_messages(context, history)
+    timings = dict(context.timings)
+    yield {
+        "type": "context",
+        "sources": [
+            {"index": i, "source": item.source, "score": round(item.score, 4), "metadata": item.metadata}
+            for i, item in enumerate(context.items, 1)
+        ],
+        "timings": dict(timings)
+    }
+    try:
+        async for part in rag.stream_answer(message, messages, timings):
+            yield {"type": "token", "content": part}
+    except Exception as e:
+        yield {"type": "error", "detail": str(e)}
+    timings["total"] = round((time.perf_counter() - start) * 1000, 2)
+    yield {
+        "type": "done",
+        "metadata": {
+            "timings": timings,
+            "context_tokens": context.tokens,
+            "candidates": context.candidates,
+            "duplicates": context.duplicates
+        }
+    }
+
+
+class ChatRelay:
+    """Chat requests of follower workers, answered by the leader over the event bus.
+
+    Only the leader loads the LLM and memory system, so every chat sees the
+    same memories. A follower publishes a ``chat_request`` and reads the
+    ``chat_response`` messages addressed to it; the leader runs the answer
+    as a task and stops it on ``chat_cancel`` once the client is gone.
+    """
+
+    def __init__(self, publish: Callable[[Dict[str, Any]], Awaitable[None]], timeout: float = 30.0):
+        self.publish = publish
+        self.timeout = timeout
+        self._pending: Dict[str, asyncio.Queue] = {}
+        self._answering: Dict[str, asyncio.Task] = {}
+
+    async def ask(self, message: str, history: List[Dict[str, str]]) -> AsyncIterator[Dict[str, Any]]:
+        """Relay a chat to the leader; raises ChatError if it cannot answer"""
+        request_id = uuid.uuid4().hex
+        queue: asyncio.Queue = asyncio.Queue()
+        self._pending[request_id] = queue
+        finished = False
+        try:
+            await self.publish({
+                "type": "chat_request", "request_id": request_id, "origin": os.getpid(),
+                "message": message, "history": history
+            })
+            first = True
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), self.timeout)
+                except asyncio.TimeoutError:
+                    if first:
+                        raise ChatError("No leader worker answered the chat request", 503)
+                    yield {"type": "error", "detail": "The leader worker stopped answering"}
+                    return
+                if item is None:
+                    finished = True
+                    return
+                if first and item.get("type") == "error" and "status" in item:
+                    finished = True
+                    raise ChatError(item["detail"], item["status"])
+                first = False
+                yield item
+        finally:
+            del self._pending[request_id]
+            if not finished:
+                await self.publish({"type": "chat_cancel", "request_id": request_id})
+
+    def deliver(self, event: Dict[str, Any]) -> None:
+        """Hand a leader's response to the waiting request of this worker"""
+        queue = self._pending.get(event["request_id"])
+        if queue is not None:
+            queue.put_nowait(event["message"])
+
+    def answer(self, event: Dict[str, Any], rag: Optional[RAGPipeline], unavailable: str) -> None:
+        """Start answering a follower's request (leader only)"""
+        task = asyncio.create_task(self._answer(event, rag, unavailable))
+        self._answering[event["request_id"]] = task
+        task.add_done_callback(lambda _: self._answering.pop(event["request_id"], None))
+
+    def cancel(self, event: Dict[str, Any]) -> None:
+        task = self._answering.get(event["request_id"])
+        if task:
+            task.cancel()
+
+    async def _answer(self, event: Dict[str, Any], rag: Optional[RAGPipeline], unavailable: str) -> None:
+        async def respond(message: Optional[Dict[str, Any]]) -> None:
+            await self.publish({
+                "type": "chat_response", "request_id": event["request_id"],
+                "origin": event["origin"], "message": message
+            })
+
+        try:
+            if rag is None:
+                await respond({"type": "error", "status": 503, "detail": unavailable})
+            else:
+                stream = chat_messages(rag, event["message"], event.get("history") or [])
+                try:
+                    async for message in stream:
+                        await respond(message)
+                except ChatError as e:
+                    await respond({"type": "error", "status": e.status, "detail": e.detail})
+                finally:
+                    await stream.aclose()
+            await respond(None)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error answering relayed chat {event['request_id']}: {str(e)}")
+
+    async def close(self) -> None:
+        for task in list(self._answering.values()):
+            task.cancel()
+        await asyncio.gather(*self._answering.values(), return_exceptions=True)
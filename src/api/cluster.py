@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import fcntl
+import sqlite3
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_created_at ON events (created_at);
+"""
+
+
+class LeaderLock:
+    """Leader election between the API worker processes of one host.
+
+    Whoever holds an exclusive ``flock`` on the lock file is the leader.
+    The kernel drops the lock when its holder exits, however it exits, so a
+    follower that keeps retrying takes over from a crashed leader.
+    """
+
+    def __init__(self, path: str = './data/leader.lock'):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode('ascii'))
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class EventBus:
+    """Local pub/sub between worker processes backed by a SQLite log.
+
+    Publishers append JSON events; every worker tails the log from the ID
+    it started at and hands new events to its handler, so each worker's
+    WebSocket clients and caches see every event exactly once. Rows older
+    than ``retention`` seconds are pruned as the log is read.
+
+    SQLite calls block (on the busy timeout under write contention), so
+    from the event loop they run on one thread owned by the bus, which
+    also keeps this worker's events in publishing order.
+    """
+
+    def __init__(self,
+                 path: str = './data/event_bus.db',
+                 poll_interval: float = 0.05,
+                 retention: float = 300.0,
+                 batch_size: int = 500):
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.batch_size = batch_size
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._task: Optional[asyncio.Task] = None
+        self._last_id = 0
+        self._last_prune = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='event-bus')
+
+    async def _call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def publish_async(self, event: Dict[str, Any]) -> None:
+        """Publish from the event loop without blocking it"""
+        await self._call(self.publish, event)
+
+    def publish_nowait(self, event: Dict[str, Any]) -> None:
+        """Publish from synchronous code running on the event loop; does not wait"""
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self.publish, event)
+        future.add_done_callback(self._log_publish_error)
+
+    @staticmethod
+    def _log_publish_error(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception():
+            logger.error(f"Error publishing bus event: {str(future.exception())}")
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """Append an event (blocking)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO events (payload, created_at) VALUES (?, ?)',
+                (json.dumps(event, default=str), time.time())
+            )
+
+    def _read(self):
+        with self._lock:
+            return self._conn.execute(
+                'SELECT id, payload FROM events WHERE id > ? ORDER BY id LIMIT ?',
+                (self._last_id, self.batch_size)
+            ).fetchall()
+
+    def _prune(self) -> None:
+        now = time.time()
+        if now - self._last_prune < self.retention / 10:
+            return
+        self._last_prune = now
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM events WHERE created_at < ?', (now - self.retention,))
+
+    async def start(self, handler: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        """Deliver events published from now on to handler"""
+        self._last_id = await self._call(self._max_id)
+        self._task = asyncio.create_task(self._run(handler))
+
+    def _max_id(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+
+    async def _run(self, handler) -> None:
+        while True:
+            try:
+                rows = await self._call(self._read)
+                for event_id, payload in rows:
+                    self._last_id = event_id
+                    try:
+                        await handler(json.loads(payload))
+                    except Exception as e:
+                        logger.error(f"Error handling bus event {event_id}: {str(e)}")
+                await self._call(self._prune)
+                if len(rows) == self.batch_size:
+                    continue
+            except sqlite3.Error as e:
+                logger.error(f"Error reading event bus: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Lets events already handed to the bus thread reach the log
+        await asyncio.to_thread(self._executor.shutdown)
@@ -1,5 +1,5 @@
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List
 import yaml
 from dotenv import load_dotenv
 
@@ -53,7 +53,18 @@ def load_config() -> Dict[str, Any]:
     config['api'].update({
         'host': os.getenv('API_HOST', config['api']['host']),
         'port': int(os.getenv('API_PORT', config['api']['port'])),
-        'debug': os.getenv('API_DEBUG', 'false').lower() == 'true'
+        'debug': os.getenv('API_DEBUG', 'false').lower() == 'true',
+        'workers': int(os.getenv('API_WORKERS', config['api'].get('workers', 1)))
+    })
+    
+    # Diagnostics (set by run.py flags, which reach every worker through the environment)
+    diagnostics = config.setdefault('diagnostics', {})
+    diagnostics.update({
+        'stall_threshold': float(os.getenv('STALL_THRESHOLD', diagnostics.get('stall_threshold') or 0)),
+        'profile_output': os.getenv('PROFILE_OUTPUT', diagnostics.get('profile_output')),
+        'profile_endpoint': os.getenv(
+            'PROFILE_ENDPOINT', str(diagnostics.get('profile_endpoint', False))
+        ).lower() == 'true'
     })
     
     # Security configuration
@@ -73,6 +84,15 @@ def get_email_config(config: Dict[str, Any]) -> Dict[str, Any]:
     """Get email configuration"""
     return config['integrations']['email']
 
+def get_email_accounts(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Get per-account email configuration, inheriting shared settings"""
+    email_config = config['integrations']['email']
+    accounts = email_config.get('accounts')
+    if not accounts:
+        return [email_config]
+    base = {key: value for key, value in email_config.items() if key != 'accounts'}
+    return [{**base, **account} for account in accounts]
+
 def get_social_media_config(config: Dict[str, Any]) -> Dict[str, Any]:
     """Get social media configuration"""
     return config['integrations']['social_media']
@@ -0,0 +1,353 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Callable, Awaitable, AsyncIterator, TYPE_CHECKING
+
+from .config import (
+    get_nas_config, get_email_accounts, get_social_media_config
+)
+from .cluster import LeaderLock, EventBus
+from .chat import ChatError, ChatRelay, chat_messages
+from .response_cache import ResponseCache
+from .notifications import NotificationStore, NotificationBatcher
+from ..core.llm_engine import LLMEngine, ModelConfig
+from ..memory.memory_system import MemorySystem
+from ..core.agent_system import AgentSystem, Task, TaskResult
+from ..core.rag_pipeline import RAGPipeline
+from ..core.metrics import configure_metrics, gauge
+from ..core.diagnostics import Diagnostics
+
+if TYPE_CHECKING:
+    from ..integrations.nas_integration import NASIntegration
+    from ..integrations.email_sync import EmailSyncScheduler, AccountConnectionPool
+    from ..integrations.social_media_integration import SocialMediaIntegration
+
+logger = logging.getLogger(__name__)
+
+MONITOR_LEADER = gauge('monitor_leader', "1 if this worker runs the monitors")
+
+
+class AppContainer:
+    """Application-lifetime services built once from the loaded config.
+
+    Holds the shared integrations (one NAS integration on the pooled SMB
+    session, an IMAP connection pool per account for request handlers next
+    to the sync scheduler's own pools, one set of pooled social HTTP
+    clients) and the
+    LLM engine, memory and agent system. Request handlers only look
+    attributes up, so per-request setup is free. Integrations whose section
+    sets ``enabled: false`` are never built, nor their modules (and client
+    libraries) imported; their attribute stays None.
+
+    The LLM engine and memory system take seconds to load, so they are
+    built in the background: the API serves integration endpoints as soon
+    as ``start`` returns, and chat answers 503 until ``core_ready`` is set.
+
+    With ``api.workers`` above one, every worker process builds its own
+    container. Only the worker holding the leader lock runs the monitors
+    and loads the LLM engine, memory system and agents, so there is one
+    vector store and everything the agents remember is visible to chat;
+    other workers relay /chat to the leader. Events travel over an
+    EventBus to every worker, which invalidates its response cache and
+    fans them out to its own WebSocket clients.
+    """
+
+    def __init__(self,
+                 config: Dict[str, Any],
+                 publish: Callable[[Dict[str, Any]], Awaitable[None]],
+                 shutdown_timeout: float = 30.0):
+        self.config = config
+        self.publish = publish
+        self.shutdown_timeout = shutdown_timeout
+        configure_metrics(config.get('metrics'))
+        MONITOR_LEADER.set_function(lambda: int(self.monitoring))
+        self.nas: Optional['NASIntegration'] = None
+        # Keyed by account name; the first configured account is the default
+        self.email_pools: Dict[str, 'AccountConnectionPool'] = {}
+        self.email_sync: Optional['EmailSyncScheduler'] = None
+        self.social: Optional['SocialMediaIntegration'] = None
+        self.llm: Optional[LLMEngine] = None
+        self.memory: Optional[MemorySystem] = None
+        self.agent_system: Optional[AgentSystem] = None
+        self.rag: Optional[RAGPipeline] = None
+        self.core_ready = asyncio.Event()
+        self._core: Optional[asyncio.Task] = None
+        self.notifications: Optional[NotificationStore] = None
+        self.notification_batcher: Optional[NotificationBatcher] = None
+        cluster_config = config.get('api', {}).get('cluster', {})
+        self.workers = config.get('api', {}).get('workers', 1)
+        self.diagnostics = Diagnostics(self._diagnostics_config())
+        self.bus: Optional[EventBus] = None
+        self.leader_lock: Optional[LeaderLock] = None
+        self.election_interval = cluster_config.get('election_interval', 5.0)
+        self._election: Optional[asyncio.Task] = None
+        self.monitoring = False
+        self.chat_relay: Optional[ChatRelay] = None
+        if self.workers > 1:
+            self.bus = EventBus(
+                cluster_config.get('bus_path', './data/event_bus.db'),
+                poll_interval=cluster_config.get('bus_poll_interval', 0.05)
+            )
+            self.leader_lock = LeaderLock(cluster_config.get('lock_path', './data/leader.lock'))
+            self.chat_relay = ChatRelay(
+                self.bus.publish_async,
+                timeout=cluster_config.get('chat_timeout', 30.0)
+            )
+        cache_config = config.get('api', {}).get('cache', {})
+        self.response_cache = ResponseCache(
+            ttls=cache_config.get('ttls'),
+            stale_while_revalidate=cache_config.get('stale_while_revalidate', 300.0),
+            max_entries=cache_config.get('max_entries', 1000)
+        )
+        if self.bus:
+            self.response_cache.on_invalidate = self._broadcast_invalidation
+
+    def _diagnostics_config(self) -> Dict[str, Any]:
+        diagnostics = dict(self.config.get('diagnostics') or {})
+        if self.workers > 1 and diagnostics.get('profile_output'):
+            # One profile per worker process
+            root, ext = os.path.splitext(diagnostics['profile_output'])
+            diagnostics['profile_output'] = f"{root}.{os.getpid()}{ext}"
+        return diagnostics
+
+    def _enabled(self, name: str) -> bool:
+        section = self.config.get('integrations', {}).get(name)
+        return isinstance(section, dict) and section.get('enabled', True)
+
+    @property
+    def is_leader(self) -> bool:
+        return self.leader_lock is None or self.leader_lock.held
+
+    @property
+    def email_pool(self) -> Optional['AccountConnectionPool']:
+        """The default (first configured) account's pool"""
+        return next(iter(self.email_pools.values()), None)
+
+    async def start(self) -> None:
+        """Build every enabled service and start (or campaign for) the monitors.
+
+        If this raises, the caller should still call ``shutdown`` to release
+        whatever was started before the failure.
+        """
+        # Started first so blocking calls during startup are reported too
+        self.diagnostics.start()
+        notification_config = self.config.get('notifications', {})
+        self.notifications = NotificationStore(
+            notification_config.get('path', './data/notifications.db'),
+            retention=notification_config.get('retention_days', 30) * 86400
+        )
+        await asyncio.to_thread(self.notifications.prune)
+        self.notification_batcher = NotificationBatcher(
+            self.notifications,
+            self._notification_event,
+            window=notification_config.get('batch_window', 5.0),
+            max_batch=notification_config.get('max_batch', 100),
+            digest_items=notification_config.get('digest_items', 20)
+        )
+        if self._enabled('nas'):
+            from ..integrations.nas_integration import NASIntegration
+            self.nas = NASIntegration(get_nas_config(self.config))
+            await self.nas.mount_share()
+        if self._enabled('email'):
+            from ..integrations.email_sync import EmailSyncScheduler, AccountConnectionPool
+            accounts = get_email_accounts(self.config)
+            self.email_sync = EmailSyncScheduler(accounts, self._email_event)
+            # Request handlers get their own pools so they never queue behind syncs
+            for account in accounts:
+                pool = AccountConnectionPool(account, self.email_sync.store)
+                self.email_pools[pool.name] = pool
+        if self._enabled('social_media'):
+            from ..integrations.social_media_integration import SocialMediaIntegration
+            self.social = SocialMediaIntegration(get_social_media_config(self.config))
+
+        if self.bus:
+            await self.bus.start(self._deliver)
+            self._election = asyncio.create_task(self._campaign())
+        else:
+            self._core = asyncio.create_task(self._start_core())
+            await self._start_monitors()
+
+    async def _campaign(self) -> None:
+        """Retry the leader lock until this worker holds it, then load the core and monitor"""
+        while not self.leader_lock.try_acquire():
+            await asyncio.sleep(self.election_interval)
+        logger.info(f"Worker {os.getpid()} elected leader; loading models and starting monitors")
+        self._core = asyncio.create_task(self._start_core())
+        await self._start_monitors()
+
+    def chat(self, message: str, history: List[Dict[str, str]]) -> AsyncIterator[Dict[str, Any]]:
+        """Answer a chat here if this worker holds the core, otherwise in the leader"""
+        if self.chat_relay and not self.is_leader:
+            return self.chat_relay.ask(message, history)
+        if self.rag is None:
+            raise ChatError(self._rag_unavailable(), 503)
+        return chat_messages(self.rag, message, history)
+
+    def _rag_unavailable(self) -> str:
+        return "rag is not available" if self.core_ready.is_set() else "rag is still loading"
+
+    async def _start_monitors(self) -> None:
+        self.monitoring = True
+        if self.nas:
+            await self.nas.start_monitoring(self._nas_event)
+        if self.email_sync:
+            await self.email_sync.start()
+        if self.social:
+            interval = self.config.get('agents', {}).get('social_media', {}).get('update_interval', 300)
+            await self.social.start_monitoring(self._social_event, interval)
+
+    async def _stop_monitors(self) -> None:
+        if not self.monitoring:
+            return
+        self.monitoring = False
+        if self.social:
+            await self.social.stop_monitoring()
+        if self.email_sync:
+            await self.email_sync.stop()
+        if self.nas:
+            # Flushes events still held back by the coalescer
+            await self.nas.stop_monitoring()
+
+    async def _start_core(self) -> None:
+        """Load the LLM engine and memory system off the event loop.
+
+        Both block on model loading; a failure is logged and leaves the
+        integrations usable without them. Runs as a background task;
+        ``core_ready`` is set when it has finished either way.
+        """
+        try:
+            await self._load_core()
+        finally:
+            self.core_ready.set()
+
+    async def _load_core(self) -> None:
+        llm_config = self.config['llm']
+        llm = LLMEngine(ModelConfig(
+            model_name=llm_config['model'],
+            temperature=llm_config.get('temperature', 0.7),
+            context_window=llm_config.get('context_window', 4096),
+            top_p=llm_config.get('top_p', 0.9),
+            top_k=llm_config.get('top_k', 40)
+        ))
+        memory = MemorySystem(self.config['memory'])
+        results = await asyncio.gather(
+            asyncio.to_thread(llm.ensure_model),
+            asyncio.to_thread(memory.warm_up),
+            return_exceptions=True
+        )
+        for name, result in zip(('LLM engine', 'memory system'), results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to initialize {name}: {str(result)}")
+        self.llm, self.memory = (None if isinstance(result, Exception) else service
+                                 for service, result in zip((llm, memory), results))
+        if self.llm and self.memory:
+            self.agent_system = AgentSystem(self.llm, self.memory, self.config.get('agents'),
+                                            on_result=self._task_event)
+            await self.agent_system.start()
+            self.rag = RAGPipeline(
+                self.llm, self.memory,
+                email_store=self.email_sync.store if self.email_sync else None,
+                config=self.config.get('chat')
+            )
+
+    async def _emit(self, event: Dict[str, Any]) -> None:
+        """Distribute a raw event and queue it for the notification log"""
+        await self._broadcast(event)
+        self.notification_batcher.submit(event)
+
+    async def _notification_event(self, notification: Dict[str, Any]) -> None:
+        await self._broadcast({"type": "notification", "notification": notification})
+
+    async def _broadcast(self, event: Dict[str, Any]) -> None:
+        """Deliver an event in every worker (just this one without a bus)"""
+        if self.bus:
+            await self.bus.publish_async(event)
+        else:
+            await self._deliver(event)
+
+    async def _deliver(self, event: Dict[str, Any]) -> None:
+        """Apply an event to this worker's cache and WebSocket clients"""
+        if event.get("type", "").startswith("chat_"):
+            self._deliver_chat(event)
+            return
+        if event.get("type") == "cache_invalidate":
+            if event.get("origin") != os.getpid():
+                self.response_cache.invalidate(event["endpoint"], event.get("scope"), propagate=False)
+            return
+        self.response_cache.invalidate_event(
+            event, self.nas.mount_point if self.nas else None, propagate=False
+        )
+        await self.publish(event)
+
+    def _deliver_chat(self, event: Dict[str, Any]) -> None:
+        if event["type"] == "chat_response":
+            if event.get("origin") == os.getpid():
+                self.chat_relay.deliver(event)
+        elif self.is_leader:
+            if event["type"] == "chat_request":
+                self.chat_relay.answer(event, self.rag, self._rag_unavailable())
+            elif event["type"] == "chat_cancel":
+                self.chat_relay.cancel(event)
+
+    def _broadcast_invalidation(self, endpoint: str, scope: Optional[str]) -> None:
+        # Called from request handlers after writes, so other workers drop stale entries too
+        self.bus.publish_nowait({
+            "type": "cache_invalidate", "endpoint": endpoint, "scope": scope, "origin": os.getpid()
+        })
+
+    async def _nas_event(self, event_type: str, path: str, dest_path: Optional[str] = None) -> None:
+        event = {"type": "nas_event", "event": event_type, "path": path}
+        if dest_path:
+            event["dest_path"] = dest_path
+        await self._emit(event)
+
+    async def _email_event(self, email_data: Dict[str, Any]) -> None:
+        await self._emit({"type": "email_event", "data": email_data})
+
+    async def _social_event(self, platform: str, data: Dict[str, Any]) -> None:
+        await self._emit({"type": "social_event", "platform": platform, "data": data})
+
+    async def _task_event(self, task: Task, result: TaskResult) -> None:
+        await self._emit({
+            "type": "task_event",
+            "task_id": task.id,
+            "task_type": task.type,
+            "success": result.success,
+            "error": result.error
+        })
+
+    async def shutdown(self) -> None:
+        """Stop monitors first, drain queued work, then release connections"""
+        if self._core and not self._core.done():
+            # Model loading itself cannot be interrupted; its thread is abandoned
+            self._core.cancel()
+            await asyncio.gather(self._core, return_exceptions=True)
+        if self._election:
+            self._election.cancel()
+            await asyncio.gather(self._election, return_exceptions=True)
+        await self._stop_monitors()
+        if self.chat_relay:
+            await self.chat_relay.close()
+        if self.agent_system:
+            try:
+                await asyncio.wait_for(self.agent_system.stop(), self.shutdown_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Agent tasks still queued after {self.shutdown_timeout}s; abandoning them")
+        if self.notification_batcher:
+            await self.notification_batcher.stop()
+        if self.bus:
+            # Let this worker's clients receive the final flushed events
+            await asyncio.sleep(self.bus.poll_interval * 2)
+            await self.bus.stop()
+        if self.leader_lock:
+            self.leader_lock.release()
+
+        if self.social:
+            await self.social.close()
+        for pool in self.email_pools.values():
+            await pool.close()
+        if self.nas:
+            from ..integrations.smb_pool import close_session_pools
+            await self.nas.unmount_share()
+            await close_session_pools()
+        self.diagnostics.stop()
@@ -1,20 +1,63 @@
-from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect, Request, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Any, Optional
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
 import asyncio
+import mimetypes
+import os
 import logging
 from datetime import datetime
 import json
+from contextlib import asynccontextmanager
+from urllib.parse import quote
 
-from ..integrations.nas_integration import NASIntegration
-from ..integrations.email_integration import EmailIntegration
-from ..integrations.social_media_integration import SocialMediaIntegration
-from ..core.llm_engine import LLMEngine, ModelConfig
-from ..memory.memory_system import MemorySystem
+from .config import load_config
+from .container import AppContainer
+from .realtime import ConnectionManager, ClientConnection, POLICIES, DROP_OLDEST
+from .notifications import NotificationStore
+from .response_cache import ResponseCache
+from .chat import ChatError
+from .metrics import HTTPMetricsMiddleware, CACHE_REQUESTS
+from ..core.metrics import REGISTRY
+from ..core.tracing import TRACER
+
+if TYPE_CHECKING:
+    # Imported by the container only when enabled
+    from ..integrations.nas_integration import NASIntegration
+    from ..integrations.email_integration import EmailIntegration
+    from ..integrations.email_sync import AccountConnectionPool
+    from ..integrations.social_media_integration import SocialMediaIntegration
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Personal AI Assistant API")
+# WebSocket clients, fanned out to by topic
+manager = ConnectionManager()
+
+# Notifications sent to a reconnecting client before it must page
+REPLAY_LIMIT = 500
+
+# Built in the background after startup (see AppContainer)
+CORE_SERVICES = {"llm", "memory", "agent_system", "rag"}
+
+async def publish_event(event: Dict[str, Any]) -> None:
+    manager.publish(event)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Integrations, models and monitors live for the whole process
+    container = AppContainer(load_config(), publish_event)
+    try:
+        await container.start()
+        app.state.container = container
+        yield
+    finally:
+        # Also releases whatever a failed start had already opened
+        await container.shutdown()
+        await manager.close()
+
+app = FastAPI(title="Personal AI Assistant API", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -24,91 +67,184 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(HTTPMetricsMiddleware)
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-    
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-    
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-    
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+# Dependency injection
+def _service(request: Request, name: str):
+    container = request.app.state.container
+    service = getattr(container, name)
+    if service is None:
+        if name in CORE_SERVICES and not container.core_ready.is_set():
+            raise HTTPException(status_code=503, detail=f"{name} is still loading",
+                                headers={"Retry-After": "5"})
+        raise HTTPException(status_code=503, detail=f"{name} is not available")
+    return service
 
-manager = ConnectionManager()
+async def get_nas_integration(request: Request) -> 'NASIntegration':
+    return _service(request, "nas")
 
-# Dependency injection
-async def get_nas_integration():
-    # Initialize with config from environment
-    config = {
-        "host": "nas.local",
-        "share": "documents",
-        "mount_point": "/mnt/nas",
-        "username": "user",
-        "password": "pass"
-    }
-    nas = NASIntegration(config)
-    await nas.mount_share()
+async def get_email_pool(request: Request, account: Optional[str] = None) -> 'AccountConnectionPool':
+    # ?account= picks a configured account by name; the first one by default
+    default = _service(request, "email_pool")
+    if account is None:
+        return default
+    pool = request.app.state.container.email_pools.get(account)
+    if pool is None:
+        raise HTTPException(status_code=404, detail=f"Unknown email account: {account}")
+    return pool
+
+async def get_email_integration(pool: 'AccountConnectionPool' = Depends(get_email_pool)):
+    # Borrow a logged-in connection from the account's shared pool
     try:
-        yield nas
-    finally:
-        await nas.unmount_share()
-
-async def get_email_integration():
-    config = {
-        "server": "imap.gmail.com",
-        "port": 993,
-        "username": "user@gmail.com",
-        "password": "pass",
-        "use_ssl": True
-    }
-    email = EmailIntegration(config)
-    await email.connect()
+        async with pool.connection() as email:
+            yield email
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+async def get_social_media_integration(request: Request) -> 'SocialMediaIntegration':
+    return _service(request, "social")
+
+def get_response_cache(request: Request) -> ResponseCache:
+    return request.app.state.container.response_cache
+
+async def cached_response(request: Request, cache: ResponseCache, endpoint: str,
+                          params: Tuple, fetch, scope: Optional[str] = None,
+                          cacheable=None) -> Response:
+    """Serve a read endpoint through the response cache, honouring If-None-Match"""
     try:
-        yield email
-    finally:
-        await email.disconnect()
-
-async def get_social_media_integration():
-    config = {
-        "twitter": {
-            "api_key": "your_api_key",
-            "api_secret": "your_api_secret",
-            "access_token": "your_access_token",
-            "access_token_secret": "your_access_token_secret"
-        },
-        "facebook": {
-            "access_token": "your_facebook_token"
-        }
-    }
-    return SocialMediaIntegration(config)
+        entry, status = await cache.get(endpoint, params, fetch, scope=scope, cacheable=cacheable)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    CACHE_REQUESTS.labels(endpoint, status).inc()
+    return cache.respond(request, entry, status)
 
 # NAS endpoints
 @app.get("/nas/files/{path:path}")
 async def list_files(
+    request: Request,
     path: str,
-    nas: NASIntegration = Depends(get_nas_integration)
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    sort: str = "name",
+    order: str = "asc",
+    q: Optional[str] = None,
+    recursive: bool = False,
+    nas: 'NASIntegration' = Depends(get_nas_integration),
+    cache: ResponseCache = Depends(get_response_cache)
 ):
-    try:
-        files = await nas.list_files(path)
-        return {"files": files}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    limit = min(limit, 1000)
+    return await cached_response(
+        request, cache, "nas_files",
+        (path.strip("/"), limit, cursor, sort, order, q, recursive),
+        lambda: nas.list_directory(
+            path, limit=limit, cursor=cursor, sort=sort,
+            order=order, query=q, recursive=recursive
+        ),
+        scope=path.strip("/"),
+        # Partial recursive listings are refreshed further on the next request
+        cacheable=lambda result: not result.get("partial")
+    )
 
 @app.get("/nas/file/{path:path}")
 async def read_file(
     path: str,
-    nas: NASIntegration = Depends(get_nas_integration)
+    nas: 'NASIntegration' = Depends(get_nas_integration)
 ):
     try:
         content = await nas.read_file(path)
-        return {"content": content.decode()}
+        return {"content": content.decode("utf-8", errors="replace")}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range Range header into inclusive (start, end).
+
+    Invalid headers are ignored, as RFC 7233 requires, and the full entity
+    is served; only a valid range that lies beyond the file gets a 416.
+    """
+    if not range_header or not range_header.startswith('bytes='):
+        return None
+    spec = range_header[len('bytes='):].strip()
+    if ',' in spec:
+        # Multiple ranges are optional to honour; serve the full entity
+        return None
+    first, _, last = spec.partition('-')
+    if not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        length = int(last)
+        start, end = max(size - length, 0), size - 1
+        if length == 0:
+            start = size
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+def content_disposition(filename: str) -> str:
+    """Attachment header with an ASCII fallback and the RFC 5987 UTF-8 name"""
+    fallback = ''.join(c if 32 <= ord(c) < 127 and c not in '"\\' else '_' for c in filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+@app.get("/nas/download/{path:path}")
+async def download_file(
+    path: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    nas: 'NASIntegration' = Depends(get_nas_integration)
+):
+    try:
+        size = (await nas.stat_file(path))['size']
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    byte_range = parse_range(range_header, size)
+    start, end = byte_range if byte_range else (0, size - 1)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(max(end - start + 1, 0)),
+        "Content-Disposition": content_disposition(os.path.basename(path))
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    
+    try:
+        reader = await nas.open_reader(path, start=start, end=end)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        reader,
+        # Runs after the body is sent or the client disconnects mid-download
+        background=BackgroundTask(reader.aclose),
+        status_code=206 if byte_range else 200,
+        media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+        headers=headers
+    )
+
+@app.put("/nas/upload/{path:path}")
+async def upload_file(
+    path: str,
+    request: Request,
+    nas: 'NASIntegration' = Depends(get_nas_integration),
+    cache: ResponseCache = Depends(get_response_cache)
+):
+    try:
+        written = await nas.write_stream(path, request.stream())
+        cache.invalidate_event({"type": "nas_event", "path": path})
+        return {"success": True, "size": written}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -116,10 +252,12 @@ async def read_file(
 async def write_file(
     path: str,
     content: str,
-    nas: NASIntegration = Depends(get_nas_integration)
+    nas: 'NASIntegration' = Depends(get_nas_integration),
+    cache: ResponseCache = Depends(get_response_cache)
 ):
     try:
         success = await nas.write_file(path, content.encode())
+        cache.invalidate_event({"type": "nas_event", "path": path})
         return {"success": success}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -127,10 +265,12 @@ async def write_file(
 @app.delete("/nas/file/{path:path}")
 async def delete_file(
     path: str,
-    nas: NASIntegration = Depends(get_nas_integration)
+    nas: 'NASIntegration' = Depends(get_nas_integration),
+    cache: ResponseCache = Depends(get_response_cache)
 ):
     try:
         success = await nas.delete_file(path)
+        cache.invalidate_event({"type": "nas_event", "path": path})
         return {"success": success}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -138,148 +278,315 @@ async def delete_file(
 # Email endpoints
 @app.get("/email/messages")
 async def get_emails(
+    request: Request,
     limit: int = 20,
     since: Optional[datetime] = None,
-    email: EmailIntegration = Depends(get_email_integration)
+    pool: 'AccountConnectionPool' = Depends(get_email_pool),
+    cache: ResponseCache = Depends(get_response_cache)
 ):
-    try:
-        emails = await email.fetch_emails(since=since, limit=limit)
-        return {"emails": emails}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # The IMAP connection is only borrowed on a cache miss
+    async def fetch():
+        async with pool.connection() as email:
+            return {"emails": await email.fetch_emails(since=since, limit=limit)}
+    return await cached_response(request, cache, "email_messages", (pool.name, limit, since), fetch)
 
 @app.post("/email/messages/{message_id}/read")
 async def mark_email_read(
     message_id: str,
-    email: EmailIntegration = Depends(get_email_integration)
+    email: 'EmailIntegration' = Depends(get_email_integration),
+    cache: ResponseCache = Depends(get_response_cache)
 ):
     try:
         success = await email.mark_as_read(message_id)
+        cache.invalidate("email_messages")
         return {"success": success}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class BatchEmailRequest(BaseModel):
+    action: str
+    message_ids: List[str] = []
+    uids: List[int] = []
+    target: Optional[str] = None
+    mailbox: Optional[str] = None
+
+@app.post("/email/messages/batch")
+async def batch_update_emails(
+    request: BatchEmailRequest,
+    email: 'EmailIntegration' = Depends(get_email_integration),
+    cache: ResponseCache = Depends(get_response_cache)
+):
+    try:
+        updated = 0
+        if request.uids:
+            updated += await email.apply_flags(
+                request.uids, request.action,
+                target=request.target, mailbox=request.mailbox
+            )
+        if request.message_ids:
+            updated += await email.apply_flags_by_message_id(
+                request.message_ids, request.action,
+                target=request.target, mailbox=request.mailbox
+            )
+        cache.invalidate("email_messages")
+        return {"success": True, "updated": updated}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Social Media endpoints
 @app.get("/social/twitter/timeline")
 async def get_twitter_timeline(
+    request: Request,
     count: int = 20,
     since_id: Optional[str] = None,
-    social: SocialMediaIntegration = Depends(get_social_media_integration)
+    social: 'SocialMediaIntegration' = Depends(get_social_media_integration),
+    cache: ResponseCache = Depends(get_response_cache)
 ):
-    try:
-        tweets = await social.get_twitter_timeline(count=count, since_id=since_id)
-        return {"tweets": tweets}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    async def fetch():
+        return {"tweets": await social.get_twitter_timeline(count=count, since_id=since_id)}
+    return await cached_response(request, cache, "twitter_timeline", (count, since_id), fetch)
 
 @app.post("/social/twitter/tweet")
 async def post_tweet(
     text: str,
-    social: SocialMediaIntegration = Depends(get_social_media_integration)
+    social: 'SocialMediaIntegration' = Depends(get_social_media_integration),
+    cache: ResponseCache = Depends(get_response_cache)
 ):
     try:
         tweet = await social.post_tweet(text)
+        cache.invalidate("twitter_timeline")
         return tweet
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/social/facebook/feed")
 async def get_facebook_feed(
+    request: Request,
     limit: int = 20,
     since: Optional[datetime] = None,
-    social: SocialMediaIntegration = Depends(get_social_media_integration)
+    social: 'SocialMediaIntegration' = Depends(get_social_media_integration),
+    cache: ResponseCache = Depends(get_response_cache)
 ):
-    try:
-        posts = await social.get_facebook_feed(limit=limit, since=since)
-        return {"posts": posts}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    async def fetch():
+        return {"posts": await social.get_facebook_feed(limit=limit, since=since)}
+    return await cached_response(request, cache, "facebook_feed", (limit, since), fetch)
 
 @app.post("/social/facebook/post")
 async def post_facebook_status(
     message: str,
-    social: SocialMediaIntegration = Depends(get_social_media_integration)
+    social: 'SocialMediaIntegration' = Depends(get_social_media_integration),
+    cache: ResponseCache = Depends(get_response_cache)
 ):
     try:
         post = await social.post_facebook_status(message)
+        cache.invalidate("facebook_feed")
         return post
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Chat endpoint
+class ChatRequest(BaseModel):
+    message: str
+    history: List[Dict[str, str]] = []
+
+def _ndjson(message: Dict[str, Any]) -> str:
+    return json.dumps(message, default=str) + "\n"
+
+@app.post("/chat")
+async def chat(request: ChatRequest, http_request: Request):
+    """Answer from memories, recent email and NAS documents, streamed as NDJSON.
+
+    The first line lists the context sources, then one line per generated
+    fragment, and a final line carries per-stage timings in milliseconds
+    (retrieval timings are also sent up front as a Server-Timing header).
+    With several workers the answer comes from the leader, which holds the
+    models and memory.
+    """
+    container = http_request.app.state.container
+    try:
+        stream = container.chat(request.message, request.history)
+        context = await stream.__anext__()
+    except ChatError as e:
+        headers = {"Retry-After": "5"} if e.status == 503 else None
+        raise HTTPException(status_code=e.status, detail=e.detail, headers=headers)
+    server_timing = ", ".join(f"{stage};dur={duration}" for stage, duration in context.pop("timings").items())
+
+    async def body():
+        try:
+            yield _ndjson(context)
+            async for message in stream:
+                yield _ndjson(message)
+        finally:
+            # Stops generation (or the leader's) when the client goes away
+            await stream.aclose()
+
+    return StreamingResponse(
+        body(), media_type="application/x-ndjson", headers={"Server-Timing": server_timing}
+    )
+
+# Notification endpoints
+class NotificationIdsRequest(BaseModel):
+    ids: List[int]
+
+def get_notification_store(request: Request) -> NotificationStore:
+    return request.app.state.container.notifications
+
+@app.get("/notifications")
+async def list_notifications(
+    cursor: Optional[int] = None,
+    limit: int = 50,
+    unread: bool = False,
+    kind: Optional[str] = Query(None, alias="type"),
+    store: NotificationStore = Depends(get_notification_store)
+):
+    items, next_cursor = await asyncio.to_thread(
+        store.page, cursor=cursor, limit=min(limit, 500), unread_only=unread, kind=kind
+    )
+    return {
+        "notifications": items,
+        "next_cursor": next_cursor,
+        "unread_count": await asyncio.to_thread(store.unread_count)
+    }
+
+@app.post("/notifications/read")
+async def mark_notifications_read(
+    request: NotificationIdsRequest,
+    store: NotificationStore = Depends(get_notification_store)
+):
+    return {"updated": await asyncio.to_thread(store.mark_read, request.ids)}
+
+@app.post("/notifications/read-all")
+async def mark_all_notifications_read(
+    up_to: Optional[int] = None,
+    store: NotificationStore = Depends(get_notification_store)
+):
+    return {"updated": await asyncio.to_thread(store.mark_all_read, up_to)}
+
+@app.post("/notifications/dismiss")
+async def dismiss_notifications(
+    request: NotificationIdsRequest,
+    store: NotificationStore = Depends(get_notification_store)
+):
+    return {"updated": await asyncio.to_thread(store.dismiss, request.ids)}
+
+@app.delete("/notifications")
+async def dismiss_all_notifications(
+    store: NotificationStore = Depends(get_notification_store)
+):
+    return {"updated": await asyncio.to_thread(store.dismiss)}
+
+# Observability endpoints
+@app.get("/metrics")
+async def metrics():
+    """Metrics of this worker process in the Prometheus text format"""
+    if not REGISTRY.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/traces")
+async def traces(limit: int = 100, trace_id: Optional[str] = None):
+    """Recently finished spans of this worker, newest first"""
+    if not TRACER.enabled:
+        raise HTTPException(status_code=404, detail="Tracing is disabled")
+    return {"spans": TRACER.recent(limit=min(limit, 1000), trace_id=trace_id)}
+
+@app.get("/debug/stalls")
+async def event_loop_stalls(request: Request, limit: int = 20):
+    """Recent event-loop stalls with the stack that was running, newest first"""
+    detector = request.app.state.container.diagnostics.detector
+    if detector is None:
+        raise HTTPException(status_code=404, detail="Stall detection is disabled")
+    return {"threshold": detector.threshold, "stalls": detector.recent(min(limit, 100))}
+
+@app.get("/debug/profile")
+async def profile(
+    request: Request,
+    seconds: float = 10.0,
+    interval: Optional[float] = None,
+    loop_only: bool = False
+):
+    """Sample this worker's stacks for a while, returned as folded stacks.
+
+    The output feeds flamegraph.pl or speedscope directly, e.g.
+    curl 'localhost:8000/debug/profile?seconds=30' | flamegraph.pl > api.svg
+    """
+    diagnostics = request.app.state.container.diagnostics
+    if not diagnostics.profile_endpoint:
+        raise HTTPException(status_code=404, detail="The profiling endpoint is disabled")
+    try:
+        profiler = await diagnostics.profile(
+            min(max(seconds, 0.1), 300.0), max(interval, 0.001) if interval else None, loop_only
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(profiler.folded(), headers={"X-Profile-Samples": str(profiler.samples)})
+
+async def replay_notifications(client: ClientConnection, store: NotificationStore, since: int) -> None:
+    """Queue notifications after a client's last seen ID.
+
+    Only as many as fit in the client's queue (less one slot for the
+    ``replayed`` marker) are queued, so none are dropped on the way; an
+    incomplete replay is continued by replaying again from ``last_id``.
+    """
+    limit = max(min(REPLAY_LIMIT, client.capacity - 1), 0)
+    notifications = await asyncio.to_thread(store.since, since, limit=limit + 1)
+    # Live events may have taken room while the log was read
+    limit = max(min(limit, client.capacity - 1), 0)
+    queued = notifications[:limit]
+    for notification in queued:
+        client.enqueue(json.dumps({"type": "notification", "notification": notification}, default=str))
+    client.enqueue(json.dumps({
+        "type": "replayed",
+        "count": len(queued),
+        # More remain: replay again from last_id, or page through /notifications
+        "complete": len(notifications) <= limit,
+        "last_id": queued[-1]["id"] if queued else since
+    }))
+
 # WebSocket endpoint for real-time updates
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(
+    websocket: WebSocket,
+    topics: Optional[str] = None,
+    policy: str = DROP_OLDEST,
+    since: Optional[int] = None
+):
+    """Events for the subscribed topics (nas, email, social, task,
+    notification; default all).
+
+    Clients can change subscriptions with
+    {"type": "subscribe" | "unsubscribe", "topics": [...]}, and after a
+    reconnect pass ?since=<last notification id> (or send
+    {"type": "replay", "since": ...}) to receive what they missed.
+    """
+    if policy not in POLICIES:
+        await websocket.close(code=1008)
+        return
+    store = websocket.app.state.container.notifications
+    client = await manager.connect(
+        websocket, topics=topics.split(",") if topics else None, policy=policy
+    )
+    if since is not None:
+        await replay_notifications(client, store, since)
     try:
         while True:
             data = await websocket.receive_text()
-            # Process incoming messages if needed
-            await manager.broadcast(f"Message received: {data}")
+            try:
+                message = json.loads(data)
+            except ValueError:
+                message = None
+            if isinstance(message, dict) and message.get("type") == "replay":
+                try:
+                    offset = int(message.get("since") or 0)
+                except (ValueError, TypeError):
+                    client.enqueue(json.dumps({"type": "error", "detail": "Invalid replay offset"}))
+                    continue
+                await replay_notifications(client, store, offset)
+            else:
+                await manager.handle_message(client, data)
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
-
-# Start monitoring tasks
-@app.on_event("startup")
-async def startup_event():
-    # Initialize integrations
-    nas = NASIntegration({
-        "host": "nas.local",
-        "share": "documents",
-        "mount_point": "/mnt/nas",
-        "username": "user",
-        "password": "pass"
-    })
-    
-    email = EmailIntegration({
-        "server": "imap.gmail.com",
-        "port": 993,
-        "username": "user@gmail.com",
-        "password": "pass",
-        "use_ssl": True
-    })
-    
-    social = SocialMediaIntegration({
-        "twitter": {
-            "api_key": "your_api_key",
-            "api_secret": "your_api_secret",
-            "access_token": "your_access_token",
-            "access_token_secret": "your_access_token_secret"
-        },
-        "facebook": {
-            "access_token": "your_facebook_token"
-        }
-    })
-    
-    # Start monitoring
-    await nas.mount_share()
-    await email.connect()
-    
-    async def nas_callback(event_type: str, path: str):
-        await manager.broadcast(json.dumps({
-            "type": "nas_event",
-            "event": event_type,
-            "path": path
-        }))
-    
-    async def email_callback(email_data: Dict[str, Any]):
-        await manager.broadcast(json.dumps({
-            "type": "email_event",
-            "data": email_data
-        }))
-    
-    async def social_callback(platform: str, data: Dict[str, Any]):
-        await manager.broadcast(json.dumps({
-            "type": "social_event",
-            "platform": platform,
-            "data": data
-        }))
-    
-    # Start monitoring tasks
-    await nas.start_monitoring(nas_callback)
-    await email.start_monitoring(email_callback)
-    await social.start_monitoring(social_callback)
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    # Cleanup will be handled by dependency injection
-    pass 
\ No newline at end of file
+        pass
+    finally:
+        await manager.disconnect(client)
@@ -0,0 +1,45 @@
+import time
+
+from ..core.metrics import REGISTRY, histogram, counter, gauge
+
+HTTP_REQUEST_SECONDS = histogram('http_request_seconds', "HTTP request duration, including streamed bodies",
+                                 ('method', 'route', 'status'))
+HTTP_REQUESTS_IN_PROGRESS = gauge('http_requests_in_progress', "HTTP requests being handled")
+CACHE_REQUESTS = counter('response_cache_requests_total', "Cached endpoint lookups by outcome",
+                         ('endpoint', 'status'))
+
+
+class HTTPMetricsMiddleware:
+    """Times every HTTP request by method, route template and status.
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, so streamed
+    responses are not buffered and are timed until their last chunk. The
+    route template is read from the scope after routing, which keeps the
+    label set bounded however many distinct paths are requested.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not REGISTRY.enabled:
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = scope.get('route')
+            HTTP_REQUEST_SECONDS.labels(
+                scope['method'], getattr(route, 'path', '<unmatched>'), status
+            ).observe(time.perf_counter() - start)
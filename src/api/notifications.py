@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable, Iterable
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    title TEXT NOT NULL,
+    message TEXT NOT NULL,
+    data TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    read INTEGER NOT NULL DEFAULT 0,
+    dismissed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_notifications_unread ON notifications (read, dismissed);
+"""
+
+# Raw event type -> notification kind (matches the frontend's types)
+KINDS = {
+    'nas_event': 'file',
+    'email_event': 'email',
+    'social_event': 'social',
+    'task_event': 'task'
+}
+
+
+class NotificationStore:
+    """Append-only notification log with read and dismissed flags.
+
+    IDs are assigned in insertion order and never reused, so an ID doubles
+    as a replay offset: a reconnecting client asks for everything after the
+    last ID it saw. Pages are returned newest first with the smallest ID of
+    the page as the cursor for the next one.
+    """
+
+    def __init__(self, path: str = './data/notifications.db', retention: float = 30 * 86400):
+        self.retention = retention
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'type': row['kind'],
+            'title': row['title'],
+            'message': row['message'],
+            'data': json.loads(row['data']),
+            'count': row['count'],
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(row['created_at'])),
+            'read': bool(row['read'])
+        }
+
+    def append(self,
+               kind: str,
+               title: str,
+               message: str,
+               data: Any = None,
+               count: int = 1) -> Dict[str, Any]:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO notifications (kind, title, message, data, count, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (kind, title, message, json.dumps(data, default=str), count, time.time())
+            )
+            row = self._conn.execute(
+                'SELECT * FROM notifications WHERE id = ?', (cursor.lastrowid,)
+            ).fetchone()
+        return self._to_dict(row)
+
+    def page(self,
+             cursor: Optional[int] = None,
+             limit: int = 50,
+             unread_only: bool = False,
+             kind: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Notifications older than cursor, newest first, and the next cursor"""
+        clauses = ['dismissed = 0']
+        params: List[Any] = []
+        if cursor is not None:
+            clauses.append('id < ?')
+            params.append(cursor)
+        if unread_only:
+            clauses.append('read = 0')
+        if kind:
+            clauses.append('kind = ?')
+            params.append(kind)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM notifications WHERE {' AND '.join(clauses)} ORDER BY id DESC LIMIT ?",
+                (*params, limit + 1)
+            ).fetchall()
+        items = [self._to_dict(row) for row in rows[:limit]]
+        return items, items[-1]['id'] if len(rows) > limit else None
+
+    def since(self, offset: int, limit: int = 500) -> List[Dict[str, Any]]:
+        """Notifications after a replay offset, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM notifications WHERE id > ? AND dismissed = 0 ORDER BY id LIMIT ?',
+                (offset, limit)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def last_id(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COALESCE(MAX(id), 0) FROM notifications').fetchone()[0]
+
+    def unread_count(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM notifications WHERE read = 0 AND dismissed = 0'
+            ).fetchone()[0]
+
+    def mark_read(self, ids: Iterable[int]) -> int:
+        with self._lock, self._conn:
+            return self._conn.executemany(
+                'UPDATE notifications SET read = 1 WHERE id = ?', [(i,) for i in ids]
+            ).rowcount
+
+    def mark_all_read(self, up_to: Optional[int] = None) -> int:
+        """Mark everything (up to an ID, so later arrivals stay unread) as read"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                'UPDATE notifications SET read = 1 WHERE read = 0 AND id <= ?',
+                (up_to if up_to is not None else 2 ** 63 - 1,)
+            ).rowcount
+
+    def dismiss(self, ids: Optional[Iterable[int]] = None) -> int:
+        """Hide notifications (all of them when ids is None); the log keeps them"""
+        with self._lock, self._conn:
+            if ids is None:
+                return self._conn.execute(
+                    'UPDATE notifications SET dismissed = 1, read = 1 WHERE dismissed = 0'
+                ).rowcount
+            return self._conn.executemany(
+                'UPDATE notifications SET dismissed = 1, read = 1 WHERE id = ?', [(i,) for i in ids]
+            ).rowcount
+
+    def prune(self) -> int:
+        """Drop notifications older than the retention period"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                'DELETE FROM notifications WHERE created_at < ?', (time.time() - self.retention,)
+            ).rowcount
+
+
+def _summary(event: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields of a raw event worth keeping in a notification"""
+    data = event.get('data') or {}
+    kind = KINDS[event['type']]
+    if kind == 'email':
+        return {key: data.get(key) for key in ('subject', 'from', 'date', 'message_id')}
+    if kind == 'social':
+        return {
+            'platform': event.get('platform'),
+            'id': data.get('id'),
+            'text': (data.get('text') or data.get('message') or data.get('title') or '')[:280]
+        }
+    return {key: value for key, value in event.items() if key != 'type'}
+
+
+def _describe(kind: str, item: Dict[str, Any]) -> Tuple[str, str]:
+    if kind == 'email':
+        return f"New email from {item.get('from') or 'unknown sender'}", item.get('subject') or ''
+    if kind == 'social':
+        return f"New {(item.get('platform') or 'social').capitalize()} post", item.get('text') or ''
+    if kind == 'file':
+        return f"File {item.get('event')}", item.get('dest_path') or item.get('path') or ''
+    status = 'completed' if item.get('success') else 'failed'
+    return f"Task {status}", item.get('error') or f"{item.get('task_type')} task {item.get('task_id')}"
+
+
+DIGEST_TITLES = {
+    'email': '{count} new emails',
+    'social': '{count} new social posts',
+    'file': '{count} file changes',
+    'task': '{count} tasks finished'
+}
+
+
+class NotificationBatcher:
+    """Turn raw events into stored notifications, batching bursts into digests.
+
+    Events are grouped per kind. The first event of a group opens a window;
+    when it closes (or the group reaches ``max_batch``) a single event
+    becomes one notification and several become one digest listing up to
+    ``digest_items`` of them. Each stored notification is passed to
+    ``deliver``.
+    """
+
+    def __init__(self,
+                 store: NotificationStore,
+                 deliver: Callable[[Dict[str, Any]], Awaitable[None]],
+                 window: float = 5.0,
+                 max_batch: int = 100,
+                 digest_items: int = 20):
+        self.store = store
+        self.deliver = deliver
+        self.window = window
+        self.max_batch = max_batch
+        self.digest_items = digest_items
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+
+    def submit(self, event: Dict[str, Any]) -> None:
+        kind = KINDS.get(event.get('type'))
+        if kind is None:
+            return
+        batch = self._pending.setdefault(kind, [])
+        batch.append(_summary(event))
+        if len(batch) >= self.max_batch:
+            timer = self._timers.pop(kind, None)
+            if timer:
+                timer.cancel()
+            self._timers[kind] = asyncio.create_task(self._flush(kind))
+        elif kind not in self._timers:
+            self._timers[kind] = asyncio.create_task(self._flush(kind, self.window))
+
+    async def _flush(self, kind: str, delay: float = 0) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+        self._timers.pop(kind, None)
+        batch = self._pending.pop(kind, [])
+        if not batch:
+            return
+        if len(batch) == 1:
+            title, message = _describe(kind, batch[0])
+            notification = await asyncio.to_thread(self.store.append, kind, title, message, batch[0])
+        else:
+            shown = batch[:self.digest_items]
+            lines = [' - '.join(part for part in _describe(kind, item) if part) for item in shown]
+            if len(batch) > len(shown):
+                lines.append(f"and {len(batch) - len(shown)} more")
+            notification = await asyncio.to_thread(
+                self.store.append,
+                kind,
+                DIGEST_TITLES[kind].format(count=len(batch)),
+                '\n'.join(lines),
+                {'items': shown, 'digest': True},
+                count=len(batch)
+            )
+        try:
+            await self.deliver(notification)
+        except Exception as e:
+            logger.error(f"Error delivering notification {notification['id']}: {str(e)}")
+
+    async def stop(self) -> None:
+        """Flush every open batch immediately"""
+        for timer in self._timers.values():
+            timer.cancel()
+        await asyncio.gather(*self._timers.values(), return_exceptions=True)
+        self._timers = {}
+        for kind in list(self._pending):
+            await self._flush(kind)
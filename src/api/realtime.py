@@ -0,0 +1,238 @@
+import json
+import asyncio
+import logging
+import itertools
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Iterable, Set, Hashable, Tuple
+
+from fastapi import WebSocket
+
+from ..core.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_CLIENTS = gauge('websocket_clients', "Connected WebSocket clients")
+WEBSOCKET_BACKLOG = gauge('websocket_backlog', "Messages queued for WebSocket clients, summed over clients")
+WEBSOCKET_MAX_BACKLOG = gauge('websocket_max_backlog', "Messages queued for the most backlogged client")
+WEBSOCKET_DROPPED = counter('websocket_dropped_total', "Messages dropped from full client queues", ('policy',))
+
+TOPICS = ('nas', 'email', 'social', 'task', 'notification')
+
+# What a client queue does once it holds max_queue messages
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+COALESCE = 'coalesce'
+POLICIES = (DROP_OLDEST, DROP_NEWEST, COALESCE)
+
+
+def event_topic(event: Dict[str, Any]) -> str:
+    """Topic of an event from its type, e.g. nas_event -> nas"""
+    return event.get('type', '').split('_', 1)[0]
+
+
+def coalesce_key(event: Dict[str, Any]) -> Optional[Hashable]:
+    """Key under which a newer event supersedes a queued one.
+
+    Only NAS events describe state (the latest event for a path is all a
+    client needs); email, social and task events are each delivered. Moves
+    touch two paths and are never superseded.
+    """
+    if event_topic(event) == 'nas' and event.get('path') and event.get('event') != 'moved':
+        return ('nas', event['path'])
+    return None
+
+
+def coalesce_barrier(event: Dict[str, Any]) -> Tuple[Hashable, ...]:
+    """Keys whose queued events a later event must not supersede.
+
+    A move of a path has to reach the client after the events queued for
+    it before the move, so those stop being replaceable.
+    """
+    if event_topic(event) == 'nas' and event.get('event') == 'moved':
+        return tuple(('nas', path) for path in (event.get('path'), event.get('dest_path')) if path)
+    return ()
+
+
+class ClientConnection:
+    """One WebSocket client with a bounded send queue and its own sender task.
+
+    Broadcasting only enqueues, so a slow client fills its own queue instead
+    of stalling everyone else. When the queue is full the policy decides:
+    drop the oldest or the newest message, or (coalesce) drop a queued
+    message with the same key, falling back to the oldest. Below the limit
+    every message is queued, in order.
+    """
+
+    def __init__(self,
+                 websocket: WebSocket,
+                 topics: Iterable[str] = TOPICS,
+                 max_queue: int = 256,
+                 policy: str = DROP_OLDEST,
+                 send_timeout: float = 10.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.websocket = websocket
+        self.topics: Set[str] = set(topics)
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.dropped = 0
+        self.closed = False
+        self._queue: 'OrderedDict[int, Tuple[Optional[Hashable], str]]' = OrderedDict()
+        # Coalesce key -> queue ID of the latest replaceable message with it
+        self._keyed: Dict[Hashable, int] = {}
+        self._ids = itertools.count()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def backlog(self) -> int:
+        """Messages queued but not yet sent"""
+        return len(self._queue)
+
+    @property
+    def capacity(self) -> int:
+        """Messages that can still be queued without dropping any"""
+        return max(self.max_queue - len(self._queue), 0)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._send_loop())
+
+    async def stop(self) -> None:
+        self.closed = True
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def enqueue(self, message: str, key: Optional[Hashable] = None,
+                barrier: Iterable[Hashable] = ()) -> None:
+        """Queue a serialized message without waiting.
+
+        ``key`` lets a later message with the same key supersede this one
+        under the coalesce policy; ``barrier`` lists keys whose queued
+        messages must no longer be superseded.
+        """
+        if self.closed:
+            return
+        for barrier_key in barrier:
+            self._keyed.pop(barrier_key, None)
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            WEBSOCKET_DROPPED.labels(self.policy).inc()
+            if self.policy == DROP_NEWEST:
+                return
+            superseded = self._keyed.pop(key, None) if self.policy == COALESCE and key is not None else None
+            if superseded is not None:
+                # The newer message goes at the end, after everything queued before it
+                del self._queue[superseded]
+            else:
+                self._pop()
+        message_id = next(self._ids)
+        self._queue[message_id] = (key, message)
+        if key is not None and self.policy == COALESCE:
+            self._keyed[key] = message_id
+        self._ready.set()
+
+    def _pop(self) -> str:
+        message_id, (key, message) = self._queue.popitem(last=False)
+        if key is not None and self._keyed.get(key) == message_id:
+            del self._keyed[key]
+        return message
+
+    async def _send_loop(self) -> None:
+        while not self.closed:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._queue and not self.closed:
+                message = self._pop()
+                try:
+                    await asyncio.wait_for(self.websocket.send_text(message), self.send_timeout)
+                except Exception as e:
+                    logger.info(f"Dropping WebSocket client: {str(e) or type(e).__name__}")
+                    self.closed = True
+                    await self._close_socket()
+                    return
+
+    async def _close_socket(self) -> None:
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+
+class ConnectionManager:
+    """Fan events out to WebSocket clients by topic.
+
+    Each event is serialized once and handed to the queue of every client
+    subscribed to its topic; per-client sender tasks deliver concurrently.
+    """
+
+    def __init__(self, max_queue: int = 256, send_timeout: float = 10.0):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.active_connections: List[ClientConnection] = []
+        WEBSOCKET_CLIENTS.set_function(lambda: len(self.active_connections))
+        WEBSOCKET_BACKLOG.set_function(lambda: sum(client.backlog for client in self.active_connections))
+        WEBSOCKET_MAX_BACKLOG.set_function(
+            lambda: max((client.backlog for client in self.active_connections), default=0)
+        )
+
+    async def connect(self,
+                      websocket: WebSocket,
+                      topics: Optional[Iterable[str]] = None,
+                      policy: str = DROP_OLDEST) -> ClientConnection:
+        await websocket.accept()
+        client = ClientConnection(
+            websocket,
+            topics=[topic for topic in topics if topic in TOPICS] if topics else TOPICS,
+            max_queue=self.max_queue,
+            policy=policy,
+            send_timeout=self.send_timeout
+        )
+        client.start()
+        self.active_connections.append(client)
+        return client
+
+    async def disconnect(self, client: ClientConnection) -> None:
+        if client in self.active_connections:
+            self.active_connections.remove(client)
+        await client.stop()
+
+    def broadcast(self, topic: str, message: str, key: Optional[Hashable] = None,
+                  barrier: Iterable[Hashable] = ()) -> int:
+        """Queue a serialized message for every subscriber; returns the recipient count"""
+        recipients = 0
+        for client in list(self.active_connections):
+            if client.closed:
+                self.active_connections.remove(client)
+            elif topic in client.topics:
+                client.enqueue(message, key, barrier)
+                recipients += 1
+        return recipients
+
+    def publish(self, event: Dict[str, Any]) -> int:
+        """Serialize an event once and broadcast it on its topic"""
+        return self.broadcast(event_topic(event), json.dumps(event, default=str),
+                              coalesce_key(event), coalesce_barrier(event))
+
+    async def handle_message(self, client: ClientConnection, data: str) -> None:
+        """Apply a subscribe/unsubscribe request from a client"""
+        try:
+            message = json.loads(data)
+            action = message['type']
+            topics = {topic for topic in message.get('topics', []) if topic in TOPICS}
+        except (ValueError, KeyError, TypeError):
+            client.enqueue(json.dumps({"type": "error", "detail": "Invalid message"}))
+            return
+        if action == 'subscribe':
+            client.topics |= topics
+        elif action == 'unsubscribe':
+            client.topics -= topics
+        else:
+            client.enqueue(json.dumps({"type": "error", "detail": f"Unknown message type: {action}"}))
+            return
+        client.enqueue(json.dumps({"type": "subscribed", "topics": sorted(client.topics)}))
+
+    async def close(self) -> None:
+        for client in list(self.active_connections):
+            await self.disconnect(client)
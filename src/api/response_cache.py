@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable, Set
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTLS = {
+    'nas_files': 30.0,
+    'email_messages': 60.0,
+    'twitter_timeline': 120.0,
+    'facebook_feed': 120.0
+}
+
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    etag: str
+    fetched_at: float
+    # Directory a NAS listing covers, used to match change events
+    scope: Optional[str] = None
+
+
+def _serialize(value: Any) -> Tuple[bytes, str]:
+    body = json.dumps(jsonable_encoder(value), separators=(',', ':')).encode('utf-8')
+    return body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+class ResponseCache:
+    """Serialized read-endpoint responses with per-endpoint TTLs.
+
+    Within its TTL an entry is served as is. For ``stale_while_revalidate``
+    seconds after that it is still served, while a single background fetch
+    refreshes it; past that, callers wait for a fetch. Concurrent misses for
+    the same key share one upstream call. Monitor events invalidate entries
+    (including fetches already in flight, whose results are then served once
+    but not cached).
+    """
+
+    def __init__(self,
+                 ttls: Optional[Dict[str, float]] = None,
+                 stale_while_revalidate: float = 300.0,
+                 max_entries: int = 1000):
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple, CacheEntry]' = OrderedDict()
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        self._scopes: Dict[Tuple, Optional[str]] = {}
+        self._dirty: Set[Tuple] = set()
+        # Told about invalidations made here, e.g. to forward them to other workers
+        self.on_invalidate: Optional[Callable[[str, Optional[str]], None]] = None
+
+    async def get(self,
+                  endpoint: str,
+                  params: Tuple,
+                  fetch: Callable[[], Awaitable[Any]],
+                  scope: Optional[str] = None,
+                  cacheable: Optional[Callable[[Any], bool]] = None) -> Tuple[CacheEntry, str]:
+        """The response for (endpoint, params) and how it was served: hit, stale or miss.
+
+        ``cacheable`` can reject a fetched value, which is then served once
+        but not kept (e.g. an incomplete listing).
+        """
+        key = (endpoint, params)
+        ttl = self.ttls.get(endpoint, 0)
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < ttl:
+                self._entries.move_to_end(key)
+                return entry, 'hit'
+            if age < ttl + self.stale_while_revalidate:
+                self._entries.move_to_end(key)
+                if key not in self._inflight:
+                    self._start_fetch(key, fetch, scope, cacheable).add_done_callback(self._log_refresh_error)
+                return entry, 'stale'
+        task = self._inflight.get(key) or self._start_fetch(key, fetch, scope, cacheable)
+        return await asyncio.shield(task), 'miss'
+
+    def _start_fetch(self, key: Tuple, fetch, scope: Optional[str], cacheable=None) -> asyncio.Task:
+        task = asyncio.create_task(self._fetch(key, fetch, scope, cacheable))
+        self._inflight[key] = task
+        self._scopes[key] = scope
+        return task
+
+    async def _fetch(self, key: Tuple, fetch, scope: Optional[str], cacheable=None) -> CacheEntry:
+        try:
+            value = await fetch()
+            body, etag = _serialize(value)
+            entry = CacheEntry(body, etag, time.monotonic(), scope)
+            if key in self._dirty or not self.ttls.get(key[0], 0) or (cacheable and not cacheable(value)):
+                # Invalidated while fetching (or caching disabled): serve, don't keep
+                self._entries.pop(key, None)
+            else:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return entry
+        finally:
+            self._inflight.pop(key, None)
+            self._scopes.pop(key, None)
+            self._dirty.discard(key)
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Background cache refresh failed: {str(task.exception())}")
+
+    def invalidate(self, endpoint: str, scope_prefix: Optional[str] = None, propagate: bool = True) -> int:
+        """Drop an endpoint's entries, or only those whose scope contains scope_prefix"""
+        if propagate and self.on_invalidate:
+            self.on_invalidate(endpoint, scope_prefix)
+        def matches(key: Tuple, scope: Optional[str]) -> bool:
+            if key[0] != endpoint:
+                return False
+            if scope_prefix is None or scope is None:
+                return True
+            # A listing of a directory or any of its ancestors (recursive) may change
+            return scope == '' or scope_prefix == scope or scope_prefix.startswith(scope + '/')
+
+        stale = [key for key, entry in self._entries.items() if matches(key, entry.scope)]
+        for key in stale:
+            del self._entries[key]
+        self._dirty.update(key for key, scope in self._scopes.items() if matches(key, scope))
+        return len(stale)
+
+    def invalidate_event(self,
+                         event: Dict[str, Any],
+                         nas_root: Optional[str] = None,
+                         propagate: bool = True) -> None:
+        """Invalidate whatever a monitor event may have changed.
+
+        NAS events carry absolute paths; ``nas_root`` (the mount point) maps
+        them back to the share-relative paths listings are cached under.
+        """
+        event_type = event.get('type')
+        if event_type == 'nas_event':
+            for path in (event.get('path'), event.get('dest_path')):
+                if not path:
+                    continue
+                relative = os.path.relpath(path, nas_root) if nas_root else path
+                if relative.startswith('..'):
+                    continue
+                self.invalidate('nas_files', _parent(relative), propagate)
+        elif event_type == 'email_event':
+            self.invalidate('email_messages', propagate=propagate)
+        elif event_type == 'social_event':
+            endpoint = {'twitter': 'twitter_timeline', 'facebook': 'facebook_feed'}.get(event.get('platform'))
+            if endpoint:
+                self.invalidate(endpoint, propagate=propagate)
+
+    def respond(self, request: Request, entry: CacheEntry, status: str) -> Response:
+        """A 304 if the client already has this version, else the cached body"""
+        headers = {
+            'ETag': entry.etag,
+            'Cache-Control': f"private, max-age=0, stale-while-revalidate={int(self.stale_while_revalidate)}",
+            'X-Cache': status
+        }
+        # If-None-Match uses weak comparison, so W/ prefixes are ignored
+        client_tags = {tag.strip().removeprefix('W/')
+                       for tag in request.headers.get('if-none-match', '').split(',')}
+        if entry.etag in client_tags or '*' in client_tags:
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type='application/json', headers=headers)
+
+
+def _parent(path: str) -> str:
+    path = path.strip('/')
+    if path in ('', '.'):
+        return ''
+    return path.rsplit('/', 1)[0] if '/' in path else ''
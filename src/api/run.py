@@ -1,5 +1,7 @@
+import os
 import uvicorn
 import logging
+import argparse
 from .config import load_config, get_api_config
 
 # Configure logging
@@ -9,18 +11,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the assistant API")
+    parser.add_argument('--detect-stalls', type=float, nargs='?', const=0.1, metavar='SECONDS',
+                        help="log event-loop stalls longer than SECONDS (default 0.1) with their stack")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="sample the whole run and write folded stacks to PATH on shutdown")
+    parser.add_argument('--profile-endpoint', action='store_true',
+                        help="enable GET /debug/profile for on-demand profiles")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Worker processes load the config themselves, so flags travel as environment variables
+    if args.detect_stalls is not None:
+        os.environ['STALL_THRESHOLD'] = str(args.detect_stalls)
+    if args.profile:
+        os.environ['PROFILE_OUTPUT'] = os.path.abspath(args.profile)
+    if args.profile_endpoint:
+        os.environ['PROFILE_ENDPOINT'] = 'true'
+    
     # Load configuration
     config = load_config()
     api_config = get_api_config(config)
     
+    # Several workers share monitors through leader election and an event bus
+    workers = api_config.get('workers', 1)
+    if workers > 1 and api_config['debug']:
+        logger.warning("Reload is not supported with multiple workers; starting one worker")
+        workers = 1
+    
     # Start server
     uvicorn.run(
         "api.main:app",
         host=api_config['host'],
         port=api_config['port'],
-        reload=api_config['debug']
+        reload=api_config['debug'],
+        workers=workers
     )
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main() 
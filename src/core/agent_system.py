@@ -1,14 +1,26 @@
-from typing import Dict, List, Any, Optional, Protocol
+from typing import Dict, List, Any, Optional, Protocol, Callable, Awaitable
 from abc import ABC, abstractmethod
 import logging
 from datetime import datetime
+import time
 import asyncio
 from dataclasses import dataclass
 from .llm_engine import LLMEngine
+from .metrics import histogram, counter, gauge
+from .tracing import span
 from ..memory.memory_system import MemorySystem
+from ..memory.document_index import DocumentIndexer
+from ..memory.text_extraction import ExtractionPipeline
+from ..integrations.email_store import EmailMetadataStore
+from ..integrations.email_threading import ThreadIndex, prefix_hash
 
 logger = logging.getLogger(__name__)
 
+AGENT_TASKS = counter('agent_tasks_total', "Tasks processed by the agent system", ('agent', 'status'))
+AGENT_TASK_SECONDS = histogram('agent_task_seconds', "Task execution time", ('agent',))
+AGENT_QUEUE_WAIT_SECONDS = histogram('agent_queue_wait_seconds', "Time tasks spent queued before a worker took them")
+AGENT_QUEUE_DEPTH = gauge('agent_queue_depth', "Tasks waiting in the agent queue")
+
 @dataclass
 class Task:
     id: str
@@ -27,19 +39,86 @@ class TaskResult:
     completed_at: datetime = datetime.utcnow()
 
 class BaseAgent(ABC):
-    def __init__(self, llm_engine: LLMEngine, memory: MemorySystem):
+    def __init__(self, llm_engine: LLMEngine, memory: MemorySystem,
+                 config: Optional[Dict[str, Any]] = None):
         self.llm = llm_engine
         self.memory = memory
+        self.config = config or {}
     
     @abstractmethod
     async def execute(self, task: Task) -> TaskResult:
         pass
 
 class EmailAgent(BaseAgent):
+    def __init__(self, llm_engine: LLMEngine, memory: MemorySystem,
+                 config: Optional[Dict[str, Any]] = None):
+        super().__init__(llm_engine, memory, config)
+        self._threads: Optional[ThreadIndex] = None
+    
+    @property
+    def threads(self) -> ThreadIndex:
+        if self._threads is None:
+            store = EmailMetadataStore(self.config.get('index_path', './data/email_index.db'))
+            self._threads = ThreadIndex(store)
+        return self._threads
+    
+    def _format_messages(self, messages: List[Dict[str, Any]]) -> str:
+        max_chars = self.config.get('max_message_chars', 4000)
+        return "\n\n".join(
+            f"From: {message['from']}\nDate: {message['date']}\n"
+            f"Subject: {message['subject']}\n\n{(message['body'] or '')[:max_chars]}"
+            for message in messages
+        )
+    
+    async def summarize_thread(self, account: str, thread_id: str) -> Dict[str, Any]:
+        """Summarize a thread, reusing the cached summary of its earlier messages"""
+        messages = self.threads.get_thread(account, thread_id)
+        if not messages:
+            raise ValueError(f"Unknown thread: {thread_id}")
+        message_ids = [message['message_id'] for message in messages]
+        
+        cached = self.threads.get_summary(account, thread_id)
+        reused = 0
+        if cached and cached['message_count'] <= len(messages) and \
+                cached['prefix_hash'] == prefix_hash(message_ids[:cached['message_count']]):
+            reused = cached['message_count']
+            if reused == len(messages):
+                return {'thread_id': thread_id, 'summary': cached['summary'],
+                        'message_count': reused, 'reused_messages': reused}
+            prompt = (
+                "Here is a summary of the earlier messages in an email thread:\n\n"
+                f"{cached['summary']}\n\n"
+                "Update the summary to include these newer messages:\n\n"
+                f"{self._format_messages(messages[reused:])}"
+            )
+        else:
+            prompt = (
+                "Summarize the following email thread, noting decisions, "
+                "open questions and action items:\n\n"
+                f"{self._format_messages(messages)}"
+            )
+        
+        summary = await asyncio.to_thread(self.llm.generate_response, prompt)
+        self.threads.save_summary(account, thread_id, message_ids, summary)
+        return {'thread_id': thread_id, 'summary': summary,
+                'message_count': len(messages), 'reused_messages': reused}
+    
     async def execute(self, task: Task) -> TaskResult:
         try:
-            # Implement email processing logic
-            pass
+            action = task.parameters.get('action')
+            if action == 'summarize_thread':
+                account = task.parameters['account']
+                thread_id = task.parameters.get('thread_id') or \
+                    self.threads.thread_for_message(account, task.parameters['message_id'])
+                result = await self.summarize_thread(account, thread_id)
+            else:
+                raise ValueError(f"Unsupported email action: {action}")
+            
+            return TaskResult(
+                task_id=task.id,
+                success=True,
+                result=result
+            )
         except Exception as e:
             logger.error(f"Email agent error: {str(e)}")
             return TaskResult(
@@ -50,10 +129,68 @@ class EmailAgent(BaseAgent):
             )
 
 class DocumentAgent(BaseAgent):
+    def __init__(self, llm_engine: LLMEngine, memory: MemorySystem,
+                 config: Optional[Dict[str, Any]] = None):
+        super().__init__(llm_engine, memory, config)
+        self._indexer: Optional[DocumentIndexer] = None
+    
+    @property
+    def indexer(self) -> DocumentIndexer:
+        if self._indexer is None:
+            ocr = self.config.get('ocr', {})
+            pipeline = ExtractionPipeline(
+                cache_path=ocr.get('cache_path', './data/extraction_cache.db'),
+                workers=ocr.get('workers'),
+                ocr=ocr.get('enabled', True),
+                language=ocr.get('language', 'eng'),
+                dpi=ocr.get('dpi', 300),
+                min_text_chars=ocr.get('min_text_chars', 20),
+                pages_per_task=ocr.get('pages_per_task', 4)
+            )
+            self._indexer = DocumentIndexer(
+                self.memory,
+                manifest_path=self.config.get('manifest_path', './data/document_manifest.db'),
+                chunk_size=self.config.get('chunk_size', 1000),
+                supported_formats=self.config.get('supported_formats'),
+                extractor=pipeline,
+                # Enough files in flight to keep every worker process busy
+                extract_concurrency=pipeline.workers
+            )
+        return self._indexer
+    
+    def close(self) -> None:
+        if self._indexer is not None and isinstance(self._indexer.extractor, ExtractionPipeline):
+            self._indexer.extractor.close()
+    
     async def execute(self, task: Task) -> TaskResult:
         try:
-            # Implement document processing logic
-            pass
+            action = task.parameters.get('action')
+            if action == 'index':
+                directories = task.parameters.get('directories') or \
+                    self.config.get('watch_directories', [])
+                result = await asyncio.to_thread(self.indexer.scan, directories)
+            elif action == 'index_file':
+                result = await asyncio.to_thread(self.indexer.index_file, task.parameters['file_path'])
+            elif action == 'remove_file':
+                result = await asyncio.to_thread(self.indexer.remove_file, task.parameters['file_path'])
+            elif action == 'extract':
+                result = await asyncio.to_thread(
+                    self.indexer.extractor.extract, task.parameters['file_path']
+                )
+            elif action == 'search':
+                result = await asyncio.to_thread(
+                    self.indexer.search,
+                    task.parameters['query'],
+                    task.parameters.get('limit', 5)
+                )
+            else:
+                raise ValueError(f"Unsupported document action: {action}")
+            
+            return TaskResult(
+                task_id=task.id,
+                success=True,
+                result=result
+            )
         except Exception as e:
             logger.error(f"Document agent error: {str(e)}")
             return TaskResult(
@@ -77,54 +214,85 @@ class SocialMediaAgent(BaseAgent):
                 error=str(e)
             )
 
+class TaskQueue(asyncio.Queue):
+    """asyncio.Queue that records how long each item waited"""
+    
+    def _put(self, item) -> None:
+        super()._put((time.perf_counter(), item))
+    
+    def _get(self):
+        enqueued, item = super()._get()
+        AGENT_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - enqueued)
+        return item
+
 class AgentSystem:
-    def __init__(self, llm_engine: LLMEngine, memory: MemorySystem):
+    def __init__(self, llm_engine: LLMEngine, memory: MemorySystem,
+                 config: Optional[Dict[str, Any]] = None,
+                 on_result: Optional[Callable[[Task, TaskResult], Awaitable[None]]] = None):
         self.llm = llm_engine
+        self.on_result = on_result
         self.memory = memory
+        self.config = config or {}
         self.agents = self._initialize_agents()
-        self.task_queue = asyncio.Queue()
+        self.task_queue = TaskQueue()
+        AGENT_QUEUE_DEPTH.set_function(self.task_queue.qsize)
         self.running = False
+        self._worker: Optional[asyncio.Task] = None
     
     def _initialize_agents(self) -> Dict[str, BaseAgent]:
         return {
-            "email": EmailAgent(self.llm, self.memory),
-            "document": DocumentAgent(self.llm, self.memory),
-            "social_media": SocialMediaAgent(self.llm, self.memory)
+            "email": EmailAgent(self.llm, self.memory, self.config.get('email')),
+            "document": DocumentAgent(self.llm, self.memory, self.config.get('document')),
+            "social_media": SocialMediaAgent(self.llm, self.memory, self.config.get('social_media'))
         }
     
     async def start(self):
         self.running = True
-        asyncio.create_task(self._process_tasks())
+        self._worker = asyncio.create_task(self._process_tasks())
     
     async def stop(self):
-        self.running = False
-        # Wait for current tasks to complete
+        # Wait for queued tasks to complete, then stop the idle worker
         await self.task_queue.join()
+        self.running = False
+        if self._worker:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        await asyncio.to_thread(self.agents['document'].close)
     
     async def _process_tasks(self):
         while self.running:
+            task = await self.task_queue.get()
             try:
-                task = await self.task_queue.get()
                 agent = self.agents.get(task.type)
                 
                 if agent:
-                    result = await agent.execute(task)
-                    # Store result in memory
+                    with span('agent.task', task_id=task.id, agent=task.type) as current:
+                        with AGENT_TASK_SECONDS.labels(task.type).time():
+                            result = await agent.execute(task)
+                        current.set(success=result.success)
+                    AGENT_TASKS.labels(task.type, 'success' if result.success else 'failure').inc()
+                    # Store result in memory (metadata values may not be None)
                     self.memory.store_memory(
                         content=f"Task {task.id} completed with status {result.success}",
                         metadata={
                             "task_id": task.id,
                             "task_type": task.type,
                             "success": result.success,
-                            "error": result.error
+                            "error": result.error or ""
                         }
                     )
+                    if self.on_result:
+                        await self.on_result(task, result)
                 else:
+                    AGENT_TASKS.labels(task.type, 'unroutable').inc()
                     logger.error(f"No agent found for task type: {task.type}")
-                
-                self.task_queue.task_done()
             except Exception as e:
+                AGENT_TASKS.labels(task.type, 'error').inc()
                 logger.error(f"Error processing task: {str(e)}")
+            finally:
+                # stop() joins the queue, so every task must be marked done
+                self.task_queue.task_done()
     
     async def execute_task(self, task: Task) -> TaskResult:
         try:
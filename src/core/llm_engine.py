@@ -1,10 +1,17 @@
-from typing import Dict, List, Any, Optional
-import ollama
+from typing import Dict, List, Any, Optional, Iterator
+import time
+import threading
 from dataclasses import dataclass
 import logging
 
+from .metrics import histogram, counter
+
 logger = logging.getLogger(__name__)
 
+LLM_REQUEST_SECONDS = histogram('llm_request_seconds', "LLM call duration", ('model', 'operation'))
+LLM_FIRST_TOKEN_SECONDS = histogram('llm_first_token_seconds', "Time to the first streamed token", ('model',))
+LLM_ERRORS = counter('llm_errors_total', "Failed LLM calls", ('model', 'operation'))
+
 @dataclass
 class ModelConfig:
     model_name: str
@@ -34,16 +41,39 @@ class ContextManager:
         self.context = []
 
 class LLMEngine:
+    """Chat with a local Ollama model.
+
+    Construction does no I/O: the ollama client is imported and the model
+    checked (and pulled if missing) by ``ensure_model``, which the first
+    request calls unless it was run ahead of time.
+    """
+    
     def __init__(self, config: ModelConfig):
         self.config = config
         self.context_manager = ContextManager(max_tokens=config.context_window)
-        self._initialize_model()
+        self._model_ready = False
+        self._model_lock = threading.Lock()
+    
+    @staticmethod
+    def _model_names() -> List[str]:
+        import ollama
+        # Older clients return dicts keyed 'name', newer ones models keyed 'model'
+        return [model.get('model') or model.get('name') for model in ollama.list()['models']]
+    
+    def ensure_model(self) -> None:
+        """Make sure the configured model is available (blocking, once)"""
+        if self._model_ready:
+            return
+        with self._model_lock:
+            if not self._model_ready:
+                self._initialize_model()
+                self._model_ready = True
     
     def _initialize_model(self) -> None:
+        import ollama
         try:
             # Verify model is available
-            models = ollama.list()
-            if self.config.model_name not in [model['name'] for model in models['models']]:
+            if self.config.model_name not in self._model_names():
                 logger.info(f"Model {self.config.model_name} not found, pulling...")
                 ollama.pull(self.config.model_name)
         except Exception as e:
@@ -59,15 +89,18 @@ class LLMEngine:
             messages.append({"role": "user", "content": prompt})
             
             # Generate response
-            response = ollama.chat(
-                model=self.config.model_name,
-                messages=messages,
-                options={
-                    "temperature": self.config.temperature,
-                    "top_p": self.config.top_p,
-                    "top_k": self.config.top_k
-                }
-            )
+            self.ensure_model()
+            import ollama
+            with LLM_REQUEST_SECONDS.labels(self.config.model_name, 'chat').time():
+                response = ollama.chat(
+                    model=self.config.model_name,
+                    messages=messages,
+                    options={
+                        "temperature": self.config.temperature,
+                        "top_p": self.config.top_p,
+                        "top_k": self.config.top_k
+                    }
+                )
             
             # Update context
             self.context_manager.add_to_context("user", prompt)
@@ -75,13 +108,50 @@ class LLMEngine:
             
             return response['message']['content']
         except Exception as e:
+            LLM_ERRORS.labels(self.config.model_name, 'chat').inc()
             logger.error(f"Error generating response: {str(e)}")
             raise
     
+    def stream_response(self, prompt: str, context: Optional[List[Dict]] = None) -> Iterator[str]:
+        """Generate a response, yielding content as the model produces it"""
+        messages = list(context or [])
+        messages.append({"role": "user", "content": prompt})
+        parts = []
+        model = self.config.model_name
+        started = time.perf_counter()
+        try:
+            self.ensure_model()
+            import ollama
+            for chunk in ollama.chat(
+                model=self.config.model_name,
+                messages=messages,
+                stream=True,
+                options={
+                    "temperature": self.config.temperature,
+                    "top_p": self.config.top_p,
+                    "top_k": self.config.top_k
+                }
+            ):
+                content = chunk['message']['content']
+                if not parts:
+                    LLM_FIRST_TOKEN_SECONDS.labels(model).observe(time.perf_counter() - started)
+                parts.append(content)
+                yield content
+        except Exception as e:
+            LLM_ERRORS.labels(model, 'stream').inc()
+            logger.error(f"Error streaming response: {str(e)}")
+            raise
+        LLM_REQUEST_SECONDS.labels(model, 'stream').observe(time.perf_counter() - started)
+        
+        self.context_manager.add_to_context("user", prompt)
+        self.context_manager.add_to_context("assistant", ''.join(parts))
+    
     def switch_model(self, new_model: str) -> None:
         try:
-            self.config.model_name = new_model
-            self._initialize_model()
+            with self._model_lock:
+                self.config.model_name = new_model
+                self._model_ready = False
+            self.ensure_model()
             self.context_manager.clear_context()
         except Exception as e:
             logger.error(f"Error switching model: {str(e)}")
@@ -89,8 +159,7 @@ class LLMEngine:
     
     def get_available_models(self) -> List[str]:
         try:
-            models = ollama.list()
-            return [model['name'] for model in models['models']]
+            return self._model_names()
         except Exception as e:
             logger.error(f"Error getting available models: {str(e)}")
             raise 
\ No newline at end of file
@@ -0,0 +1,271 @@
+import re
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple
+
+from .llm_engine import LLMEngine
+from ..memory.memory_system import MemorySystem
+from ..memory.document_index import CHUNKS_COLLECTION
+from ..integrations.email_store import EmailMetadataStore
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r'\w+')
+
+# Left out of the lexical email search, where they would match every message
+STOPWORDS = frozenset('''
+a about after all also am an and any are as at be been before but by can could did do does
+for from had has have he her him his how i if in into is it its just me my no not of on or
+our out over she so some than that the their them then there these they this to up us was
+we were what when where which who why will with would you your
+'''.split())
+
+SYSTEM_PROMPT = (
+    "You are a personal assistant. Answer the user's question using the context "
+    "below when it is relevant, and say so when it does not contain the answer. "
+    "Cite sources by their [number].\n\nContext:\n{context}"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English)"""
+    return len(text) // 4 + 1
+
+
+def _normalize(text: str) -> str:
+    return ' '.join(WORD_RE.findall(text.lower()))
+
+
+def _shingles(text: str, size: int = 5) -> set:
+    words = text.split()
+    return {' '.join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+
+@dataclass
+class ContextItem:
+    source: str  # memory, email or document
+    content: str
+    score: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.content)
+
+
+@dataclass
+class ChatContext:
+    items: List[ContextItem]
+    candidates: int
+    duplicates: int
+    tokens: int
+    timings: Dict[str, float]
+
+
+class RAGPipeline:
+    """Retrieval-augmented answering over memories, email and NAS documents.
+
+    The query is embedded once; memory and document-chunk searches reuse
+    the embedding and run in worker threads concurrently with a lexical
+    search over recently synced email in the local index. Candidates are
+    merged by score (normalized per source, so the best hit of each source
+    scores 1), near-duplicates (the same text reached through two
+    sources, or overlapping chunks) are dropped, and the rest are packed
+    greedily into the context token budget. Every stage is timed.
+    """
+
+    def __init__(self,
+                 llm: LLMEngine,
+                 memory: MemorySystem,
+                 email_store: Optional[EmailMetadataStore] = None,
+                 config: Optional[Dict[str, Any]] = None):
+        self.llm = llm
+        self.memory = memory
+        self.email_store = email_store
+        self.config = config or {}
+        self.memory_limit = self.config.get('memory_results', 8)
+        self.document_limit = self.config.get('document_results', 12)
+        self.email_limit = self.config.get('email_results', 8)
+        self.email_scan = self.config.get('email_scan', 500)
+        self.max_item_chars = self.config.get('max_item_chars', 4000)
+        self.answer_tokens = self.config.get('answer_tokens', 1024)
+        self.duplicate_threshold = self.config.get('duplicate_threshold', 0.8)
+
+    async def _timed(self, timings: Dict[str, float], stage: str, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await asyncio.to_thread(func, *args, **kwargs)
+        finally:
+            timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+
+    def _search_memory(self, query: str, embedding: List[float]) -> List[ContextItem]:
+        return [ContextItem('memory', result['content'], 1 / (1 + result['similarity']), {
+            'id': result['id'], **(result['metadata'] or {})
+        }) for result in self.memory.retrieve_memory(query, self.memory_limit, query_embedding=embedding)]
+
+    def _search_documents(self, query: str, embedding: List[float]) -> List[ContextItem]:
+        return [ContextItem('document', result['content'], 1 / (1 + result['similarity']), {
+            'id': result['id'], **(result['metadata'] or {})
+        }) for result in self.memory.query_documents(
+            CHUNKS_COLLECTION, query, self.document_limit, query_embedding=embedding
+        )]
+
+    def _search_email(self, query: str) -> List[ContextItem]:
+        """Rank recent messages by the share of query terms (not stopwords) they contain"""
+        terms = set(WORD_RE.findall(query.lower())) - STOPWORDS
+        if not terms:
+            return []
+        scored = []
+        for message in self.email_store.recent_messages(self.email_scan):
+            text = f"{message['subject'] or ''}\n{message['body'] or ''}"
+            words = set(WORD_RE.findall(text.lower()))
+            score = len(terms & words) / len(terms)
+            if score > 0:
+                scored.append((score, message, text))
+        scored.sort(key=lambda entry: entry[0], reverse=True)
+        return [ContextItem('email', f"From: {message['from']}\nDate: {message['date']}\n{text}", score, {
+            'message_id': message['message_id'],
+            'account': message['account'],
+            'subject': message['subject']
+        }) for score, message, text in scored[:self.email_limit]]
+
+    async def retrieve(self, query: str, budget: int) -> ChatContext:
+        """Gather, deduplicate and pack context for a query within budget tokens"""
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        async def semantic() -> List[ContextItem]:
+            embedding = await self._timed(timings, 'embed', self.memory.embed, query)
+            results = await asyncio.gather(
+                self._timed(timings, 'memory', self._search_memory, query, embedding),
+                self._timed(timings, 'documents', self._search_documents, query, embedding),
+                return_exceptions=True
+            )
+            return self._collect(results, ('memory', 'documents'))
+
+        searches = [semantic()]
+        if self.email_store is not None:
+            searches.append(self._timed(timings, 'email', self._search_email, query))
+        results = await asyncio.gather(*searches, return_exceptions=True)
+        candidates = self._collect(results, ('semantic', 'email'))
+        timings['retrieve'] = round((time.perf_counter() - start) * 1000, 2)
+
+        stage = time.perf_counter()
+        unique = self._deduplicate(candidates)
+        timings['dedup'] = round((time.perf_counter() - stage) * 1000, 2)
+
+        stage = time.perf_counter()
+        packed, tokens = self._pack(unique, budget)
+        timings['pack'] = round((time.perf_counter() - stage) * 1000, 2)
+        return ChatContext(packed, len(candidates), len(candidates) - len(unique), tokens, timings)
+
+    @staticmethod
+    def _collect(results, names) -> List[ContextItem]:
+        """Merge the results of several sources, scaling each source's scores to its best"""
+        items: List[ContextItem] = []
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                # One unavailable source should not fail the whole answer
+                logger.warning(f"Context source {name} failed: {str(result)}")
+                continue
+            # Distances and term shares are not on the same scale
+            best = max((item.score for item in result), default=0)
+            for item in result:
+                item.score = item.score / best if best > 0 else 0.0
+            items.extend(result)
+        return items
+
+    def _deduplicate(self, items: List[ContextItem]) -> List[ContextItem]:
+        """Best-scoring copy of each distinct text; near-duplicates by shingle overlap"""
+        kept: List[Tuple[ContextItem, set]] = []
+        hashes = set()
+        for item in sorted(items, key=lambda item: item.score, reverse=True):
+            normalized = _normalize(item.content)
+            digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+            if not normalized or digest in hashes:
+                continue
+            shingles = _shingles(normalized)
+            if any(len(shingles & other) / min(len(shingles), len(other)) >= self.duplicate_threshold
+                   for _, other in kept):
+                continue
+            hashes.add(digest)
+            kept.append((item, shingles))
+        return [item for item, _ in kept]
+
+    def _pack(self, items: List[ContextItem], budget: int) -> Tuple[List[ContextItem], int]:
+        """Greedily take items by score while they fit; long items are truncated"""
+        packed: List[ContextItem] = []
+        used = 0
+        for item in items:
+            if len(item.content) > self.max_item_chars:
+                item.content = item.content[:self.max_item_chars]
+            if used + item.tokens > budget:
+                continue
+            packed.append(item)
+            used += item.tokens
+        return packed, used
+
+    def build_messages(self,
+                       context: ChatContext,
+                       history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+        blocks = [f"[{i}] ({item.source}) {item.content}" for i, item in enumerate(context.items, 1)]
+        messages = [{"role": "system", "content": SYSTEM_PROMPT.format(context='\n\n'.join(blocks) or '(none)')}]
+        return messages + list(history or [])
+
+    def context_budget(self, message: str, history: Optional[List[Dict[str, str]]] = None) -> int:
+        """Tokens left for context after the prompt, history and the answer"""
+        used = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(message)
+        used += sum(estimate_tokens(turn.get('content', '')) for turn in history or [])
+        return max(self.llm.config.context_window - self.answer_tokens - used, 0)
+
+    async def stream_answer(self,
+                            message: str,
+                            messages: List[Dict[str, str]],
+                            timings: Dict[str, float]) -> AsyncIterator[str]:
+        """Stream the model's answer from a worker thread as it is generated"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        cancelled = threading.Event()
+        start = time.perf_counter()
+
+        def hand_over(item) -> bool:
+            # The loop may be closed under a still-running model, e.g. at shutdown
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+                return True
+            except RuntimeError:
+                return False
+
+        def produce() -> None:
+            stream = self.llm.stream_response(message, messages)
+            try:
+                for part in stream:
+                    if cancelled.is_set() or not hand_over(part):
+                        break
+            except Exception as e:
+                hand_over(e)
+            finally:
+                # Closing the generator ends the model's response stream
+                stream.close()
+                hand_over(done)
+
+        loop.run_in_executor(None, produce)
+        try:
+            while True:
+                part = await queue.get()
+                if part is done:
+                    break
+                if isinstance(part, Exception):
+                    raise part
+                if 'first_token' not in timings:
+                    timings['first_token'] = round((time.perf_counter() - start) * 1000, 2)
+                yield part
+        finally:
+            # Set when the consumer stops early, e.g. the client disconnected
+            cancelled.set()
+            timings['generate'] = round((time.perf_counter() - start) * 1000, 2)
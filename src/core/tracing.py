@@ -0,0 +1,98 @@
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, List, Optional
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start: float = 0.0
+    duration: float = 0.0
+    status: str = 'ok'
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class _NullSpan:
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Minimal in-process tracer.
+
+    Spans nest through a context variable, so work started from inside a
+    span (including awaited coroutines and tasks created there) becomes
+    its child. Finished spans are kept in a bounded buffer for the
+    ``/traces`` endpoint. Disabled by default; then ``span`` yields a
+    shared no-op object and records nothing.
+    """
+
+    def __init__(self, buffer_size: int = 1000):
+        self.enabled = False
+        self._finished: deque = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, buffer_size: int = 1000) -> None:
+        self.enabled = enabled
+        with self._lock:
+            if buffer_size != self._finished.maxlen:
+                self._finished = deque(self._finished, maxlen=buffer_size)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any):
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            start=time.time(),
+            attributes=attributes
+        )
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = 'error'
+            span.attributes.setdefault('error', f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            with self._lock:
+                self._finished.append(span)
+
+    def recent(self, limit: int = 100, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent finished spans first, optionally for one trace"""
+        with self._lock:
+            spans = list(self._finished)
+        if trace_id:
+            spans = [span for span in spans if span.trace_id == trace_id]
+        return [span.to_dict() for span in reversed(spans[-limit:])]
+
+
+TRACER = Tracer()
+span = TRACER.span
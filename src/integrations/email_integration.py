@@ -2,15 +2,67 @@ import imaplib
 import email
 import logging
 from typing import List, Dict, Any, Optional
-from email.header import decode_header
 import asyncio
+import threading
 from datetime import datetime, timedelta
 import re
+from .mime_parser import StreamingMimeParser, AttachmentStore, decode_header_value
+from .email_store import EmailMetadataStore
+from .email_threading import ThreadIndex
+from ..core.metrics import histogram
 
 logger = logging.getLogger(__name__)
 
+IMAP_COMMAND_SECONDS = histogram('imap_command_seconds', "IMAP round trip per command", ('command',))
+
+# Bulk actions that map onto a single UID STORE
+FLAG_ACTIONS = {
+    'read': ('+FLAGS.SILENT', '(\\Seen)'),
+    'unread': ('-FLAGS.SILENT', '(\\Seen)'),
+    'flagged': ('+FLAGS.SILENT', '(\\Flagged)'),
+    'unflagged': ('-FLAGS.SILENT', '(\\Flagged)'),
+}
+BULK_ACTIONS = set(FLAG_ACTIONS) | {'move', 'delete'}
+
+MESSAGE_ID_RE = re.compile(r'<[^<>\s]+>')
+
+# Keep UID STORE/MOVE command lines well below common server limits
+UID_BATCH_SIZE = 1000
+# Message-IDs per OR HEADER search; each adds a nested OR to the command
+SEARCH_BATCH_SIZE = 100
+
+def _quote(value: str) -> str:
+    """Render a value as an IMAP quoted string"""
+    if '\r' in value or '\n' in value:
+        raise ValueError(f"Line break in IMAP string: {value!r}")
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def _uid_set(uids: List[int]) -> str:
+    """Compress UIDs into an IMAP sequence set, e.g. 1:4,7,9:10"""
+    ranges = []
+    for uid in sorted(set(uids)):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ','.join(str(a) if a == b else f'{a}:{b}' for a, b in ranges)
+
+class _TimedCommands:
+    """Times every IMAP command; UID commands are labelled with their subcommand"""
+    
+    def _simple_command(self, name, *args):
+        command = f"{name} {args[0]}" if name == 'UID' and args else name
+        with IMAP_COMMAND_SECONDS.labels(command).time():
+            return super()._simple_command(name, *args)
+
+class TimedIMAP4(_TimedCommands, imaplib.IMAP4):
+    pass
+
+class TimedIMAP4_SSL(_TimedCommands, imaplib.IMAP4_SSL):
+    pass
+
 class EmailIntegration:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], store: Optional[EmailMetadataStore] = None):
         self.config = config
         self.imap_server = config['server']
         self.imap_port = config['port']
@@ -18,18 +70,58 @@ class EmailIntegration:
         self.password = config['password']
         self.use_ssl = config.get('use_ssl', True)
         self.mailbox = config.get('mailbox', 'INBOX')
+        self.fetch_chunk_size = config.get('fetch_chunk_size', 64 * 1024)
+        self.max_body_chars = config.get('max_body_chars', 1_000_000)
+        self.attachment_store = self._create_attachment_store(config.get('attachment_dir'))
+        self.account = config.get('name') or f"{self.username}@{self.imap_server}"
+        self.store = store or EmailMetadataStore(config.get('index_path', './data/email_index.db'))
+        self.threads = ThreadIndex(self.store)
+        self.initial_sync_limit = config.get('max_emails', 100)
         self.imap = None
+        self.selected = None
         self.monitoring = False
+        # imaplib connections are not thread-safe; IMAP work runs in worker
+        # threads so a slow server never blocks the event loop
+        self._imap_lock = threading.Lock()
+    
+    def _create_attachment_store(self, attachment_dir: Optional[str]) -> Optional[AttachmentStore]:
+        """Create the attachment spool, if one is configured"""
+        if not attachment_dir:
+            return None
+        if attachment_dir.startswith('\\\\') or attachment_dir.startswith('//'):
+            # UNC path: spool attachments straight to the NAS
+            import smbclient
+            return AttachmentStore(
+                attachment_dir,
+                opener=smbclient.open_file,
+                makedirs=smbclient.makedirs,
+                rename=smbclient.replace,
+                exists=smbclient.path.exists,
+                remove=smbclient.remove
+            )
+        return AttachmentStore(attachment_dir)
+    
+    async def _call(self, func, *args, **kwargs):
+        """Run blocking IMAP work in a worker thread, one command at a time"""
+        def locked():
+            with self._imap_lock:
+                return func(*args, **kwargs)
+        return await asyncio.to_thread(locked)
     
     async def connect(self) -> bool:
         """Connect to the email server"""
+        return await self._call(self._connect_sync)
+    
+    def _connect_sync(self) -> bool:
         try:
-            if self.use_ssl:
-                self.imap = imaplib.IMAP4_SSL(self.imap_server, self.imap_port)
-            else:
-                self.imap = imaplib.IMAP4(self.imap_server, self.imap_port)
+            with IMAP_COMMAND_SECONDS.labels('CONNECT').time():
+                if self.use_ssl:
+                    self.imap = TimedIMAP4_SSL(self.imap_server, self.imap_port)
+                else:
+                    self.imap = TimedIMAP4(self.imap_server, self.imap_port)
             
             self.imap.login(self.username, self.password)
+            self.selected = None
             logger.info(f"Successfully connected to {self.imap_server}")
             return True
         except Exception as e:
@@ -38,6 +130,9 @@ class EmailIntegration:
     
     async def disconnect(self) -> None:
         """Disconnect from the email server"""
+        await self._call(self._disconnect_sync)
+    
+    def _disconnect_sync(self) -> None:
         if self.imap:
             try:
                 self.imap.close()
@@ -46,47 +141,99 @@ class EmailIntegration:
             except Exception as e:
                 logger.error(f"Error disconnecting from email server: {str(e)}")
     
-    def _decode_email_header(self, header: str) -> str:
+    def _decode_email_header(self, header: Optional[str]) -> str:
         """Decode email header"""
-        decoded_header = decode_header(header)
-        return ''.join(
-            text.decode(charset or 'utf-8') if isinstance(text, bytes) else text
-            for text, charset in decoded_header
+        return decode_header_value(header)
+    
+    def _new_parser(self) -> StreamingMimeParser:
+        return StreamingMimeParser(
+            attachment_store=self.attachment_store,
+            max_body_chars=self.max_body_chars
         )
     
-    def _parse_email(self, email_data: bytes) -> Dict[str, Any]:
-        """Parse email message"""
-        message = email.message_from_bytes(email_data)
-        
-        # Extract basic information
-        subject = self._decode_email_header(message['subject'])
-        from_addr = self._decode_email_header(message['from'])
-        date = email.utils.parsedate_to_datetime(message['date'])
-        
-        # Extract body
-        body = ""
-        if message.is_multipart():
-            for part in message.walk():
-                if part.get_content_type() == "text/plain":
-                    body = part.get_payload(decode=True).decode()
-                    break
-        else:
-            body = message.get_payload(decode=True).decode()
+    def _build_email(self, parsed) -> Dict[str, Any]:
+        """Build the email dict from a parsed message"""
+        headers = parsed.headers
+        try:
+            date = email.utils.parsedate_to_datetime(headers['date']) if headers['date'] else None
+        except (TypeError, ValueError):
+            date = None
         
         return {
-            'subject': subject,
-            'from': from_addr,
+            'subject': self._decode_email_header(headers['subject']),
+            'from': self._decode_email_header(headers['from']),
             'date': date,
-            'body': body,
-            'message_id': message['message-id']
+            'body': parsed.body,
+            'html_text': parsed.html_text,
+            'attachments': parsed.attachments,
+            'truncated': parsed.truncated,
+            'message_id': self._first_message_id(headers['message-id']),
+            'in_reply_to': self._first_message_id(headers['in-reply-to']),
+            'references': MESSAGE_ID_RE.findall(str(headers['references'] or ''))
         }
     
+    def _first_message_id(self, header: Optional[str]) -> Optional[str]:
+        """Extract the first <msg-id> from a header, ignoring comments"""
+        if not header:
+            return None
+        match = MESSAGE_ID_RE.search(str(header))
+        return match.group(0) if match else str(header).strip()
+    
+    def _parse_email(self, email_data: bytes) -> Dict[str, Any]:
+        """Parse email message"""
+        parser = self._new_parser()
+        view = memoryview(email_data)
+        for offset in range(0, len(view), self.fetch_chunk_size):
+            parser.feed(bytes(view[offset:offset + self.fetch_chunk_size]))
+        return self._build_email(parser.close())
+    
+    def _select(self, mailbox: Optional[str] = None) -> str:
+        """Select a mailbox and validate the local UID index against it"""
+        mailbox = mailbox or self.mailbox
+        if self.selected != mailbox:
+            status, _ = self.imap.select(mailbox)
+            if status != 'OK':
+                raise Exception(f"Failed to select mailbox {mailbox}")
+            _, uidvalidity = self.imap.response('UIDVALIDITY')
+            if uidvalidity and uidvalidity[0]:
+                self.store.check_uidvalidity(self.account, mailbox, int(uidvalidity[0]))
+            self.selected = mailbox
+        return mailbox
+    
+    def _fetch_message(self, uid: bytes) -> Optional[Dict[str, Any]]:
+        """Stream a message from the server in partial fetches"""
+        parser = self._new_parser()
+        offset = 0
+        while True:
+            status, data = self.imap.uid(
+                # PEEK, or the server marks every synced message \Seen
+                'FETCH', uid, f'(BODY.PEEK[]<{offset}.{self.fetch_chunk_size}>)'
+            )
+            if status != 'OK':
+                return None
+            chunk = b''
+            for item in data:
+                # The response names the section without PEEK: BODY[]<offset>
+                if isinstance(item, tuple) and b'BODY[]<' in item[0].upper():
+                    chunk = item[1] or b''
+                    break
+            parser.feed(chunk)
+            offset += len(chunk)
+            if len(chunk) < self.fetch_chunk_size:
+                break
+        parsed_email = self._build_email(parser.close())
+        parsed_email['uid'] = int(uid)
+        return parsed_email
+    
     async def fetch_emails(self, 
                           since: Optional[datetime] = None,
                           limit: int = 100) -> List[Dict[str, Any]]:
         """Fetch emails from the server"""
+        return await self._call(self._fetch_emails_sync, since, limit)
+    
+    def _fetch_emails_sync(self, since: Optional[datetime], limit: int) -> List[Dict[str, Any]]:
         try:
-            self.imap.select(self.mailbox)
+            mailbox = self._select()
             
             # Build search criteria
             search_criteria = []
@@ -95,38 +242,192 @@ class EmailIntegration:
                 search_criteria.append(f'(SINCE {date_str})')
             
             # Search for emails
-            status, messages = self.imap.search(None, ' '.join(search_criteria))
+            status, messages = self.imap.uid('SEARCH', None, ' '.join(search_criteria) or 'ALL')
             if status != 'OK':
                 raise Exception("Failed to search emails")
             
-            # Get message numbers
-            message_nums = messages[0].split()
-            message_nums = message_nums[-limit:]  # Get most recent emails
+            # Get message UIDs
+            uids = messages[0].split()
+            uids = uids[-limit:]  # Get most recent emails
             
-            emails = []
-            for num in message_nums:
-                status, data = self.imap.fetch(num, '(RFC822)')
-                if status == 'OK':
-                    email_data = data[0][1]
-                    parsed_email = self._parse_email(email_data)
-                    emails.append(parsed_email)
+            return self._fetch_uids(mailbox, uids)
+        except Exception as e:
+            logger.error(f"Error fetching emails: {str(e)}")
+            raise
+    
+    def _fetch_uids(self,
+                    mailbox: str,
+                    uids: List[bytes],
+                    stop_on_failure: bool = False) -> List[Dict[str, Any]]:
+        emails = []
+        for uid in uids:
+            parsed_email = self._fetch_message(uid)
+            if parsed_email:
+                parsed_email['account'] = self.account
+                parsed_email['mailbox'] = mailbox
+                emails.append(parsed_email)
+            elif stop_on_failure:
+                # Later messages wait, so the checkpoint never skips this one
+                logger.warning(f"Could not fetch UID {int(uid)} from {self.account}/{mailbox}")
+                break
+        
+        self.store.record_messages(self.account, mailbox, emails)
+        for parsed_email in emails:
+            parsed_email['thread_id'] = self.threads.add_message(self.account, parsed_email)
+        return emails
+    
+    async def fetch_new(self, mailbox: Optional[str] = None, advance: bool = True) -> List[Dict[str, Any]]:
+        """Fetch messages newer than the highest UID already synced.
+        
+        Fetching stops at the first message that cannot be retrieved. With
+        ``advance=False`` the checkpoint is left to the caller, which calls
+        ``mark_synced`` once it has handled each message.
+        """
+        return await self._call(self._fetch_new_sync, mailbox, advance)
+    
+    async def mark_synced(self, email_data: Dict[str, Any]) -> None:
+        """Advance the sync checkpoint past a handled message"""
+        await asyncio.to_thread(
+            self.store.set_last_synced_uid, email_data['account'], email_data['mailbox'], email_data['uid']
+        )
+    
+    def _fetch_new_sync(self, mailbox: Optional[str], advance: bool = True) -> List[Dict[str, Any]]:
+        try:
+            mailbox = self._select(mailbox)
+            last_uid = self.store.last_synced_uid(self.account, mailbox)
+            criteria = f'UID {last_uid + 1}:*' if last_uid else 'ALL'
+            status, messages = self.imap.uid('SEARCH', None, criteria)
+            if status != 'OK':
+                raise Exception(f"Failed to search {mailbox}")
             
+            # "n:*" always matches the newest message, even when its UID < n
+            uids = [uid for uid in messages[0].split() if not last_uid or int(uid) > last_uid]
+            if not last_uid:
+                uids = uids[-self.initial_sync_limit:]
+            emails = self._fetch_uids(mailbox, uids, stop_on_failure=True)
+            if advance and emails:
+                self.store.set_last_synced_uid(self.account, mailbox, emails[-1]['uid'])
             return emails
         except Exception as e:
-            logger.error(f"Error fetching emails: {str(e)}")
+            logger.error(f"Error syncing {self.account}/{mailbox}: {str(e)}")
             raise
     
+    def _search_message_ids(self, message_ids: List[str]) -> Dict[str, int]:
+        """Resolve Message-IDs missing from the local index with batched server searches"""
+        message_ids = [message_id for message_id in message_ids
+                       if '\r' not in message_id and '\n' not in message_id]
+        uids = []
+        for start in range(0, len(message_ids), SEARCH_BATCH_SIZE):
+            batch = message_ids[start:start + SEARCH_BATCH_SIZE]
+            criteria = f'HEADER Message-ID {_quote(batch[-1])}'
+            for message_id in reversed(batch[:-1]):
+                criteria = f'OR HEADER Message-ID {_quote(message_id)} {criteria}'
+            status, data = self.imap.uid('SEARCH', None, criteria)
+            if status == 'OK' and data[0]:
+                uids.extend(int(uid) for uid in data[0].split())
+        if not uids:
+            return {}
+        
+        status, data = self.imap.uid(
+            'FETCH', _uid_set(uids),
+            '(UID BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])'
+        )
+        if status != 'OK':
+            return {}
+        
+        found = {}
+        for item in data:
+            if not isinstance(item, tuple):
+                continue
+            match = re.search(rb'UID (\d+)', item[0])
+            header = email.message_from_bytes(item[1])
+            if match and header['message-id']:
+                found[header['message-id'].strip()] = int(match.group(1))
+        return found
+    
+    def resolve_uids(self, message_ids: List[str], mailbox: Optional[str] = None) -> Dict[str, int]:
+        """Map Message-IDs to UIDs, consulting the server only for unknown IDs"""
+        mailbox = self._select(mailbox)
+        found = self.store.lookup_uids(self.account, mailbox, message_ids)
+        missing = [message_id for message_id in message_ids if message_id not in found]
+        if missing:
+            resolved = self._search_message_ids(missing)
+            self.store.record_messages(self.account, mailbox, [
+                {'uid': uid, 'message_id': message_id} for message_id, uid in resolved.items()
+            ])
+            found.update(resolved)
+        return found
+    
+    def _expunge(self, uid_set: str) -> None:
+        if 'UIDPLUS' in self.imap.capabilities:
+            self.imap.uid('EXPUNGE', uid_set)
+        else:
+            # A plain EXPUNGE would also remove every other \Deleted message
+            # in the mailbox, so the batch is only flagged
+            logger.warning(f"{self.imap_server} lacks UIDPLUS; UIDs {uid_set} are flagged "
+                           f"\\Deleted and removed on the next expunge")
+    
+    def _apply_batch(self, uid_set: str, action: str, target: Optional[str]) -> None:
+        if action in FLAG_ACTIONS:
+            command, flags = FLAG_ACTIONS[action]
+            status, _ = self.imap.uid('STORE', uid_set, command, flags)
+        elif action == 'move' and 'MOVE' in self.imap.capabilities:
+            status, _ = self.imap.uid('MOVE', uid_set, target)
+        elif action == 'move':
+            status, _ = self.imap.uid('COPY', uid_set, target)
+            if status == 'OK':
+                status, _ = self.imap.uid('STORE', uid_set, '+FLAGS.SILENT', '(\\Deleted)')
+                self._expunge(uid_set)
+        else:
+            status, _ = self.imap.uid('STORE', uid_set, '+FLAGS.SILENT', '(\\Deleted)')
+            if status == 'OK':
+                self._expunge(uid_set)
+        if status != 'OK':
+            raise Exception(f"UID {action} failed for {uid_set}")
+    
+    async def apply_flags(self,
+                          uids: List[int],
+                          action: str,
+                          target: Optional[str] = None,
+                          mailbox: Optional[str] = None) -> int:
+        """Apply a bulk action (read, unread, flagged, unflagged, move, delete) to UIDs"""
+        if action not in BULK_ACTIONS:
+            raise ValueError(f"Unsupported action: {action}")
+        if action == 'move' and not target:
+            raise ValueError("Move requires a target mailbox")
+        if not uids:
+            return 0
+        return await self._call(self._apply_flags_sync, uids, action, target, mailbox)
+    
+    def _apply_flags_sync(self,
+                          uids: List[int],
+                          action: str,
+                          target: Optional[str],
+                          mailbox: Optional[str]) -> int:
+        mailbox = self._select(mailbox)
+        uids = sorted(set(int(uid) for uid in uids))
+        for start in range(0, len(uids), UID_BATCH_SIZE):
+            self._apply_batch(_uid_set(uids[start:start + UID_BATCH_SIZE]), action, target)
+        
+        if action in ('move', 'delete'):
+            self.store.remove_uids(self.account, mailbox, uids)
+        return len(uids)
+    
+    async def apply_flags_by_message_id(self,
+                                        message_ids: List[str],
+                                        action: str,
+                                        target: Optional[str] = None,
+                                        mailbox: Optional[str] = None) -> int:
+        """Apply a bulk action to messages identified by Message-ID"""
+        if not message_ids:
+            return 0
+        uids = await self._call(self.resolve_uids, message_ids, mailbox)
+        return await self.apply_flags(list(uids.values()), action, target=target, mailbox=mailbox)
+    
     async def mark_as_read(self, message_id: str) -> bool:
         """Mark an email as read"""
         try:
-            self.imap.select(self.mailbox)
-            status, messages = self.imap.search(None, f'(HEADER Message-ID "{message_id}")')
-            if status != 'OK':
-                return False
-            
-            for num in messages[0].split():
-                self.imap.store(num, '+FLAGS', '\\Seen')
-            return True
+            return await self.apply_flags_by_message_id([message_id], 'read') > 0
         except Exception as e:
             logger.error(f"Error marking email as read: {str(e)}")
             return False
@@ -136,18 +437,16 @@ class EmailIntegration:
         self.monitoring = True
         
         async def monitor_loop():
-            last_check = datetime.now()
-            
             while self.monitoring:
                 try:
                     # Fetch new emails
-                    new_emails = await self.fetch_emails(since=last_check)
+                    new_emails = await self.fetch_new(advance=False)
                     
-                    # Process new emails
+                    # Process new emails; a failed callback is retried next round
                     for email_data in new_emails:
                         await callback(email_data)
+                        await self.mark_synced(email_data)
                     
-                    last_check = datetime.now()
                     await asyncio.sleep(interval)
                 except Exception as e:
                     logger.error(f"Error in email monitoring: {str(e)}")
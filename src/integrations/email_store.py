@@ -0,0 +1,172 @@
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mailboxes (
+    account TEXT NOT NULL,
+    mailbox TEXT NOT NULL,
+    uidvalidity INTEGER NOT NULL,
+    last_uid INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (account, mailbox)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    account TEXT NOT NULL,
+    mailbox TEXT NOT NULL,
+    uid INTEGER NOT NULL,
+    message_id TEXT,
+    subject TEXT,
+    from_addr TEXT,
+    date TEXT,
+    in_reply_to TEXT,
+    refs TEXT,
+    body TEXT,
+    PRIMARY KEY (account, mailbox, uid)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_message_id
+    ON messages (account, mailbox, message_id);
+CREATE INDEX IF NOT EXISTS idx_messages_account_message_id
+    ON messages (account, message_id);
+"""
+
+
+class EmailMetadataStore:
+    """Local SQLite index of message metadata keyed by IMAP UID.
+
+    Lets callers resolve Message-IDs to UIDs without a server-side
+    ``SEARCH HEADER`` scan. Entries are scoped by account and mailbox and
+    dropped whenever the server reports a new UIDVALIDITY.
+    """
+
+    def __init__(self, path: str = './data/email_index.db'):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Run statements on the shared connection in one transaction"""
+        with self._lock, self._conn:
+            yield self._conn
+
+    def add_schema(self, schema: str) -> None:
+        """Create additional tables that live alongside the message index"""
+        with self._lock:
+            self._conn.executescript(schema)
+            self._conn.commit()
+
+    def check_uidvalidity(self, account: str, mailbox: str, uidvalidity: int) -> None:
+        """Drop cached UIDs for a mailbox whose UIDVALIDITY changed"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT uidvalidity FROM mailboxes WHERE account = ? AND mailbox = ?',
+                (account, mailbox)
+            ).fetchone()
+            if row and row[0] == uidvalidity:
+                return
+            if row:
+                logger.info(f"UIDVALIDITY changed for {account}/{mailbox}, resetting index")
+                self._conn.execute(
+                    'DELETE FROM messages WHERE account = ? AND mailbox = ?',
+                    (account, mailbox)
+                )
+            self._conn.execute(
+                'INSERT OR REPLACE INTO mailboxes (account, mailbox, uidvalidity) VALUES (?, ?, ?)',
+                (account, mailbox, uidvalidity)
+            )
+
+    def record_messages(self, account: str, mailbox: str, messages: Iterable[Dict[str, Any]]) -> None:
+        """Insert or update metadata for fetched messages"""
+        rows = [(
+            account,
+            mailbox,
+            int(message['uid']),
+            message.get('message_id'),
+            message.get('subject'),
+            message.get('from'),
+            message['date'].isoformat() if message.get('date') else None,
+            message.get('in_reply_to'),
+            ' '.join(message.get('references') or []) or None,
+            message.get('body')
+        ) for message in messages]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO messages '
+                '(account, mailbox, uid, message_id, subject, from_addr, date, in_reply_to, refs, body) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+
+    def lookup_uids(self, account: str, mailbox: str, message_ids: List[str]) -> Dict[str, int]:
+        """Map Message-IDs to UIDs using the local index"""
+        found: Dict[str, int] = {}
+        with self._lock:
+            # Stay below SQLite's default bound-parameter limit
+            for start in range(0, len(message_ids), 500):
+                batch = message_ids[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                for message_id, uid in self._conn.execute(
+                    f'SELECT message_id, uid FROM messages WHERE account = ? AND mailbox = ? '
+                    f'AND message_id IN ({placeholders})',
+                    (account, mailbox, *batch)
+                ):
+                    found[message_id] = uid
+        return found
+
+    def remove_uids(self, account: str, mailbox: str, uids: List[int]) -> None:
+        """Forget messages that were moved or expunged"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'DELETE FROM messages WHERE account = ? AND mailbox = ? AND uid = ?',
+                [(account, mailbox, uid) for uid in uids]
+            )
+
+    def last_synced_uid(self, account: str, mailbox: str) -> int:
+        """Highest UID fully synced for a mailbox (0 if never synced)"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT last_uid FROM mailboxes WHERE account = ? AND mailbox = ?',
+                (account, mailbox)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def set_last_synced_uid(self, account: str, mailbox: str, uid: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE mailboxes SET last_uid = MAX(last_uid, ?) WHERE account = ? AND mailbox = ?',
+                (uid, account, mailbox)
+            )
+
+    def recent_messages(self, limit: int = 200) -> List[Dict[str, Any]]:
+        """Most recent locally indexed messages across accounts, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT account, mailbox, message_id, subject, from_addr, date, body FROM messages '
+                'WHERE body IS NOT NULL ORDER BY date DESC LIMIT ?',
+                (limit,)
+            ).fetchall()
+        return [{
+            'account': row[0],
+            'mailbox': row[1],
+            'message_id': row[2],
+            'subject': row[3],
+            'from': row[4],
+            'date': row[5],
+            'body': row[6]
+        } for row in rows]
@@ -0,0 +1,176 @@
+import time
+import heapq
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+
+from .email_integration import EmailIntegration
+from .email_store import EmailMetadataStore
+from ..core.metrics import histogram, counter
+from ..core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+EMAIL_SYNC_SECONDS = histogram('email_sync_seconds', "Duration of one folder sync", ('account',))
+EMAIL_SYNCED_MESSAGES = counter('email_synced_messages_total', "New messages fetched by the sync scheduler", ('account',))
+EMAIL_SYNC_FAILURES = counter('email_sync_failures_total', "Folder syncs that failed", ('account',))
+
+
+class AccountConnectionPool:
+    """Bounded pool of IMAP connections for a single account.
+
+    An IMAP connection has one selected mailbox at a time, so folders of the
+    same account are synced over separate connections, up to
+    ``max_connections`` (most servers cap concurrent logins per user).
+    """
+
+    def __init__(self, config: Dict[str, Any], store: EmailMetadataStore):
+        self.config = config
+        self.store = store
+        self.name = config.get('name') or f"{config['username']}@{config['server']}"
+        self.max_connections = config.get('max_connections', 2)
+        self._semaphore = asyncio.Semaphore(self.max_connections)
+        self._idle: List[EmailIntegration] = []
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self._semaphore:
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = EmailIntegration(self.config, store=self.store)
+                if not await conn.connect():
+                    raise ConnectionError(f"Could not connect to {self.name}")
+            try:
+                yield conn
+            except Exception:
+                # Drop connections that failed mid-command; they may be desynced
+                await conn.disconnect()
+                raise
+            self._idle.append(conn)
+
+    async def close(self) -> None:
+        while self._idle:
+            await self._idle.pop().disconnect()
+
+
+@dataclass(order=True)
+class _SyncJob:
+    due: float
+    account: str = field(compare=False)
+    folder: str = field(compare=False)
+    interval: float = field(compare=False)
+    failures: int = field(default=0, compare=False)
+
+
+class EmailSyncScheduler:
+    """Shared scheduler syncing every configured (account, folder) pair.
+
+    Each job runs as its own task, bounded by its account's connection pool
+    and by a global concurrency cap, so a slow or unreachable server only
+    delays its own folders. Failing jobs back off exponentially.
+    """
+
+    def __init__(self,
+                 accounts: List[Dict[str, Any]],
+                 callback: Callable[[Dict[str, Any]], Awaitable[None]],
+                 interval: float = 300,
+                 max_concurrency: int = 16,
+                 max_backoff: float = 3600,
+                 store: Optional[EmailMetadataStore] = None):
+        self.callback = callback
+        self.interval = interval
+        self.max_backoff = max_backoff
+        index_path = accounts[0].get('index_path', './data/email_index.db') if accounts else ':memory:'
+        self.store = store or EmailMetadataStore(index_path)
+        self.pools: Dict[str, AccountConnectionPool] = {}
+        self._jobs: List[_SyncJob] = []
+        self._running: Dict[tuple, asyncio.Task] = {}
+        self._concurrency = asyncio.Semaphore(max_concurrency)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        now = time.monotonic()
+        for account in accounts:
+            pool = AccountConnectionPool(account, self.store)
+            self.pools[pool.name] = pool
+            folders = account.get('folders') or [account.get('mailbox', 'INBOX')]
+            job_interval = account.get('check_interval', interval)
+            for folder in folders:
+                heapq.heappush(self._jobs, _SyncJob(now, pool.name, folder, job_interval))
+
+    async def start(self) -> None:
+        """Start the scheduler loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Email sync started for {len(self._jobs)} folders "
+                        f"across {len(self.pools)} accounts")
+
+    async def stop(self) -> None:
+        """Stop scheduling, cancel in-flight syncs and close connections"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._running.values(), return_exceptions=True)
+        for pool in self.pools.values():
+            await pool.close()
+
+    async def sync_now(self) -> None:
+        """Make every job due immediately"""
+        self._jobs = [_SyncJob(0, job.account, job.folder, job.interval, job.failures)
+                      for job in self._jobs]
+        heapq.heapify(self._jobs)
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            while self._jobs and self._jobs[0].due <= now:
+                job = heapq.heappop(self._jobs)
+                key = (job.account, job.folder)
+                if key in self._running:
+                    continue
+                self._running[key] = asyncio.create_task(self._sync(job))
+
+            timeout = self._jobs[0].due - now if self._jobs else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _sync(self, job: _SyncJob) -> None:
+        key = (job.account, job.folder)
+        try:
+            async with self._concurrency:
+                with span('email.sync', account=job.account, folder=job.folder) as current, \
+                        EMAIL_SYNC_SECONDS.labels(job.account).time():
+                    async with self.pools[job.account].connection() as conn:
+                        new_emails = await conn.fetch_new(job.folder, advance=False)
+                    current.set(messages=len(new_emails))
+            EMAIL_SYNCED_MESSAGES.labels(job.account).inc(len(new_emails))
+            # The checkpoint only moves past delivered messages, so a failing
+            # callback makes the job back off and retry from that message
+            for email_data in new_emails:
+                await self.callback(email_data)
+                await asyncio.to_thread(
+                    self.store.set_last_synced_uid, email_data['account'], email_data['mailbox'], email_data['uid']
+                )
+            job.failures = 0
+            delay = job.interval
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            EMAIL_SYNC_FAILURES.labels(job.account).inc()
+            delay = min(job.interval * 2 ** job.failures, self.max_backoff)
+            logger.error(f"Email sync failed for {job.account}/{job.folder} "
+                         f"(retrying in {delay:.0f}s): {str(e)}")
+        finally:
+            self._running.pop(key, None)
+        job.due = time.monotonic() + delay
+        heapq.heappush(self._jobs, job)
+        self._wakeup.set()
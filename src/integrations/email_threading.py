@@ -0,0 +1,214 @@
+import re
+import hashlib
+import logging
+from typing import List, Dict, Any, Optional
+
+from .email_store import EmailMetadataStore
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS thread_containers (
+    account TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    parent_id TEXT,
+    thread_id TEXT NOT NULL,
+    subject_key TEXT,
+    PRIMARY KEY (account, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_thread_containers_parent
+    ON thread_containers (account, parent_id);
+CREATE INDEX IF NOT EXISTS idx_thread_containers_thread
+    ON thread_containers (account, thread_id);
+CREATE INDEX IF NOT EXISTS idx_thread_containers_subject
+    ON thread_containers (account, subject_key);
+CREATE TABLE IF NOT EXISTS thread_summaries (
+    account TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    message_count INTEGER NOT NULL,
+    prefix_hash TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (account, thread_id)
+);
+"""
+
+REPLY_PREFIX_RE = re.compile(r'^\s*((re|fwd?|aw|sv)(\[\d+\])?\s*:\s*)+', re.IGNORECASE)
+
+
+def normalize_subject(subject: Optional[str]) -> str:
+    """Strip reply/forward prefixes so replies share their thread's subject"""
+    return REPLY_PREFIX_RE.sub('', subject or '').strip().lower()
+
+
+def prefix_hash(message_ids: List[str]) -> str:
+    return hashlib.sha256('\n'.join(message_ids).encode('utf-8')).hexdigest()
+
+
+class ThreadIndex:
+    """Incrementally maintained JWZ-style thread index.
+
+    Each Message-ID gets a container (possibly an empty placeholder for a
+    referenced message we have not seen). Parent links come from
+    References/In-Reply-To; replies without references are grouped with an
+    existing thread of the same normalized subject. Every container stores
+    the Message-ID of its thread root, which is re-propagated through the
+    affected subtree whenever a new message re-parents it, so lookups never
+    have to rebuild threads from scratch.
+    """
+
+    def __init__(self, store: EmailMetadataStore):
+        self.store = store
+        self.store.add_schema(SCHEMA)
+
+    def add_message(self, account: str, message: Dict[str, Any]) -> Optional[str]:
+        """Thread a newly synced message and return its thread ID"""
+        message_id = message.get('message_id')
+        if not message_id:
+            return None
+
+        references = list(dict.fromkeys(message.get('references') or []))
+        in_reply_to = message.get('in_reply_to')
+        if in_reply_to and (not references or references[-1] != in_reply_to):
+            references = [ref for ref in references if ref != in_reply_to] + [in_reply_to]
+        references = [ref for ref in references if ref != message_id]
+
+        subject = message.get('subject')
+        with self.store.transaction() as conn:
+            self._ensure(conn, account, message_id, normalize_subject(subject))
+
+            # Link the reference chain: each reference is a child of the previous one
+            for parent, child in zip(references, references[1:]):
+                self._ensure(conn, account, parent)
+                self._ensure(conn, account, child)
+                if self._parent(conn, account, child) is None:
+                    self._set_parent(conn, account, child, parent)
+            if references:
+                self._ensure(conn, account, references[0])
+                # A message's own references are authoritative for its parent
+                self._set_parent(conn, account, message_id, references[-1])
+            elif REPLY_PREFIX_RE.match(subject or ''):
+                root = self._subject_root(conn, account, normalize_subject(subject), message_id)
+                if root:
+                    self._set_parent(conn, account, message_id, root)
+
+            return self._thread_id(conn, account, message_id)
+
+    def _ensure(self, conn, account: str, message_id: str, subject_key: Optional[str] = None) -> None:
+        conn.execute(
+            'INSERT OR IGNORE INTO thread_containers (account, message_id, parent_id, thread_id) '
+            'VALUES (?, ?, NULL, ?)',
+            (account, message_id, message_id)
+        )
+        if subject_key:
+            conn.execute(
+                'UPDATE thread_containers SET subject_key = ? WHERE account = ? AND message_id = ?',
+                (subject_key, account, message_id)
+            )
+
+    def _parent(self, conn, account: str, message_id: str) -> Optional[str]:
+        row = conn.execute(
+            'SELECT parent_id FROM thread_containers WHERE account = ? AND message_id = ?',
+            (account, message_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _thread_id(self, conn, account: str, message_id: str) -> Optional[str]:
+        row = conn.execute(
+            'SELECT thread_id FROM thread_containers WHERE account = ? AND message_id = ?',
+            (account, message_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _is_ancestor(self, conn, account: str, candidate: str, message_id: str) -> bool:
+        """True if message_id is candidate itself or one of candidate's ancestors"""
+        seen = set()
+        current = candidate
+        while current and current not in seen:
+            if current == message_id:
+                return True
+            seen.add(current)
+            current = self._parent(conn, account, current)
+        return False
+
+    def _subject_root(self, conn, account: str, subject_key: str, message_id: str) -> Optional[str]:
+        if not subject_key:
+            return None
+        row = conn.execute(
+            'SELECT thread_id FROM thread_containers WHERE account = ? AND subject_key = ? '
+            'AND message_id != ? AND parent_id IS NULL LIMIT 1',
+            (account, subject_key, message_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_parent(self, conn, account: str, message_id: str, parent_id: str) -> None:
+        if self._parent(conn, account, message_id) == parent_id:
+            return
+        # Never introduce a loop: skip links that would make a message its own ancestor
+        if self._is_ancestor(conn, account, parent_id, message_id):
+            return
+        conn.execute(
+            'UPDATE thread_containers SET parent_id = ? WHERE account = ? AND message_id = ?',
+            (parent_id, account, message_id)
+        )
+        self._propagate(conn, account, message_id, self._thread_id(conn, account, parent_id))
+
+    def _propagate(self, conn, account: str, message_id: str, thread_id: str) -> None:
+        """Assign a new thread root to a container and its descendants"""
+        pending = [message_id]
+        while pending:
+            current = pending.pop()
+            conn.execute(
+                'UPDATE thread_containers SET thread_id = ? WHERE account = ? AND message_id = ?',
+                (thread_id, account, current)
+            )
+            pending.extend(row[0] for row in conn.execute(
+                'SELECT message_id FROM thread_containers WHERE account = ? AND parent_id = ? '
+                'AND thread_id != ?',
+                (account, current, thread_id)
+            ))
+
+    def thread_for_message(self, account: str, message_id: str) -> Optional[str]:
+        """Thread ID containing a message"""
+        with self.store.transaction() as conn:
+            return self._thread_id(conn, account, message_id)
+
+    def get_thread(self, account: str, thread_id: str) -> List[Dict[str, Any]]:
+        """Messages of a thread we have locally, in chronological order"""
+        with self.store.transaction() as conn:
+            rows = conn.execute(
+                'SELECT m.message_id, m.subject, m.from_addr, m.date, m.body, c.parent_id '
+                'FROM thread_containers c JOIN messages m '
+                'ON m.account = c.account AND m.message_id = c.message_id '
+                'WHERE c.account = ? AND c.thread_id = ? '
+                'GROUP BY m.message_id ORDER BY m.date, m.message_id',
+                (account, thread_id)
+            ).fetchall()
+        return [{
+            'message_id': row[0],
+            'subject': row[1],
+            'from': row[2],
+            'date': row[3],
+            'body': row[4],
+            'parent_id': row[5]
+        } for row in rows]
+
+    def get_summary(self, account: str, thread_id: str) -> Optional[Dict[str, Any]]:
+        """Cached summary of a thread prefix"""
+        with self.store.transaction() as conn:
+            row = conn.execute(
+                'SELECT message_count, prefix_hash, summary FROM thread_summaries '
+                'WHERE account = ? AND thread_id = ?',
+                (account, thread_id)
+            ).fetchone()
+        if not row:
+            return None
+        return {'message_count': row[0], 'prefix_hash': row[1], 'summary': row[2]}
+
+    def save_summary(self, account: str, thread_id: str, message_ids: List[str], summary: str) -> None:
+        """Cache the summary covering the given (chronological) messages"""
+        with self.store.transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO thread_summaries '
+                '(account, thread_id, message_count, prefix_hash, summary) VALUES (?, ?, ?, ?, ?)',
+                (account, thread_id, len(message_ids), prefix_hash(message_ids), summary)
+            )
@@ -0,0 +1,431 @@
+import os
+import uuid
+import codecs
+import hashlib
+import logging
+import binascii
+from typing import List, Dict, Any, Optional, Callable
+from email.header import decode_header
+from email.parser import BytesHeaderParser
+from email.message import Message
+from html.parser import HTMLParser
+
+logger = logging.getLogger(__name__)
+
+# RFC 2046 limits boundaries to 70 characters, so any line longer than this
+# can never be a boundary delimiter and may be flushed without a newline.
+MAX_LINE_BUFFER = 8192
+MAX_HEADER_BYTES = 256 * 1024
+
+
+def _lookup_charset(charset: Optional[str]) -> str:
+    """Resolve a MIME charset label to a Python codec name"""
+    if charset:
+        try:
+            return codecs.lookup(charset.strip().strip('"').lower()).name
+        except LookupError:
+            logger.warning(f"Unknown charset {charset!r}, falling back to utf-8")
+    return 'utf-8'
+
+
+def decode_bytes(data: bytes, charset: Optional[str]) -> str:
+    """Decode bytes using a MIME charset without ever raising"""
+    return data.decode(_lookup_charset(charset), errors='replace')
+
+
+def decode_header_value(value: Optional[str]) -> str:
+    """Decode an RFC 2047 encoded header value"""
+    if value is None:
+        return ''
+    return ''.join(
+        decode_bytes(text, charset) if isinstance(text, bytes) else text
+        for text, charset in decode_header(str(value))
+    )
+
+
+class _Base64Decoder:
+    def __init__(self):
+        self._pending = b''
+
+    def decode(self, data: bytes) -> bytes:
+        data = self._pending + b''.join(data.split())
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        try:
+            return binascii.a2b_base64(data[:usable])
+        except binascii.Error:
+            return b''
+
+    def flush(self) -> bytes:
+        pending, self._pending = self._pending, b''
+        if not pending:
+            return b''
+        try:
+            return binascii.a2b_base64(pending + b'=' * (-len(pending) % 4))
+        except binascii.Error:
+            return b''
+
+
+class _QuotedPrintableDecoder:
+    def __init__(self):
+        self._pending = b''
+
+    def decode(self, data: bytes) -> bytes:
+        # Decode complete lines only so soft line breaks are never split
+        data = self._pending + data
+        cut = data.rfind(b'\n') + 1
+        self._pending = data[cut:]
+        return binascii.a2b_qp(data[:cut])
+
+    def flush(self) -> bytes:
+        pending, self._pending = self._pending, b''
+        return binascii.a2b_qp(pending)
+
+
+class _IdentityDecoder:
+    def decode(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b''
+
+
+def _transfer_decoder(encoding: str):
+    encoding = (encoding or '').strip().lower()
+    if encoding == 'base64':
+        return _Base64Decoder()
+    if encoding == 'quoted-printable':
+        return _QuotedPrintableDecoder()
+    return _IdentityDecoder()
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """Incremental HTML to plain text converter"""
+
+    SKIP_TAGS = {'script', 'style', 'head', 'title'}
+    BLOCK_TAGS = {'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+                  'blockquote', 'pre', 'table', 'ul', 'ol'}
+
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts: List[str] = []
+        self.length = 0
+        self._skip_depth = 0
+
+    def _append(self, text: str) -> None:
+        if self.length >= self.max_chars:
+            return
+        text = text[:self.max_chars - self.length]
+        self.parts.append(text)
+        self.length += len(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self._append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self.BLOCK_TAGS:
+            self._append('\n')
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._append(data)
+
+    def get_text(self) -> str:
+        lines = (' '.join(line.split()) for line in ''.join(self.parts).splitlines())
+        return '\n'.join(line for line in lines if line)
+
+
+class AttachmentStore:
+    """Content-addressed attachment storage.
+
+    Attachments are written under ``root`` named by their SHA-256 digest, so
+    identical attachments are stored once. ``opener`` and the filesystem
+    functions default to the local filesystem; pass ``smbclient`` equivalents
+    to spool straight to the NAS.
+    """
+
+    def __init__(self, root: str,
+                 opener: Callable = open,
+                 makedirs: Callable = os.makedirs,
+                 rename: Callable = os.replace,
+                 exists: Callable = os.path.exists,
+                 remove: Callable = os.remove):
+        self.root = root
+        self.opener = opener
+        self.makedirs = makedirs
+        self.rename = rename
+        self.exists = exists
+        self.remove = remove
+        self.makedirs(self.root, exist_ok=True)
+
+    def open_writer(self) -> '_AttachmentWriter':
+        temp_name = os.path.join(self.root, f".incoming-{uuid.uuid4().hex}")
+        return _AttachmentWriter(self, temp_name)
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+
+class _AttachmentWriter:
+    def __init__(self, store: Optional[AttachmentStore], temp_name: Optional[str] = None):
+        self.store = store
+        self.temp_name = temp_name
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self._file = store.opener(temp_name, 'wb') if store else None
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        self.hash.update(data)
+        self.size += len(data)
+        if self._file:
+            self._file.write(data)
+
+    def close(self) -> Dict[str, Any]:
+        digest = self.hash.hexdigest()
+        path = None
+        if self._file:
+            self._file.close()
+            path = self.store.path_for(digest)
+            if self.store.exists(path):
+                self.store.remove(self.temp_name)
+            else:
+                self.store.makedirs(os.path.dirname(path), exist_ok=True)
+                self.store.rename(self.temp_name, path)
+        return {'sha256': digest, 'size': self.size, 'path': path}
+
+
+class _Part:
+    def __init__(self, headers: Message, parent: Optional['_Part'] = None):
+        self.headers = headers
+        self.parent = parent
+        self.content_type = headers.get_content_type()
+        self.charset = headers.get_content_charset()
+        self.boundary = headers.get_boundary() if headers.get_content_maintype() == 'multipart' else None
+        self.disposition = (headers.get_content_disposition() or '').lower()
+        self.filename = headers.get_filename()
+        self.decoder = _transfer_decoder(headers.get('content-transfer-encoding', ''))
+        self.sink = None
+
+
+class ParsedMessage:
+    def __init__(self):
+        self.headers: Optional[Message] = None
+        self.text: List[str] = []
+        self.text_length = 0
+        self.html: Optional[_HTMLTextExtractor] = None
+        self.attachments: List[Dict[str, Any]] = []
+        self.truncated = False
+
+    @property
+    def body(self) -> str:
+        if self.text:
+            return ''.join(self.text)
+        if self.html:
+            return self.html.get_text()
+        return ''
+
+    @property
+    def html_text(self) -> str:
+        return self.html.get_text() if self.html else ''
+
+
+class _TextSink:
+    def __init__(self, result: ParsedMessage, charset: Optional[str], max_chars: int):
+        self.result = result
+        self.max_chars = max_chars
+        self.decoder = codecs.getincrementaldecoder(_lookup_charset(charset))(errors='replace')
+
+    def write(self, data: bytes, final: bool = False) -> None:
+        text = self.decoder.decode(data, final)
+        remaining = self.max_chars - self.result.text_length
+        if len(text) > remaining:
+            text = text[:remaining]
+            self.result.truncated = True
+        if text:
+            self.result.text.append(text)
+            self.result.text_length += len(text)
+
+    def close(self) -> None:
+        self.write(b'', final=True)
+
+
+class _HTMLSink:
+    def __init__(self, result: ParsedMessage, charset: Optional[str], max_chars: int):
+        self.extractor = _HTMLTextExtractor(max_chars)
+        result.html = self.extractor
+        self.decoder = codecs.getincrementaldecoder(_lookup_charset(charset))(errors='replace')
+
+    def write(self, data: bytes, final: bool = False) -> None:
+        self.extractor.feed(self.decoder.decode(data, final))
+
+    def close(self) -> None:
+        self.write(b'', final=True)
+        self.extractor.close()
+
+
+class _AttachmentSink:
+    def __init__(self, result: ParsedMessage, part: _Part, store: Optional[AttachmentStore]):
+        self.result = result
+        self.part = part
+        self.writer = store.open_writer() if store else _AttachmentWriter(None)
+
+    def write(self, data: bytes) -> None:
+        self.writer.write(data)
+
+    def close(self) -> None:
+        info = self.writer.close()
+        info.update({
+            'filename': decode_header_value(self.part.filename) or None,
+            'content_type': self.part.content_type
+        })
+        self.result.attachments.append(info)
+
+
+class _DiscardSink:
+    def write(self, data: bytes) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class StreamingMimeParser:
+    """Incremental RFC 822 / MIME parser with bounded memory.
+
+    Feed raw message bytes in arbitrary chunks. Header blocks are buffered and
+    parsed with the stdlib header parser; part bodies are streamed through
+    transfer and charset decoders into sinks: the first text/plain and
+    text/html parts are kept (capped at ``max_body_chars``) and attachments
+    are hashed and spooled to ``attachment_store`` without being held in
+    memory.
+    """
+
+    def __init__(self, attachment_store: Optional[AttachmentStore] = None,
+                 max_body_chars: int = 1_000_000):
+        self.attachment_store = attachment_store
+        self.max_body_chars = max_body_chars
+        self.result = ParsedMessage()
+        self._buffer = b''
+        self._midline = False
+        self._pending_eol = b''
+        self._header_lines: List[bytes] = []
+        self._header_size = 0
+        self._state = 'headers'
+        self._part: Optional[_Part] = None
+        self._container: Optional[_Part] = None
+        self._have_text = False
+        self._have_html = False
+
+    def feed(self, data: bytes) -> None:
+        buffer = self._buffer + data
+        start = 0
+        while True:
+            end = buffer.find(b'\n', start)
+            if end == -1:
+                break
+            self._handle_line(buffer[start:end + 1])
+            start = end + 1
+        self._buffer = buffer[start:]
+        if len(self._buffer) > MAX_LINE_BUFFER:
+            # Too long to be a boundary; hand it on as partial line content
+            self._handle_line(self._buffer, partial=True)
+            self._buffer = b''
+
+    def close(self) -> ParsedMessage:
+        if self._buffer:
+            self._handle_line(self._buffer)
+            self._buffer = b''
+        if self._state == 'headers':
+            self._finish_headers()
+        self._pending_eol = b''
+        self._close_part()
+        return self.result
+
+    def _handle_line(self, line: bytes, partial: bool = False) -> None:
+        midline = self._midline
+        self._midline = partial
+        if self._state == 'headers':
+            if not midline and line.strip(b'\r\n') == b'':
+                self._finish_headers()
+            elif self._header_size < MAX_HEADER_BYTES:
+                self._header_lines.append(line)
+                self._header_size += len(line)
+            return
+
+        if not midline and line.startswith(b'--') and self._match_boundary(line):
+            return
+
+        if self._state != 'body':
+            return
+        content = line.rstrip(b'\r\n') if not partial else line
+        eol = line[len(content):]
+        self._write(self._pending_eol + content)
+        self._pending_eol = eol
+
+    def _match_boundary(self, line: bytes) -> bool:
+        marker = line.rstrip()[2:]
+        container = self._container
+        while container is not None:
+            boundary = container.boundary.encode('ascii', 'replace')
+            if marker == boundary or marker == boundary + b'--':
+                # The line break before a delimiter belongs to the delimiter
+                self._pending_eol = b''
+                self._close_part()
+                self._container = container
+                if marker == boundary:
+                    self._state = 'headers'
+                else:
+                    self._state = 'epilogue'
+                    self._container = container.parent
+                return True
+            container = container.parent
+        return False
+
+    def _finish_headers(self) -> None:
+        headers = BytesHeaderParser().parsebytes(b''.join(self._header_lines))
+        self._header_lines = []
+        self._header_size = 0
+        part = _Part(headers, parent=self._container)
+        if self.result.headers is None:
+            self.result.headers = headers
+        if part.boundary:
+            self._container = part
+            self._state = 'preamble'
+            return
+        part.sink = self._choose_sink(part)
+        self._part = part
+        self._state = 'body'
+
+    def _choose_sink(self, part: _Part):
+        is_attachment = part.disposition == 'attachment' or part.filename
+        if not is_attachment and part.content_type == 'text/plain' and not self._have_text:
+            self._have_text = True
+            return _TextSink(self.result, part.charset, self.max_body_chars)
+        if not is_attachment and part.content_type == 'text/html' and not self._have_html:
+            self._have_html = True
+            return _HTMLSink(self.result, part.charset, self.max_body_chars)
+        if is_attachment or part.headers.get_content_maintype() not in ('text', 'multipart'):
+            return _AttachmentSink(self.result, part, self.attachment_store)
+        return _DiscardSink()
+
+    def _write(self, data: bytes) -> None:
+        if self._part and data:
+            self._part.sink.write(self._part.decoder.decode(data))
+
+    def _close_part(self) -> None:
+        part = self._part
+        if part is None:
+            return
+        tail = part.decoder.flush()
+        if tail:
+            part.sink.write(tail)
+        part.sink.close()
+        self._part = None
@@ -0,0 +1,182 @@
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Callable, Awaitable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class NASEvent:
+    type: str  # created, modified, deleted or moved
+    path: str
+    dest_path: Optional[str] = None
+    is_directory: bool = False
+    # Optional identity of the file (e.g. size and mtime) used to pair a
+    # delete and a create into a move when the source does not report moves
+    fingerprint: Optional[Tuple[Any, ...]] = None
+
+
+@dataclass
+class _Pending:
+    event: NASEvent
+    first_seen: float
+    last_seen: float
+
+
+def _merge(previous: NASEvent, current: NASEvent) -> Optional[NASEvent]:
+    """Combine two events for the same path; None means they cancel out"""
+    if previous.type == 'created':
+        if current.type == 'deleted':
+            return None
+        return previous
+    if previous.type == 'deleted' and current.type == 'created':
+        return NASEvent('modified', current.path, is_directory=current.is_directory,
+                        fingerprint=current.fingerprint)
+    if previous.type == 'moved' and current.type == 'modified':
+        return previous
+    if previous.type == 'moved' and current.type == 'deleted':
+        # Moved away and then deleted: what consumers knew was the source
+        return NASEvent('deleted', previous.path, is_directory=previous.is_directory,
+                        fingerprint=previous.fingerprint)
+    return current
+
+
+class EventCoalescer:
+    """Debounce raw filesystem events into one settled event per path.
+
+    Raw events can be submitted from any thread: ``submit_threadsafe`` hands
+    them to the event loop with ``call_soon_threadsafe``, so watchdog's
+    observer thread never touches asyncio directly. Events for a path are
+    merged until the path has been quiet for ``window`` seconds (or
+    ``max_delay`` has passed since the first event), then delivered once.
+    Moves are reported as ``moved``; deletes and creates that settle in the
+    same batch with matching fingerprints are paired into moves.
+    """
+
+    def __init__(self,
+                 callback: Callable[..., Awaitable[None]],
+                 window: float = 2.0,
+                 max_delay: float = 60.0):
+        self.callback = callback
+        self.window = window
+        self.max_delay = max_delay
+        self._pending: Dict[str, _Pending] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop and deliver whatever is still pending"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue and not self._queue.empty():
+            self._add(self._queue.get_nowait())
+        await self._flush(force=True)
+
+    def submit_threadsafe(self, event: NASEvent) -> None:
+        """Submit an event from a non-loop thread"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    def submit(self, event: NASEvent) -> None:
+        """Submit an event from the event loop thread"""
+        self._queue.put_nowait(event)
+
+    def _add(self, event: NASEvent) -> None:
+        now = time.monotonic()
+        if event.type == 'moved':
+            source = self._pending.pop(event.path, None)
+            if source and source.event.type == 'created':
+                # Created then renamed within the window: just a new file at dest
+                event = NASEvent('created', event.dest_path, is_directory=event.is_directory,
+                                 fingerprint=event.fingerprint)
+            key = event.dest_path or event.path
+        else:
+            key = event.path
+
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = _Pending(event, now, now)
+            return
+        merged = _merge(pending.event, event)
+        if merged is None:
+            del self._pending[key]
+        else:
+            pending.event = merged
+            pending.last_seen = now
+
+    def _next_deadline(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        return min(min(p.last_seen + self.window, p.first_seen + self.max_delay)
+                   for p in self._pending.values())
+
+    async def _run(self) -> None:
+        while True:
+            deadline = self._next_deadline()
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                event = await asyncio.wait_for(self._queue.get(), timeout)
+                self._add(event)
+                # Drain everything already queued before deciding what settled
+                while not self._queue.empty():
+                    self._add(self._queue.get_nowait())
+            except asyncio.TimeoutError:
+                pass
+            await self._flush()
+
+    def _pair_moves(self, events: List[NASEvent]) -> List[NASEvent]:
+        """Settle a delete and a create with the same fingerprint as a move.
+
+        Events without a fingerprint are never paired: a matching name alone
+        (two unrelated README.md files) is not evidence of a move, and
+        sources that see renames, like watchdog, report them as moves.
+        """
+        deleted = [event for event in events if event.type == 'deleted' and event.fingerprint is not None]
+        if not deleted:
+            return events
+        result, used = [], set()
+        for event in events:
+            if event.type != 'created' or event.fingerprint is None:
+                continue
+            for candidate in deleted:
+                if id(candidate) in used or candidate.is_directory != event.is_directory:
+                    continue
+                if candidate.fingerprint == event.fingerprint:
+                    used.add(id(candidate))
+                    used.add(id(event))
+                    result.append(NASEvent('moved', candidate.path, event.path,
+                                           is_directory=event.is_directory,
+                                           fingerprint=event.fingerprint))
+                    break
+        return result + [event for event in events if id(event) not in used]
+
+    async def _flush(self, force: bool = False) -> None:
+        now = time.monotonic()
+        settled = [
+            key for key, pending in self._pending.items()
+            if force or now - pending.last_seen >= self.window
+            or now - pending.first_seen >= self.max_delay
+        ]
+        events = [self._pending.pop(key).event for key in settled]
+        for event in self._pair_moves(events):
+            try:
+                if event.type == 'moved':
+                    await self.callback(event.type, event.path, event.dest_path)
+                else:
+                    await self.callback(event.type, event.path)
+            except Exception as e:
+                logger.error(f"Error handling NAS event {event.type} {event.path}: {str(e)}")
@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import base64
+import sqlite3
+import logging
+import posixpath
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL COLLATE NOCASE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    is_dir INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_parent_name ON entries (parent, name, path);
+CREATE INDEX IF NOT EXISTS idx_entries_parent_mtime ON entries (parent, mtime, path);
+CREATE INDEX IF NOT EXISTS idx_entries_parent_size ON entries (parent, size, path);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    dir_mtime REAL,
+    scanned_at REAL NOT NULL,
+    valid INTEGER NOT NULL
+);
+"""
+
+SORT_COLUMNS = {'name': 'name', 'modified': 'mtime', 'size': 'size'}
+
+
+def normalize_path(path: str) -> str:
+    """Share-relative path with forward slashes and no leading/trailing slash"""
+    path = posixpath.normpath(path.replace('\\', '/')).strip('/')
+    return '' if path == '.' else path
+
+
+def _encode_cursor(values: List[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor: str) -> List[Any]:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class NASMetadataIndex:
+    """SQLite index of share metadata (path, size, mtime, is_dir).
+
+    Directory listings are recorded per directory with a validity flag.
+    Listings are served from the index with keyset (cursor) pagination,
+    sorting and filename search; watcher events invalidate only the
+    directories that changed, which are rescanned on next access.
+    """
+
+    def __init__(self, path: str = './data/nas_index.db', ttl: Optional[float] = None):
+        self.ttl = ttl
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def is_fresh(self, directory: str) -> bool:
+        """True if the directory's listing is indexed and not invalidated"""
+        directory = normalize_path(directory)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT scanned_at, valid FROM directories WHERE path = ?', (directory,)
+            ).fetchone()
+        if not row or not row[1]:
+            return False
+        return self.ttl is None or time.time() - row[0] < self.ttl
+
+    def replace_directory(self,
+                          directory: str,
+                          entries: List[Dict[str, Any]],
+                          dir_mtime: Optional[float] = None) -> None:
+        """Store a fresh listing of one directory"""
+        directory = normalize_path(directory)
+        rows = [(
+            normalize_path(posixpath.join(directory, entry['name'])),
+            directory,
+            entry['name'],
+            entry.get('size', 0),
+            entry['mtime'],
+            int(entry['is_dir'])
+        ) for entry in entries]
+        with self._lock, self._conn:
+            removed = {row[0] for row in self._conn.execute(
+                'SELECT path FROM entries WHERE parent = ? AND is_dir = 1', (directory,)
+            )} - {row[0] for row in rows if row[5]}
+            for path in removed:
+                self._drop_subtree(path)
+            self._conn.execute('DELETE FROM entries WHERE parent = ?', (directory,))
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO entries (path, parent, name, size, mtime, is_dir) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            self._conn.execute(
+                'INSERT OR REPLACE INTO directories (path, dir_mtime, scanned_at, valid) '
+                'VALUES (?, ?, ?, 1)',
+                (directory, dir_mtime, time.time())
+            )
+
+    def _drop_subtree(self, path: str) -> None:
+        pattern = path.replace('%', r'\%').replace('_', r'\_') + '/%'
+        self._conn.execute(r"DELETE FROM entries WHERE path LIKE ? ESCAPE '\'", (pattern,))
+        self._conn.execute(r"DELETE FROM directories WHERE path = ? OR path LIKE ? ESCAPE '\'",
+                           (path, pattern))
+
+    def invalidate_directory(self, directory: str) -> None:
+        """Mark one directory's listing stale"""
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE directories SET valid = 0 WHERE path = ?', (normalize_path(directory),))
+
+    def invalidate(self, path: str) -> None:
+        """Mark the directory containing path stale; drop subtrees of removed dirs"""
+        path = normalize_path(path)
+        parent = posixpath.dirname(path)
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE directories SET valid = 0 WHERE path = ?', (parent,))
+            row = self._conn.execute(
+                'SELECT is_dir FROM entries WHERE path = ?', (path,)
+            ).fetchone()
+            if row and row[0]:
+                self._conn.execute('UPDATE directories SET valid = 0 WHERE path = ?', (path,))
+
+    def directory_info(self, directory: str) -> Optional[Tuple[Optional[float], bool]]:
+        """(dir_mtime, valid) recorded for a directory, or None if never listed"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT dir_mtime, valid FROM directories WHERE path = ?',
+                (normalize_path(directory),)
+            ).fetchone()
+        return (row[0], bool(row[1])) if row else None
+
+    def get_entries(self, directory: str) -> Dict[str, Tuple[int, float, bool]]:
+        """Indexed children of a directory as name -> (size, mtime, is_dir)"""
+        with self._lock:
+            return {row[0]: (row[1], row[2], bool(row[3])) for row in self._conn.execute(
+                'SELECT name, size, mtime, is_dir FROM entries WHERE parent = ?',
+                (normalize_path(directory),)
+            )}
+
+    def list_directories(self) -> List[str]:
+        """Every directory with a recorded listing, sorted"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                'SELECT path FROM directories ORDER BY path'
+            )]
+
+    def subtree_files(self, path: str) -> List[Tuple[str, int, float]]:
+        """Indexed files below a directory as (path, size, mtime)"""
+        pattern = normalize_path(path).replace('%', r'\%').replace('_', r'\_') + '/%'
+        with self._lock:
+            return self._conn.execute(
+                r"SELECT path, size, mtime FROM entries WHERE path LIKE ? ESCAPE '\' AND is_dir = 0",
+                (pattern,)
+            ).fetchall()
+
+    def list_directory(self,
+                       directory: str,
+                       limit: int = 100,
+                       cursor: Optional[str] = None,
+                       sort: str = 'name',
+                       order: str = 'asc',
+                       query: Optional[str] = None,
+                       recursive: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Page through indexed entries; returns (entries, next_cursor)"""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unsupported sort field: {sort}")
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"Unsupported sort order: {order}")
+        column = SORT_COLUMNS[sort]
+        directory = normalize_path(directory)
+
+        clauses, params = [], []
+        if recursive:
+            if directory:
+                escaped = directory.replace('%', r'\%').replace('_', r'\_')
+                clauses.append(r"path LIKE ? ESCAPE '\'")
+                params.append(escaped + '/%')
+        else:
+            clauses.append('parent = ?')
+            params.append(directory)
+        if query:
+            escaped = query.replace('%', r'\%').replace('_', r'\_')
+            clauses.append(r"name LIKE ? ESCAPE '\'")
+            params.append(f'%{escaped}%')
+        if cursor:
+            comparison = '>' if order == 'asc' else '<'
+            clauses.append(f'({column}, path) {comparison} (?, ?)')
+            params.extend(_decode_cursor(cursor))
+
+        direction = 'ASC' if order == 'asc' else 'DESC'
+        sql = (
+            'SELECT path, name, size, mtime, is_dir FROM entries'
+            + (' WHERE ' + ' AND '.join(clauses) if clauses else '')
+            + f' ORDER BY {column} {direction}, path {direction} LIMIT ?'
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, (*params, limit + 1)).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            sort_value = {'name': last[1], 'mtime': last[3], 'size': last[2]}[column]
+            next_cursor = _encode_cursor([sort_value, last[0]])
+        return [{
+            'name': row[1],
+            'path': row[0],
+            'size': row[2],
+            'modified': datetime.fromtimestamp(row[3]),
+            'is_dir': bool(row[4])
+        } for row in rows], next_cursor
@@ -1,59 +1,103 @@
 import os
 import logging
-from typing import List, Dict, Any, Optional
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+import posixpath
+from typing import List, Dict, Any, Optional, AsyncIterable
 import smbclient
 from pathlib import Path
 import asyncio
 from datetime import datetime
+from .smb_pool import SMBSessionPool, get_session_pool
+from .nas_index import NASMetadataIndex, normalize_path
+from .nas_events import EventCoalescer
+from .nas_snapshot import SnapshotWatcher
+from .nas_sync import NASSyncEngine
 
 logger = logging.getLogger(__name__)
 
-class NASEventHandler(FileSystemEventHandler):
-    def __init__(self, callback):
-        self.callback = callback
-    
-    def on_created(self, event):
-        if not event.is_directory:
-            asyncio.create_task(self.callback("created", event.src_path))
-    
-    def on_modified(self, event):
-        if not event.is_directory:
-            asyncio.create_task(self.callback("modified", event.src_path))
-    
-    def on_deleted(self, event):
-        if not event.is_directory:
-            asyncio.create_task(self.callback("deleted", event.src_path))
+class NASFileReader:
+    """Async iterator over a byte range of an open NAS file.
+
+    Each read runs on the integration's I/O executor, so at most one chunk
+    per reader is held in memory regardless of file size. The handle is
+    closed at the end of the range or on ``aclose``; a consumer that may
+    stop early (a client disconnecting mid-download) must call it.
+    """
+
+    def __init__(self, nas: 'NASIntegration', handle, start: int, end: Optional[int], chunk_size: int):
+        self.nas = nas
+        self.handle = handle
+        self.remaining = None if end is None else end - start + 1
+        self.chunk_size = chunk_size
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        if self.closed or self.remaining == 0:
+            await self.close()
+            raise StopAsyncIteration
+        size = self.chunk_size if self.remaining is None else min(self.chunk_size, self.remaining)
+        try:
+            chunk = await self.nas._run(self.handle.read, size)
+        except Exception:
+            await self.close()
+            raise
+        if not chunk:
+            await self.close()
+            raise StopAsyncIteration
+        if self.remaining is not None:
+            self.remaining -= len(chunk)
+        return chunk
+
+    async def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            await self.nas._run(self.handle.close)
+
+    async def aclose(self) -> None:
+        await self.close()
 
 class NASIntegration:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], pool: Optional[SMBSessionPool] = None):
         self.config = config
         self.observer = None
         self.mount_point = config['mount_point']
-        self._setup_smb_client()
+        self.chunk_size = config.get('chunk_size', 1024 * 1024)
+        # smbclient is blocking; all share I/O goes through the shared session
+        # pool so a large transfer never stalls the event loop and sessions
+        # are reused across requests
+        self.pool = pool or get_session_pool(config)
+        self.index = NASMetadataIndex(
+            config.get('index_path', './data/nas_index.db'),
+            ttl=config.get('index_ttl')
+        )
+        self.sync = NASSyncEngine(
+            self,
+            config.get('sync_manifest_path', './data/nas_sync.db'),
+            block_size=config.get('sync_block_size', 65536),
+            max_parallel=config.get('sync_max_parallel', 4)
+        )
+        self.mounted = False
+        self.coalescer: Optional[EventCoalescer] = None
+        self.snapshot_watcher: Optional[SnapshotWatcher] = None
     
-    def _setup_smb_client(self):
-        """Configure SMB client with credentials"""
-        try:
-            smbclient.ClientConfig(
-                username=self.config.get('username'),
-                password=self.config.get('password'),
-                domain=self.config.get('domain', '')
-            )
-        except Exception as e:
-            logger.error(f"Failed to setup SMB client: {str(e)}")
-            raise
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking SMB call on the session pool (see SMBSessionPool.call)"""
+        return await self.pool.run(func, *args, **kwargs)
     
     async def mount_share(self) -> bool:
         """Mount the NAS share"""
+        if self.mounted:
+            return True
         try:
             if not os.path.exists(self.mount_point):
                 os.makedirs(self.mount_point)
             
             # Mount the share using smbclient
             share_path = f"//{self.config['host']}/{self.config['share']}"
-            smbclient.mount(share_path, self.mount_point)
+            await self._run(smbclient.mount, share_path, self.mount_point)
+            self.mounted = True
             logger.info(f"Successfully mounted {share_path} to {self.mount_point}")
             return True
         except Exception as e:
@@ -63,69 +107,238 @@ class NASIntegration:
     async def unmount_share(self) -> bool:
         """Unmount the NAS share"""
         try:
-            smbclient.unmount(self.mount_point)
+            await self._run(smbclient.unmount, self.mount_point)
+            self.mounted = False
             logger.info(f"Successfully unmounted {self.mount_point}")
             return True
         except Exception as e:
             logger.error(f"Failed to unmount share: {str(e)}")
             return False
     
+    def _list_files_sync(self, path: str) -> List[Dict[str, Any]]:
+        full_path = os.path.join(self.mount_point, path)
+        files = []
+        
+        for entry in smbclient.scandir(full_path):
+            stat = entry.stat()
+            files.append({
+                'name': entry.name,
+                'path': os.path.join(path, entry.name),
+                'size': stat.st_size,
+                'modified': datetime.fromtimestamp(stat.st_mtime),
+                'is_dir': entry.is_dir()
+            })
+        
+        return files
+    
     async def list_files(self, path: str = "") -> List[Dict[str, Any]]:
         """List files in the specified path"""
         try:
-            full_path = os.path.join(self.mount_point, path)
-            files = []
-            
-            for entry in smbclient.scandir(full_path):
-                stat = entry.stat()
-                files.append({
-                    'name': entry.name,
-                    'path': os.path.join(path, entry.name),
-                    'size': stat.st_size,
-                    'modified': datetime.fromtimestamp(stat.st_mtime),
-                    'is_dir': entry.is_dir()
-                })
-            
-            return files
+            return await self._run(self._list_files_sync, path, idempotent=True)
         except Exception as e:
             logger.error(f"Error listing files: {str(e)}")
             raise
     
+    def _index_directory_sync(self, path: str) -> None:
+        full_path = os.path.join(self.mount_point, path)
+        dir_mtime = smbclient.stat(full_path).st_mtime
+        entries = []
+        for entry in smbclient.scandir(full_path):
+            stat = entry.stat()
+            entries.append({
+                'name': entry.name,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'is_dir': entry.is_dir()
+            })
+        self.index.replace_directory(path, entries, dir_mtime)
+    
+    def _refresh_tree_sync(self, path: str, limit: int) -> bool:
+        """Rescan stale directories below path; False if ``limit`` rescans were not enough"""
+        pending = [normalize_path(path)]
+        rescans = 0
+        while pending:
+            directory = pending.pop()
+            if not self.index.is_fresh(directory):
+                if rescans == limit:
+                    return False
+                self._index_directory_sync(directory)
+                rescans += 1
+            pending.extend(
+                posixpath.join(directory, name) if directory else name
+                for name, (_, _, is_dir) in self.index.get_entries(directory).items() if is_dir
+            )
+        return True
+    
+    async def list_directory(self,
+                             path: str = "",
+                             limit: int = 100,
+                             cursor: Optional[str] = None,
+                             sort: str = 'name',
+                             order: str = 'asc',
+                             query: Optional[str] = None,
+                             recursive: bool = False) -> Dict[str, Any]:
+        """List a directory from the metadata index, rescanning it only if stale.
+        
+        Recursive listings first rescan every stale directory in the
+        subtree, up to ``recursive_refresh_limit`` per request; beyond that
+        the result is served from the index and marked ``partial``.
+        """
+        try:
+            partial = False
+            if recursive:
+                complete = await self._run(
+                    self._refresh_tree_sync, path,
+                    self.config.get('recursive_refresh_limit', 100), idempotent=True
+                )
+                partial = not complete
+            elif not self.index.is_fresh(path):
+                await self._run(self._index_directory_sync, path, idempotent=True)
+            files, next_cursor = self.index.list_directory(
+                path, limit=limit, cursor=cursor, sort=sort,
+                order=order, query=query, recursive=recursive
+            )
+            result = {'files': files, 'next_cursor': next_cursor}
+            if recursive:
+                result['partial'] = partial
+            return result
+        except Exception as e:
+            logger.error(f"Error listing directory: {str(e)}")
+            raise
+    
+    def _invalidate(self, full_path: str) -> None:
+        """Invalidate the index for an absolute path under the mount point"""
+        relative = os.path.relpath(full_path, self.mount_point)
+        if not relative.startswith('..'):
+            self.index.invalidate(relative)
+    
+    async def stat_file(self, path: str) -> Dict[str, Any]:
+        """Get size and modification time of a file"""
+        full_path = os.path.join(self.mount_point, path)
+        stat = await self._run(smbclient.stat, full_path, idempotent=True)
+        return {
+            'path': path,
+            'size': stat.st_size,
+            'modified': datetime.fromtimestamp(stat.st_mtime)
+        }
+    
+    async def open_reader(self,
+                          path: str,
+                          start: int = 0,
+                          end: Optional[int] = None,
+                          chunk_size: Optional[int] = None) -> NASFileReader:
+        """Open a file for chunked async reading of bytes start..end (inclusive)"""
+        try:
+            full_path = os.path.join(self.mount_point, path)
+            handle = await self._run(smbclient.open_file, full_path, mode='rb', idempotent=True)
+            if start:
+                await self._run(handle.seek, start)
+            return NASFileReader(self, handle, start, end, chunk_size or self.chunk_size)
+        except Exception as e:
+            logger.error(f"Error opening file: {str(e)}")
+            raise
+    
+    async def iter_file(self,
+                        path: str,
+                        start: int = 0,
+                        end: Optional[int] = None,
+                        chunk_size: Optional[int] = None):
+        """Yield file contents in chunks"""
+        reader = await self.open_reader(path, start, end, chunk_size)
+        try:
+            async for chunk in reader:
+                yield chunk
+        finally:
+            await reader.close()
+    
     async def read_file(self, path: str) -> bytes:
         """Read file contents"""
         try:
-            full_path = os.path.join(self.mount_point, path)
-            with smbclient.open_file(full_path, mode='rb') as f:
-                return f.read()
+            return b''.join([chunk async for chunk in self.iter_file(path)])
         except Exception as e:
             logger.error(f"Error reading file: {str(e)}")
             raise
     
+    async def write_stream(self, path: str, chunks: AsyncIterable[bytes]) -> int:
+        """Write a file from an async stream of chunks; returns bytes written"""
+        full_path = os.path.join(self.mount_point, path)
+        handle = await self._run(smbclient.open_file, full_path, mode='wb')
+        self.sync.forget(path)
+        written = 0
+        try:
+            async for chunk in chunks:
+                if chunk:
+                    await self._run(handle.write, chunk)
+                    written += len(chunk)
+        finally:
+            try:
+                await self._run(handle.close)
+            finally:
+                # After close, so a listing taken mid-upload is not kept
+                self.index.invalidate(path)
+        return written
+    
     async def write_file(self, path: str, content: bytes) -> bool:
-        """Write content to file"""
+        """Write content to file, sending only what differs from the share's copy"""
         try:
-            full_path = os.path.join(self.mount_point, path)
-            with smbclient.open_file(full_path, mode='wb') as f:
-                f.write(content)
+            stats = await self._run(self.sync.sync_buffer, content, path)
+            self.index.invalidate(path)
+            logger.debug(f"Wrote {path}: sent {stats['bytes_sent']} of {stats['bytes_total']} bytes")
             return True
         except Exception as e:
             logger.error(f"Error writing file: {str(e)}")
             return False
     
+    async def sync_files(self, local_path: str, remote_path: str) -> Dict[str, int]:
+        """Sync a local file or directory to the share; returns transfer statistics"""
+        try:
+            return await self.sync.sync_files(local_path, remote_path)
+        except Exception as e:
+            logger.error(f"Error syncing files: {str(e)}")
+            raise
+    
     async def delete_file(self, path: str) -> bool:
         """Delete a file"""
         try:
             full_path = os.path.join(self.mount_point, path)
-            smbclient.remove(full_path)
+            await self._run(smbclient.remove, full_path)
+            self.index.invalidate(path)
+            self.sync.forget(path)
             return True
         except Exception as e:
             logger.error(f"Error deleting file: {str(e)}")
             return False
     
     async def start_monitoring(self, callback) -> None:
-        """Start monitoring the NAS share for changes"""
+        """Start monitoring the NAS share for changes.
+        
+        The callback receives settled events as (event_type, path) or, for
+        moves, ("moved", src_path, dest_path). With ``watch_mode: poll`` the
+        share is polled by a SnapshotWatcher instead of relying on change
+        notifications, which many network shares do not deliver.
+        """
         try:
-            event_handler = NASEventHandler(callback)
+            self.coalescer = EventCoalescer(
+                callback,
+                window=self.config.get('event_debounce', 2.0),
+                max_delay=self.config.get('event_max_delay', 60.0)
+            )
+            await self.coalescer.start()
+            if self.config.get('watch_mode', 'watchdog') == 'poll':
+                self.snapshot_watcher = SnapshotWatcher(
+                    self,
+                    NASMetadataIndex(self.config.get('snapshot_path', './data/nas_snapshot.db')),
+                    interval=self.config.get('poll_interval', 30.0),
+                    dirs_per_pass=self.config.get('poll_dirs_per_pass', 200),
+                    verify_interval=self.config.get('poll_verify_interval', 3600.0)
+                )
+                await self.snapshot_watcher.start()
+                logger.info(f"Started polling {self.mount_point}")
+                return
+            # watchdog is only needed for this mode, so it is imported here
+            from watchdog.observers import Observer
+            from .nas_watch import NASEventHandler
+            event_handler = NASEventHandler(self.coalescer, on_change=self._invalidate)
             self.observer = Observer()
             self.observer.schedule(event_handler, self.mount_point, recursive=True)
             self.observer.start()
@@ -136,7 +349,15 @@ class NASIntegration:
     
     async def stop_monitoring(self) -> None:
         """Stop monitoring the NAS share"""
+        if self.snapshot_watcher:
+            await self.snapshot_watcher.stop()
+            self.snapshot_watcher = None
+            logger.info("Stopped share polling")
         if self.observer:
             self.observer.stop()
-            self.observer.join()
-            logger.info("Stopped file monitoring") 
\ No newline at end of file
+            await asyncio.to_thread(self.observer.join)
+            self.observer = None
+            logger.info("Stopped file monitoring")
+        if self.coalescer:
+            await self.coalescer.stop()
+            self.coalescer = None 
\ No newline at end of file
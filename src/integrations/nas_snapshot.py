@@ -0,0 +1,216 @@
+import os
+import bisect
+import asyncio
+import logging
+import posixpath
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
+
+import smbclient
+
+from .nas_events import NASEvent
+from .nas_index import NASMetadataIndex
+
+if TYPE_CHECKING:
+    from .nas_integration import NASIntegration
+
+logger = logging.getLogger(__name__)
+
+# name -> (size, mtime, is_dir), the shape NASMetadataIndex.get_entries returns
+Listing = Dict[str, Tuple[int, float, bool]]
+
+
+class SnapshotWatcher:
+    """Polling change detector for shares where change notifications are
+    unreliable (SMB notify over VPNs, NFS, NAS appliances without inotify).
+
+    The snapshot is a NASMetadataIndex of its own, persisted so a restart
+    resumes diffing instead of rescanning the share. It must not be the
+    API's listing index: API rescans would record changes the watcher has
+    not diffed yet, and their events would be lost. Directories found
+    changed are invalidated in the API index instead. Each pass:
+
+    * re-lists "hot" directories that changed in the last few passes,
+    * stats the next ``dirs_per_pass`` directories in round-robin order and
+      re-lists only those whose mtime moved (creates, deletes and renames
+      bump the parent directory's mtime),
+    * once every ``verify_interval`` seconds, re-lists the round-robin batch
+      regardless of mtime, to catch in-place edits that leave the directory
+      mtime alone.
+
+    Per-pass cost is therefore bounded by the stat budget plus the number
+    of changed directories, not by the size of the share. Listings are
+    diffed against the snapshot and the differences submitted to the
+    coalescer as events with (size, mtime) fingerprints, so a delete and a
+    create of the same file settle as a move.
+    """
+
+    def __init__(self,
+                 nas: 'NASIntegration',
+                 snapshot: NASMetadataIndex,
+                 interval: float = 30.0,
+                 dirs_per_pass: int = 200,
+                 verify_interval: float = 3600.0,
+                 hot_passes: int = 5):
+        self.nas = nas
+        self.snapshot = snapshot
+        self.interval = interval
+        self.dirs_per_pass = dirs_per_pass
+        self.verify_interval = verify_interval
+        self.hot_passes = hot_passes
+        self._hot: Dict[str, int] = {}
+        self._cursor: Optional[str] = None
+        self._verifying = False
+        self._last_verify: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.scan_once()
+            except Exception as e:
+                logger.error(f"Error polling {self.nas.mount_point}: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def scan_once(self) -> int:
+        """Run one pass and submit its events; returns the number of changes"""
+        now = asyncio.get_running_loop().time()
+        events = await self.nas._run(self._scan_sync, now, idempotent=True)
+        for event in events:
+            self.nas.coalescer.submit(event)
+        return len(events)
+
+    def _full_path(self, path: str) -> str:
+        return os.path.join(self.nas.mount_point, path)
+
+    def _list(self, directory: str) -> Tuple[float, Listing]:
+        full_path = self._full_path(directory)
+        dir_mtime = smbclient.stat(full_path).st_mtime
+        listing = {}
+        for entry in smbclient.scandir(full_path):
+            stat = entry.stat()
+            listing[entry.name] = (stat.st_size, stat.st_mtime, entry.is_dir())
+        return dir_mtime, listing
+
+    def _record(self, directory: str, dir_mtime: float, listing: Listing) -> None:
+        self.snapshot.replace_directory(directory, [
+            {'name': name, 'size': size, 'mtime': mtime, 'is_dir': is_dir}
+            for name, (size, mtime, is_dir) in listing.items()
+        ], dir_mtime)
+
+    def _scan_sync(self, now: float) -> List[NASEvent]:
+        index = self.snapshot
+        if index.directory_info('') is None:
+            # No snapshot yet: record a baseline without reporting the whole share
+            self._baseline_sync('')
+            self._last_verify = now
+            return []
+
+        if self._cursor is None:
+            # Start of a round-robin cycle: decide whether it re-lists everything
+            self._verifying = now - (self._last_verify or 0) >= self.verify_interval
+            if self._verifying:
+                self._last_verify = now
+        batch = self._next_batch()
+        forced = set(self._hot) | (set(batch) if self._verifying else set())
+        pending = list(self._hot) + [d for d in batch if d not in self._hot]
+        self._hot = {d: n - 1 for d, n in self._hot.items() if n > 1}
+
+        events: List[NASEvent] = []
+        checked = set()
+        while pending:
+            directory = pending.pop(0)
+            if directory not in checked:
+                checked.add(directory)
+                pending.extend(self._check_directory(directory, directory in forced, events))
+        return events
+
+    def _next_batch(self) -> List[str]:
+        """Next directories in round-robin order; the cursor resets after a full cycle"""
+        directories = self.snapshot.list_directories()
+        start = 0 if self._cursor is None else bisect.bisect_right(directories, self._cursor)
+        batch = directories[start:start + self.dirs_per_pass]
+        self._cursor = batch[-1] if start + self.dirs_per_pass < len(directories) else None
+        return batch
+
+    def _check_directory(self, directory: str, force: bool, events: List[NASEvent]) -> List[str]:
+        """Diff one directory against the snapshot; returns directories to check next"""
+        index = self.snapshot
+        try:
+            if not force:
+                info = index.directory_info(directory)
+                mtime = smbclient.stat(self._full_path(directory)).st_mtime
+                if info and info[1] and info[0] == mtime:
+                    return []
+            dir_mtime, listing = self._list(directory)
+        except FileNotFoundError:
+            # Gone: the parent's listing reports the deletion
+            parent = posixpath.dirname(directory)
+            return [parent] if directory else []
+
+        previous = index.get_entries(directory)
+        changed = False
+        for name, (size, mtime, is_dir) in listing.items():
+            path = posixpath.join(directory, name) if directory else name
+            old = previous.get(name)
+            if old is None or old[2] != is_dir:
+                if old is not None:
+                    self._report_removed(path, old, events)
+                if is_dir:
+                    self._baseline_sync(path, events)
+                else:
+                    events.append(NASEvent('created', self._full_path(path),
+                                           fingerprint=(size, mtime)))
+                changed = True
+            elif not is_dir and (size, mtime) != old[:2]:
+                events.append(NASEvent('modified', self._full_path(path),
+                                       fingerprint=(size, mtime)))
+                changed = True
+        for name, old in previous.items():
+            if name not in listing:
+                self._report_removed(posixpath.join(directory, name) if directory else name,
+                                     old, events)
+                changed = True
+
+        self._record(directory, dir_mtime, listing)
+        if changed:
+            self._hot[directory] = self.hot_passes
+            self.nas.index.invalidate_directory(directory)
+        return []
+
+    def _report_removed(self, path: str, old: Tuple[int, float, bool], events: List[NASEvent]) -> None:
+        if old[2]:
+            for file_path, size, mtime in self.snapshot.subtree_files(path):
+                events.append(NASEvent('deleted', self._full_path(file_path),
+                                       fingerprint=(size, mtime)))
+        else:
+            events.append(NASEvent('deleted', self._full_path(path), fingerprint=old[:2]))
+
+    def _baseline_sync(self, directory: str, events: Optional[List[NASEvent]] = None) -> None:
+        """Record a subtree; with an events list, report its files as created"""
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            try:
+                dir_mtime, listing = self._list(current)
+            except FileNotFoundError:
+                continue
+            self._record(current, dir_mtime, listing)
+            for name, (size, mtime, is_dir) in listing.items():
+                path = posixpath.join(current, name) if current else name
+                if is_dir:
+                    pending.append(path)
+                elif events is not None:
+                    events.append(NASEvent('created', self._full_path(path),
+                                           fingerprint=(size, mtime)))
@@ -0,0 +1,469 @@
+import os
+import mmap
+import uuid
+import zlib
+import struct
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import posixpath
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+
+import smbclient
+
+from .nas_index import normalize_path
+
+if TYPE_CHECKING:
+    from .nas_integration import NASIntegration
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_files (
+    path TEXT PRIMARY KEY,
+    remote_size INTEGER NOT NULL,
+    remote_mtime REAL NOT NULL,
+    content_hash TEXT NOT NULL,
+    block_size INTEGER NOT NULL,
+    signatures BLOB NOT NULL,
+    source_size INTEGER,
+    source_mtime REAL
+);
+CREATE INDEX IF NOT EXISTS idx_sync_files_hash ON sync_files (content_hash);
+"""
+
+ADLER_MOD = 65521
+STRONG_SIZE = 16
+SIGNATURE = struct.Struct(f'>I{STRONG_SIZE}s')
+# Server-side copy limits (MS-SMB2 3.3.3): bytes per chunk, chunks per request
+MAX_COPY_CHUNK_SIZE = 1024 * 1024
+MAX_COPY_CHUNK_COUNT = 16
+
+# A block signature: (adler32 weak checksum, truncated BLAKE2b strong hash)
+Signature = Tuple[int, bytes]
+# A matched range: (target_offset, source_offset, length)
+Match = Tuple[int, int, int]
+
+
+def strong_hash(block) -> bytes:
+    return hashlib.blake2b(block, digest_size=STRONG_SIZE).digest()
+
+
+def block_signatures(data, block_size: int) -> List[Signature]:
+    """Signatures of consecutive blocks; the last one may be short"""
+    view = memoryview(data)
+    return [(zlib.adler32(view[offset:offset + block_size]),
+             strong_hash(view[offset:offset + block_size]))
+            for offset in range(0, len(view), block_size)]
+
+
+def pack_signatures(signatures: List[Signature]) -> bytes:
+    return b''.join(SIGNATURE.pack(weak, strong) for weak, strong in signatures)
+
+
+def unpack_signatures(blob: bytes) -> List[Signature]:
+    return list(SIGNATURE.iter_unpack(blob))
+
+
+def compute_delta(data,
+                  signatures: List[Signature],
+                  block_size: int,
+                  basis_size: int) -> Optional[List[Match]]:
+    """rsync-style delta of data against the basis described by signatures.
+
+    Full blocks are located at any offset with a rolling adler32: the weak
+    checksum is computed once per window (in C) and then rolled a byte at
+    a time only across unmatched data, so unchanged files cost one pass of
+    zlib. Returns the matched ranges (everything else is literal), or None
+    once more than half of the data is literal and a delta is not worth it.
+    """
+    size = len(data)
+    view = memoryview(data)
+    full_blocks = basis_size // block_size
+    table: Dict[int, List[int]] = {}
+    for index in range(full_blocks):
+        table.setdefault(signatures[index][0], []).append(index)
+    literal_limit = max(size // 2, 4 * block_size)
+
+    matches: List[Match] = []
+    literal = 0
+    pos = 0
+    weak = None
+    while pos + block_size <= size:
+        if weak is None:
+            weak = zlib.adler32(view[pos:pos + block_size])
+        candidates = table.get(weak)
+        if candidates:
+            strong = strong_hash(view[pos:pos + block_size])
+            found = None
+            for index in candidates:
+                if signatures[index][1] == strong:
+                    found = index
+                    # Prefer the block at the same offset: it needs no write
+                    if index * block_size == pos:
+                        break
+            if found is not None:
+                matches.append((pos, found * block_size, block_size))
+                pos += block_size
+                weak = None
+                continue
+
+        literal += 1
+        if literal > literal_limit:
+            return None
+        if pos + block_size < size:
+            removed, added = data[pos], data[pos + block_size]
+            a = ((weak & 0xffff) - removed + added) % ADLER_MOD
+            b = ((weak >> 16) - block_size * removed + a - 1) % ADLER_MOD
+            weak = (b << 16) | a
+        pos += 1
+
+    # A short final block can only match the basis's own short final block
+    tail = basis_size % block_size
+    if tail and size - pos == tail and strong_hash(view[pos:]) == signatures[-1][1]:
+        matches.append((pos, basis_size - tail, tail))
+    return matches
+
+
+def literal_ranges(size: int, matches: List[Match]) -> List[Tuple[int, int]]:
+    """Byte ranges (offset, length) of data not covered by any match"""
+    ranges: List[Tuple[int, int]] = []
+    pos = 0
+    for target, _, length in matches:
+        if target > pos:
+            ranges.append((pos, target - pos))
+        pos = target + length
+    if pos < size:
+        ranges.append((pos, size - pos))
+    return ranges
+
+
+def changed_ranges(size: int, matches: List[Match]) -> List[Tuple[int, int]]:
+    """Byte ranges (offset, length) that must be written to patch the basis in place.
+
+    Blocks matched at their own offset are already in place; everything
+    else, including blocks that only moved, is written from the source.
+    """
+    return literal_ranges(size, [match for match in matches if match[0] == match[1]])
+
+
+def copy_runs(matches: List[Match]) -> List[Match]:
+    """Matches merged into contiguous runs, split to the server's chunk size"""
+    runs: List[Match] = []
+    for target, source, length in matches:
+        if runs:
+            last_target, last_source, last_length = runs[-1]
+            if last_target + last_length == target and last_source + last_length == source \
+                    and last_length + length <= MAX_COPY_CHUNK_SIZE:
+                runs[-1] = (last_target, last_source, last_length + length)
+                continue
+        runs.append((target, source, length))
+    return runs
+
+
+def copy_chunks(source_path: str, target, chunks: List[Match]) -> None:
+    """Copy (target_offset, source_offset, length) ranges of a remote file
+    into an open remote file on the server (FSCTL_SRV_COPYCHUNK_WRITE), as
+    smbclient.copyfile does for whole files; no data crosses the network.
+    """
+    from smbclient._io import SMBFileTransaction, ioctl_request
+    from smbprotocol.ioctl import (
+        CtlCode, IOCTLFlags, SMB2SrvCopyChunk, SMB2SrvCopyChunkCopy,
+        SMB2SrvCopyChunkResponse, SMB2SrvRequestResumeKey
+    )
+
+    with smbclient.open_file(source_path, mode='rb', share_access='r', buffering=0) as source:
+        with SMBFileTransaction(source) as transaction:
+            ioctl_request(transaction, CtlCode.FSCTL_SRV_REQUEST_RESUME_KEY,
+                          flags=IOCTLFlags.SMB2_0_IOCTL_IS_FSCTL, output_size=32)
+        resume = SMB2SrvRequestResumeKey()
+        resume.unpack(transaction.results[0])
+        resume_key = resume['resume_key'].get_value()
+
+        for start in range(0, len(chunks), MAX_COPY_CHUNK_COUNT):
+            batch = []
+            for target_offset, source_offset, length in chunks[start:start + MAX_COPY_CHUNK_COUNT]:
+                chunk = SMB2SrvCopyChunk()
+                chunk['source_offset'] = source_offset
+                chunk['target_offset'] = target_offset
+                chunk['length'] = length
+                batch.append(chunk)
+            with SMBFileTransaction(target) as transaction:
+                request = SMB2SrvCopyChunkCopy()
+                request['source_key'] = resume_key
+                request['chunks'] = batch
+                ioctl_request(transaction, CtlCode.FSCTL_SRV_COPYCHUNK_WRITE,
+                              flags=IOCTLFlags.SMB2_0_IOCTL_IS_FSCTL, output_size=12,
+                              input_buffer=request)
+            for result in transaction.results:
+                response = SMB2SrvCopyChunkResponse()
+                response.unpack(result)
+                if response['chunks_written'].get_value() != len(batch):
+                    raise OSError(f"Server-side copy from {source_path} was incomplete")
+
+
+@contextmanager
+def _local_buffer(path: str):
+    """Read-only mmap of a local file (bytes for empty files)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+class NASSyncEngine:
+    """Content-aware local-to-share file sync.
+
+    A SQLite manifest records, for every file written through the engine,
+    the remote size/mtime at the time of writing, its content hash and its
+    block signatures. That lets a write:
+
+    * skip entirely when the source's size/mtime (or content hash) matches
+      what is already on the share,
+    * become a server-side copy when identical content already exists at
+      another path on the share,
+    * otherwise send only the changed blocks, found with an rsync-style
+      rolling checksum against the cached signatures (read from the share
+      once if it changed behind our back). Blocks that are still at their
+      offset are patched in place; when blocks moved (data was inserted or
+      removed) the file is rebuilt in a temporary file on the share, the
+      matched blocks copied server-side from the old version.
+
+    Each call reports bytes sent, bytes read for signatures and bytes saved
+    compared with rewriting every file.
+    """
+
+    def __init__(self,
+                 nas: 'NASIntegration',
+                 manifest_path: str = './data/nas_sync.db',
+                 block_size: int = 65536,
+                 max_parallel: int = 4):
+        self.nas = nas
+        self.block_size = block_size
+        self.max_parallel = max_parallel
+        if manifest_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(manifest_path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _full_path(self, path: str) -> str:
+        return os.path.join(self.nas.mount_point, path)
+
+    def _record(self, path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT remote_size, remote_mtime, content_hash, block_size, signatures, '
+                'source_size, source_mtime FROM sync_files WHERE path = ?', (path,)
+            ).fetchone()
+        if not row:
+            return None
+        return dict(zip(('remote_size', 'remote_mtime', 'content_hash', 'block_size',
+                         'signatures', 'source_size', 'source_mtime'), row))
+
+    def _save(self, path: str, content_hash: str, signatures: List[Signature],
+              source: Optional[os.stat_result]) -> None:
+        stat = smbclient.stat(self._full_path(path))
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO sync_files (path, remote_size, remote_mtime, content_hash, '
+                'block_size, signatures, source_size, source_mtime) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (path, stat.st_size, stat.st_mtime, content_hash, self.block_size,
+                 pack_signatures(signatures),
+                 source.st_size if source else None, source.st_mtime if source else None)
+            )
+
+    def _copy_source(self, content_hash: str, path: str) -> Optional[str]:
+        """Another remote path that still holds identical content"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT path, remote_size, remote_mtime FROM sync_files '
+                'WHERE content_hash = ? AND path != ?', (content_hash, path)
+            ).fetchall()
+        for other, size, mtime in rows:
+            try:
+                stat = smbclient.stat(self._full_path(other))
+            except OSError:
+                continue
+            if stat.st_size == size and stat.st_mtime == mtime:
+                return other
+        return None
+
+    def _read_remote_signatures(self, path: str, stats: Dict[str, int]) -> Tuple[List[Signature], str]:
+        """Signatures and hash of a remote file we have no valid record for"""
+        signatures: List[Signature] = []
+        digest = hashlib.sha256()
+        with smbclient.open_file(self._full_path(path), mode='rb') as f:
+            for block in iter(lambda: f.read(self.block_size), b''):
+                signatures.append((zlib.adler32(block), strong_hash(block)))
+                digest.update(block)
+                stats['bytes_read'] += len(block)
+        return signatures, digest.hexdigest()
+
+    def sync_buffer(self,
+                    data,
+                    path: str,
+                    source: Optional[os.stat_result] = None) -> Dict[str, int]:
+        """Bring one remote file in line with data (blocking; run on the pool)"""
+        path = normalize_path(path)
+        full_path = self._full_path(path)
+        size = len(data)
+        stats = {'files': 1, 'skipped': 0, 'copied': 0, 'patched': 0, 'uploaded': 0,
+                 'bytes_total': size, 'bytes_sent': 0, 'bytes_read': 0}
+
+        record = self._record(path)
+        try:
+            remote = smbclient.stat(full_path)
+        except FileNotFoundError:
+            remote = None
+        known = (record is not None and remote is not None
+                 and record['remote_size'] == remote.st_size
+                 and record['remote_mtime'] == remote.st_mtime
+                 and record['block_size'] == self.block_size)
+        if known and source is not None and record['source_size'] == source.st_size \
+                and record['source_mtime'] == source.st_mtime:
+            stats['skipped'] = 1
+            return stats
+
+        content_hash = hashlib.sha256(data).hexdigest()
+        if known:
+            signatures = unpack_signatures(record['signatures'])
+            remote_hash = record['content_hash']
+        elif remote is not None:
+            signatures, remote_hash = self._read_remote_signatures(path, stats)
+        else:
+            signatures, remote_hash = [], None
+
+        if remote_hash == content_hash:
+            self._save(path, content_hash, signatures, source)
+            stats['skipped'] = 1
+            return stats
+
+        copy_from = self._copy_source(content_hash, path)
+        if copy_from:
+            smbclient.copyfile(self._full_path(copy_from), full_path)
+            self._save(path, content_hash, block_signatures(data, self.block_size), source)
+            stats['copied'] = 1
+            return stats
+
+        matches = compute_delta(data, signatures, self.block_size, remote.st_size) \
+            if remote is not None and signatures else None
+        view = memoryview(data)
+        if matches is None:
+            with smbclient.open_file(full_path, mode='wb') as f:
+                for offset in range(0, size, self.nas.chunk_size):
+                    f.write(view[offset:offset + self.nas.chunk_size])
+            stats['uploaded'] = 1
+            stats['bytes_sent'] = size
+        else:
+            rebuilt = False
+            if any(target != source for target, source, _ in matches):
+                try:
+                    stats['bytes_sent'] += self._rebuild(full_path, view, matches)
+                    rebuilt = True
+                except Exception as e:
+                    # e.g. a server without server-side copy support
+                    logger.warning(f"Server-side copy failed for {path}, patching in place: {str(e)}")
+            if not rebuilt:
+                with smbclient.open_file(full_path, mode='r+b') as f:
+                    stats['bytes_sent'] += self._write_ranges(f, view, changed_ranges(size, matches))
+                    f.truncate(size)
+            stats['patched'] = 1
+        self._save(path, content_hash, block_signatures(data, self.block_size), source)
+        return stats
+
+    def _write_ranges(self, f, view: memoryview, ranges: List[Tuple[int, int]]) -> int:
+        """Write ranges of view to the open remote file; returns the bytes sent"""
+        sent = 0
+        for offset, length in ranges:
+            f.seek(offset)
+            for start in range(offset, offset + length, self.nas.chunk_size):
+                end = min(start + self.nas.chunk_size, offset + length)
+                f.write(view[start:end])
+                sent += end - start
+        return sent
+
+    def _rebuild(self, full_path: str, view: memoryview, matches: List[Match]) -> int:
+        """Assemble the new version next to the old one and swap it in.
+
+        Matched blocks are copied on the server from the old version, so
+        only the literal data is sent; returns the bytes sent.
+        """
+        directory, name = os.path.split(full_path)
+        temp_path = os.path.join(directory, f".{name}.sync-{uuid.uuid4().hex}")
+        try:
+            with smbclient.open_file(temp_path, mode='wb', buffering=0) as f:
+                copy_chunks(full_path, f, copy_runs(matches))
+                sent = self._write_ranges(f, view, literal_ranges(len(view), matches))
+                f.truncate(len(view))
+            smbclient.replace(temp_path, full_path)
+        except Exception:
+            try:
+                smbclient.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        return sent
+
+    def sync_local_file(self, local_path: str, path: str) -> Dict[str, int]:
+        """Sync one local file to a share-relative path (blocking)"""
+        source = os.stat(local_path)
+        with _local_buffer(local_path) as data:
+            return self.sync_buffer(data, path, source)
+
+    def forget(self, path: str) -> None:
+        """Drop the record for a remote path that was changed or removed"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM sync_files WHERE path = ?', (normalize_path(path),))
+
+    async def sync_files(self, local_path: str, remote_path: str) -> Dict[str, int]:
+        """Mirror a local file or directory tree onto the share.
+
+        Files are synced concurrently (bounded by ``max_parallel`` and by the
+        session pool's executor); returns aggregate transfer statistics.
+        """
+        if os.path.isdir(local_path):
+            pairs = []
+            for root, _, files in os.walk(local_path):
+                relative = os.path.relpath(root, local_path)
+                target = remote_path if relative == '.' else posixpath.join(
+                    remote_path, relative.replace(os.sep, '/'))
+                pairs.extend((os.path.join(root, name), posixpath.join(target, name))
+                             for name in files)
+            directories = sorted({posixpath.dirname(target) for _, target in pairs})
+            await self.nas._run(self._make_directories, directories, idempotent=True)
+        else:
+            pairs = [(local_path, remote_path)]
+
+        totals = {'files': 0, 'skipped': 0, 'copied': 0, 'patched': 0, 'uploaded': 0,
+                  'failed': 0, 'bytes_total': 0, 'bytes_sent': 0, 'bytes_read': 0}
+        semaphore = asyncio.Semaphore(self.max_parallel)
+
+        async def sync_one(source: str, target: str) -> None:
+            async with semaphore:
+                try:
+                    result = await self.nas._run(self.sync_local_file, source, target)
+                except Exception as e:
+                    logger.error(f"Error syncing {source} to {target}: {str(e)}")
+                    totals['files'] += 1
+                    totals['failed'] += 1
+                    return
+            for key, value in result.items():
+                totals[key] += value
+            self.nas.index.invalidate(target)
+
+        await asyncio.gather(*(sync_one(source, target) for source, target in pairs))
+        totals['bytes_saved'] = totals['bytes_total'] - totals['bytes_sent'] - totals['bytes_read']
+        logger.info(f"Synced {local_path} to {remote_path}: {totals}")
+        return totals
+
+    def _make_directories(self, directories: List[str]) -> None:
+        for directory in directories:
+            if directory:
+                smbclient.makedirs(self._full_path(directory), exist_ok=True)
@@ -0,0 +1,35 @@
+from watchdog.events import FileSystemEventHandler
+
+from .nas_events import EventCoalescer, NASEvent
+
+
+class NASEventHandler(FileSystemEventHandler):
+    """Forwards watchdog events from the observer thread to the event loop"""
+    
+    def __init__(self, coalescer: EventCoalescer, on_change=None):
+        self.coalescer = coalescer
+        self.on_change = on_change
+    
+    def on_any_event(self, event):
+        # Runs for directories too, so the metadata index sees every change
+        if self.on_change:
+            self.on_change(event.src_path)
+            if getattr(event, 'dest_path', None):
+                self.on_change(event.dest_path)
+    
+    def on_created(self, event):
+        if not event.is_directory:
+            self.coalescer.submit_threadsafe(NASEvent("created", event.src_path))
+    
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.coalescer.submit_threadsafe(NASEvent("modified", event.src_path))
+    
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.coalescer.submit_threadsafe(NASEvent("deleted", event.src_path))
+    
+    def on_moved(self, event):
+        self.coalescer.submit_threadsafe(NASEvent(
+            "moved", event.src_path, event.dest_path, is_directory=event.is_directory
+        ))
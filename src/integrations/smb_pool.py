@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Tuple
+
+import smbclient
+from smbprotocol.exceptions import SMBConnectionClosed
+
+from ..core.metrics import histogram, counter
+
+logger = logging.getLogger(__name__)
+
+SMB_OPERATION_SECONDS = histogram('smb_operation_seconds', "SMB operation duration", ('operation',))
+SMB_RECONNECTS = counter('smb_reconnects_total', "SMB sessions re-established after a connection error")
+
+# Errors that mean the underlying connection is gone rather than that the
+# operation itself failed (missing file, access denied, ...)
+CONNECTION_ERRORS = (ConnectionError, SMBConnectionClosed, EOFError)
+
+
+class SMBSessionPool:
+    """Long-lived SMB session shared by the API, the watcher and agents.
+
+    smbclient caches connections per server once a session is registered,
+    so negotiate and authentication happen once per process instead of once
+    per request. Blocking calls run on a dedicated executor whose size caps
+    the number of concurrent SMB operations. A connection error drops this
+    server's session; operations marked ``idempotent`` (path-based reads and
+    listings) are then retried once on a new one. Writes and methods of open
+    file handles are not, since they may have been applied already or are
+    bound to the dead connection.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.host = config['host']
+        self.max_concurrent_ops = config.get('max_concurrent_ops', 8)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrent_ops,
+            thread_name_prefix='smb'
+        )
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def _ensure_session(self) -> None:
+        with self._lock:
+            if self._registered:
+                return
+            smbclient.ClientConfig(
+                username=self.config.get('username'),
+                password=self.config.get('password'),
+                domain=self.config.get('domain', '')
+            )
+            smbclient.register_session(
+                self.host,
+                username=self.config.get('username'),
+                password=self.config.get('password'),
+                port=self.config.get('port', 445)
+            )
+            self._registered = True
+            logger.info(f"Registered SMB session to {self.host}")
+
+    def _reset(self) -> None:
+        # Only this server's connection: the cache is process-wide and other
+        # pools may be mid-operation on theirs
+        with self._lock:
+            try:
+                smbclient.delete_session(self.host, port=self.config.get('port', 445))
+            except Exception as e:
+                logger.warning(f"Error dropping SMB session to {self.host}: {str(e)}")
+            self._registered = False
+
+    def call(self, func, *args, idempotent: bool = False, **kwargs):
+        """Run an SMB operation on the calling thread.
+
+        After a connection error the session is dropped; ``idempotent``
+        operations are retried once on a new session, others re-raise.
+        """
+        self._ensure_session()
+        with SMB_OPERATION_SECONDS.labels(getattr(func, '__name__', type(func).__name__)).time():
+            try:
+                return func(*args, **kwargs)
+            except CONNECTION_ERRORS as e:
+                logger.warning(f"SMB connection to {self.host} lost ({str(e)}), reconnecting")
+                SMB_RECONNECTS.inc()
+                self._reset()
+                if not idempotent:
+                    raise
+                self._ensure_session()
+                return func(*args, **kwargs)
+
+    async def run(self, func, *args, idempotent: bool = False, **kwargs):
+        """Run an SMB operation on the pool's executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(self.call, func, *args, idempotent=idempotent, **kwargs)
+        )
+
+    async def close(self) -> None:
+        """Drop the session to the server and stop the executor"""
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._reset)
+        self._executor.shutdown(wait=False)
+
+
+_pools: Dict[Tuple[str, str, int], SMBSessionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_session_pool(config: Dict[str, Any]) -> SMBSessionPool:
+    """Process-wide session pool for a server and user"""
+    key = (config['host'], config.get('username') or '', config.get('port', 445))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = SMBSessionPool(config)
+        return _pools[key]
+
+
+async def close_session_pools() -> None:
+    """Close every pool created by get_session_pool"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        await pool.close()
@@ -0,0 +1,353 @@
+import hmac
+import json
+import time
+import random
+import base64
+import asyncio
+import hashlib
+import logging
+import secrets
+from urllib.parse import quote
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import httpx
+
+from ..core.metrics import histogram, counter
+
+logger = logging.getLogger(__name__)
+
+SOCIAL_REQUEST_SECONDS = histogram('social_request_seconds', "Social API request duration, per attempt",
+                                   ('platform', 'status'))
+SOCIAL_RETRIES = counter('social_retries_total', "Social API requests retried", ('platform', 'reason'))
+SOCIAL_RATE_LIMIT_WAIT_SECONDS = histogram('social_rate_limit_wait_seconds',
+                                           "Time spent waiting for a rate-limit token", ('platform',))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Safe to resend after a 5xx or a failure mid-request
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+# Transport errors raised before the request reached the server
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class RateLimitError(Exception):
+    """Raised when a request is still rate limited after all retries"""
+
+
+class TokenBucket:
+    """Async token bucket whose rate follows the limits the server reports.
+
+    Starts from a configured rate; ``update`` re-targets it from the
+    remaining quota and reset time in response headers so requests are
+    spread evenly over the window instead of bursting into a 429, and
+    ``pause_until`` blocks all callers until a hard limit resets.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + max(now - self.updated, 0) * self.rate)
+        self.updated = max(now, self.updated)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def update(self, remaining: int, reset_in: float) -> None:
+        """Spread the remaining quota evenly until the window resets"""
+        now = time.monotonic()
+        self._refill(now)
+        if remaining <= 0:
+            self.pause_until(reset_in)
+            return
+        self.rate = remaining / max(reset_in, 1.0)
+        self.tokens = min(self.tokens, remaining)
+
+    def pause_until(self, delay: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        # Allow one request when the pause ends so we learn the new quota
+        self.tokens = 1.0
+        self.updated = self.paused_until
+
+
+class SocialHTTPClient:
+    """Pooled async HTTP client with rate-limit scheduling and backoff.
+
+    One ``httpx.AsyncClient`` per platform keeps connections alive across
+    requests. Every request takes a token from the platform's bucket (per
+    endpoint when the platform reports per-endpoint limits); 429s, 5xx and
+    transport errors are retried with exponential backoff and jitter,
+    honouring Retry-After. Non-idempotent requests (a POST that publishes a
+    status) are only retried when the server cannot have acted on them: a
+    429 or a failure to connect. ``base_url`` can point at a local mock
+    server.
+    """
+
+    # Label for this client's metrics
+    platform = 'http'
+
+    def __init__(self,
+                 base_url: str,
+                 max_connections: int = 10,
+                 timeout: float = 30.0,
+                 max_retries: int = 5,
+                 max_backoff: float = 900.0,
+                 requests_per_second: float = 1.0,
+                 burst: int = 5):
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections)
+        )
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, key: str) -> TokenBucket:
+        if key not in self._buckets:
+            self._buckets[key] = TokenBucket(self.requests_per_second, self.burst)
+        return self._buckets[key]
+
+    def _bucket_key(self, method: str, path: str) -> str:
+        return 'default'
+
+    def _sign(self, request: httpx.Request) -> None:
+        """Add authentication to an outgoing request"""
+
+    def _apply_rate_limits(self, bucket: TokenBucket, response: httpx.Response) -> None:
+        """Update the bucket from platform-specific rate-limit headers"""
+
+    async def request(self,
+                      method: str,
+                      path: str,
+                      decode: bool = True,
+                      idempotent: Optional[bool] = None,
+                      **kwargs) -> Any:
+        """Send a request; returns the decoded JSON body, or the response if not decode.
+
+        ``idempotent`` defaults to whether the method is; pass it to override.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        bucket = self._bucket(self._bucket_key(method, path))
+        attempt = 0
+        while True:
+            with SOCIAL_RATE_LIMIT_WAIT_SECONDS.labels(self.platform).time():
+                await bucket.acquire()
+            request = self.client.build_request(method, path, **kwargs)
+            self._sign(request)
+            started = time.perf_counter()
+            try:
+                response = await self.client.send(request)
+            except httpx.TransportError as e:
+                SOCIAL_REQUEST_SECONDS.labels(self.platform, 'error').observe(time.perf_counter() - started)
+                if attempt >= self.max_retries or not (idempotent or isinstance(e, UNSENT_ERRORS)):
+                    raise
+                delay = self._backoff(attempt)
+                SOCIAL_RETRIES.labels(self.platform, 'transport').inc()
+                logger.warning(f"{method} {path} failed ({str(e)}), retrying in {delay:.1f}s")
+            else:
+                SOCIAL_REQUEST_SECONDS.labels(self.platform, response.status_code).observe(
+                    time.perf_counter() - started
+                )
+                self._apply_rate_limits(bucket, response)
+                retryable = response.status_code in RETRY_STATUSES and \
+                    (idempotent or response.status_code == 429)
+                if not retryable:
+                    if response.status_code == 304 and not decode:
+                        return response
+                    response.raise_for_status()
+                    return response.json() if decode else response
+                if attempt >= self.max_retries:
+                    if response.status_code == 429:
+                        raise RateLimitError(f"{method} {path} still rate limited after {attempt} retries")
+                    response.raise_for_status()
+                delay = self._retry_after(response) or self._backoff(attempt)
+                SOCIAL_RETRIES.labels(self.platform, response.status_code).inc()
+                if response.status_code == 429:
+                    bucket.pause_until(delay)
+                logger.warning(f"{method} {path} returned {response.status_code}, retrying in {delay:.1f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.max_backoff, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def _retry_after(self, response: httpx.Response) -> Optional[float]:
+        value = response.headers.get('retry-after')
+        if value:
+            try:
+                return min(float(value), self.max_backoff)
+            except ValueError:
+                return None
+        return None
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def _percent_encode(value: str) -> str:
+    return quote(str(value), safe='~-._')
+
+
+class TwitterClient(SocialHTTPClient):
+    """Twitter v1.1 REST client signed with OAuth 1.0a user context.
+
+    Twitter reports limits per endpoint in x-rate-limit-remaining and
+    x-rate-limit-reset (epoch seconds), so each endpoint gets its own bucket.
+    """
+
+    platform = 'twitter'
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(
+            config.get('base_url', 'https://api.twitter.com/1.1'),
+            max_connections=config.get('max_connections', 10),
+            timeout=config.get('timeout', 30.0),
+            max_retries=config.get('max_retries', 5),
+            # Home timeline allows 15 requests per 15 minutes per user
+            requests_per_second=config.get('requests_per_second', 15 / 900),
+            burst=config.get('burst', 5)
+        )
+        self.api_key = config['api_key']
+        self.api_secret = config['api_secret']
+        self.access_token = config['access_token']
+        self.access_token_secret = config['access_token_secret']
+
+    def _bucket_key(self, method: str, path: str) -> str:
+        return f"{method} {path}"
+
+    def _sign(self, request: httpx.Request) -> None:
+        oauth = {
+            'oauth_consumer_key': self.api_key,
+            'oauth_nonce': secrets.token_hex(16),
+            'oauth_signature_method': 'HMAC-SHA1',
+            'oauth_timestamp': str(int(time.time())),
+            'oauth_token': self.access_token,
+            'oauth_version': '1.0'
+        }
+        params = list(request.url.params.multi_items()) + list(oauth.items())
+        if request.headers.get('content-type', '').startswith('application/x-www-form-urlencoded'):
+            params += list(httpx.QueryParams(request.content.decode('utf-8')).multi_items())
+        encoded = sorted((_percent_encode(key), _percent_encode(value)) for key, value in params)
+        normalized = '&'.join(f"{key}={value}" for key, value in encoded)
+        base_url = str(request.url).split('?', 1)[0]
+        base_string = '&'.join(_percent_encode(part) for part in (request.method, base_url, normalized))
+        key = f"{_percent_encode(self.api_secret)}&{_percent_encode(self.access_token_secret)}"
+        signature = base64.b64encode(
+            hmac.new(key.encode('utf-8'), base_string.encode('utf-8'), hashlib.sha1).digest()
+        ).decode('ascii')
+        oauth['oauth_signature'] = signature
+        request.headers['Authorization'] = 'OAuth ' + ', '.join(
+            f'{_percent_encode(key)}="{_percent_encode(value)}"' for key, value in sorted(oauth.items())
+        )
+
+    def _apply_rate_limits(self, bucket: TokenBucket, response: httpx.Response) -> None:
+        remaining = response.headers.get('x-rate-limit-remaining')
+        reset = response.headers.get('x-rate-limit-reset')
+        if remaining is not None and reset is not None:
+            try:
+                bucket.update(int(remaining), float(reset) - time.time())
+            except ValueError:
+                pass
+
+
+class FacebookClient(SocialHTTPClient):
+    """Facebook Graph API client.
+
+    Graph reports app-level usage as percentages in X-App-Usage (and
+    per-business usage in X-Business-Use-Case-Usage); the request rate is
+    scaled down as usage approaches 100% and paused when the platform asks
+    us to wait.
+    """
+
+    platform = 'facebook'
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(
+            config.get('base_url', 'https://graph.facebook.com/v3.1'),
+            max_connections=config.get('max_connections', 10),
+            timeout=config.get('timeout', 30.0),
+            max_retries=config.get('max_retries', 5),
+            requests_per_second=config.get('requests_per_second', 1.0),
+            burst=config.get('burst', 5)
+        )
+        self.access_token = config['access_token']
+
+    def _sign(self, request: httpx.Request) -> None:
+        request.headers['Authorization'] = f"OAuth {self.access_token}"
+
+    def _apply_rate_limits(self, bucket: TokenBucket, response: httpx.Response) -> None:
+        usage = 0.0
+        regain = 0.0
+        try:
+            app_usage = json.loads(response.headers.get('x-app-usage', '{}'))
+            usage = max([float(value) for value in app_usage.values()] or [0.0])
+            business = json.loads(response.headers.get('x-business-use-case-usage', '{}'))
+            for entries in business.values():
+                for entry in entries:
+                    usage = max(usage, float(entry.get('call_count', 0)),
+                                float(entry.get('total_time', 0)), float(entry.get('total_cputime', 0)))
+                    regain = max(regain, float(entry.get('estimated_time_to_regain_access', 0)) * 60)
+        except (ValueError, TypeError, AttributeError):
+            return
+        if regain or usage >= 100:
+            bucket.pause_until(regain or 60.0)
+        elif usage >= 75:
+            # Usage is tracked over a rolling hour; slow down as we approach the cap
+            bucket.rate = self.requests_per_second * (100 - usage) / 25
+        else:
+            bucket.rate = self.requests_per_second
+
+
+class MastodonClient(SocialHTTPClient):
+    """Mastodon REST client for one instance (bearer token auth).
+
+    Mastodon reports limits in X-RateLimit-Remaining and X-RateLimit-Reset
+    (an ISO 8601 timestamp), shared across endpoints.
+    """
+
+    platform = 'mastodon'
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(
+            config['base_url'],
+            max_connections=config.get('max_connections', 10),
+            timeout=config.get('timeout', 30.0),
+            max_retries=config.get('max_retries', 5),
+            # 300 requests per 5 minutes per account
+            requests_per_second=config.get('requests_per_second', 1.0),
+            burst=config.get('burst', 5)
+        )
+        self.access_token = config['access_token']
+
+    def _sign(self, request: httpx.Request) -> None:
+        request.headers['Authorization'] = f"Bearer {self.access_token}"
+
+    def _apply_rate_limits(self, bucket: TokenBucket, response: httpx.Response) -> None:
+        remaining = response.headers.get('x-ratelimit-remaining')
+        reset = response.headers.get('x-ratelimit-reset')
+        if remaining is not None and reset is not None:
+            try:
+                reset_at = datetime.fromisoformat(reset.replace('Z', '+00:00')).timestamp()
+                bucket.update(int(remaining), reset_at - time.time())
+            except ValueError:
+                pass
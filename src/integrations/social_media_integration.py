@@ -1,69 +1,49 @@
 import logging
 from typing import List, Dict, Any, Optional
-import tweepy
-import facebook
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime
+from .social_platforms import SocialPlatform, create_platforms
+from .social_state import SocialStateStore
 
 logger = logging.getLogger(__name__)
 
 class SocialMediaIntegration:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.twitter_client = None
-        self.facebook_client = None
+        self.platforms: Dict[str, SocialPlatform] = {}
         self.monitoring = False
+        self.state = SocialStateStore(config.get('state_path', './data/social_state.db'))
+        self.page_size = config.get('page_size', 100)
+        self.max_pages = config.get('max_pages', 20)
+        self._tasks: List[asyncio.Task] = []
         self._initialize_clients()
     
     def _initialize_clients(self) -> None:
         """Initialize social media API clients"""
         try:
-            # Initialize Twitter client
-            if 'twitter' in self.config:
-                twitter_config = self.config['twitter']
-                auth = tweepy.OAuthHandler(
-                    twitter_config['api_key'],
-                    twitter_config['api_secret']
-                )
-                auth.set_access_token(
-                    twitter_config['access_token'],
-                    twitter_config['access_token_secret']
-                )
-                self.twitter_client = tweepy.API(auth)
-            
-            # Initialize Facebook client
-            if 'facebook' in self.config:
-                facebook_config = self.config['facebook']
-                self.facebook_client = facebook.GraphAPI(
-                    access_token=facebook_config['access_token'],
-                    version="3.1"
-                )
+            # One plugin per configured platform; clients are async and pooled
+            self.platforms = create_platforms(self.config)
         except Exception as e:
             logger.error(f"Failed to initialize social media clients: {str(e)}")
             raise
     
+    def _platform(self, name: str) -> SocialPlatform:
+        if name not in self.platforms:
+            raise Exception(f"{name.capitalize()} client not initialized")
+        return self.platforms[name]
+    
+    async def close(self) -> None:
+        """Close pooled HTTP connections"""
+        for platform in self.platforms.values():
+            await platform.close()
+    
     async def get_twitter_timeline(self, 
                                  count: int = 20,
-                                 since_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Get tweets from user's timeline"""
+                                 since_id: Optional[str] = None,
+                                 max_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get tweets from user's timeline (newest first)"""
         try:
-            if not self.twitter_client:
-                raise Exception("Twitter client not initialized")
-            
-            tweets = self.twitter_client.home_timeline(
-                count=count,
-                since_id=since_id,
-                tweet_mode='extended'
-            )
-            
-            return [{
-                'id': tweet.id_str,
-                'text': tweet.full_text,
-                'created_at': tweet.created_at,
-                'user': tweet.user.screen_name,
-                'retweet_count': tweet.retweet_count,
-                'favorite_count': tweet.favorite_count
-            } for tweet in tweets]
+            return await self._platform('twitter').timeline(count=count, since_id=since_id, max_id=max_id)
         except Exception as e:
             logger.error(f"Error fetching Twitter timeline: {str(e)}")
             raise
@@ -71,15 +51,7 @@ class SocialMediaIntegration:
     async def post_tweet(self, text: str) -> Dict[str, Any]:
         """Post a new tweet"""
         try:
-            if not self.twitter_client:
-                raise Exception("Twitter client not initialized")
-            
-            tweet = self.twitter_client.update_status(text)
-            return {
-                'id': tweet.id_str,
-                'text': tweet.text,
-                'created_at': tweet.created_at
-            }
+            return await self._platform('twitter').post(text)
         except Exception as e:
             logger.error(f"Error posting tweet: {str(e)}")
             raise
@@ -89,26 +61,7 @@ class SocialMediaIntegration:
                               since: Optional[datetime] = None) -> List[Dict[str, Any]]:
         """Get posts from Facebook feed"""
         try:
-            if not self.facebook_client:
-                raise Exception("Facebook client not initialized")
-            
-            # Build query parameters
-            params = {'limit': limit}
-            if since:
-                params['since'] = since.timestamp()
-            
-            # Get feed
-            feed = self.facebook_client.get_connections('me', 'feed', **params)
-            
-            return [{
-                'id': post['id'],
-                'message': post.get('message', ''),
-                'created_time': datetime.strptime(
-                    post['created_time'],
-                    '%Y-%m-%dT%H:%M:%S%z'
-                ),
-                'likes': post.get('likes', {}).get('summary', {}).get('total_count', 0)
-            } for post in feed['data']]
+            return await self._platform('facebook').feed(limit=limit, since=since)
         except Exception as e:
             logger.error(f"Error fetching Facebook feed: {str(e)}")
             raise
@@ -116,56 +69,76 @@ class SocialMediaIntegration:
     async def post_facebook_status(self, message: str) -> Dict[str, Any]:
         """Post a new status to Facebook"""
         try:
-            if not self.facebook_client:
-                raise Exception("Facebook client not initialized")
-            
-            post = self.facebook_client.put_object(
-                parent_object='me',
-                connection_name='feed',
-                message=message
-            )
-            
-            return {
-                'id': post['id'],
-                'message': message
-            }
+            return await self._platform('facebook').post(message)
         except Exception as e:
             logger.error(f"Error posting Facebook status: {str(e)}")
             raise
     
-    async def start_monitoring(self, callback, interval: int = 300) -> None:
-        """Start monitoring social media feeds"""
-        self.monitoring = True
+    async def ingest(self, name: str, callback) -> int:
+        """Deliver every post not delivered before, oldest first; returns the count.
+
+        Posts are marked seen as they are delivered and the platform's
+        checkpoint only advances once the whole batch is through, so an
+        interrupted run is resumed without losing or repeating posts.
+        """
+        platform = self._platform(name)
+        checkpoint = self.state.get_checkpoint(name)
+        posts, new_checkpoint = await platform.fetch_since(checkpoint, self.page_size, self.max_pages)
         
-        async def monitor_loop():
-            last_twitter_id = None
-            last_facebook_time = None
-            
-            while self.monitoring:
-                try:
-                    # Monitor Twitter
-                    if self.twitter_client:
-                        tweets = await self.get_twitter_timeline(since_id=last_twitter_id)
-                        if tweets:
-                            last_twitter_id = tweets[0]['id']
-                            for tweet in tweets:
-                                await callback('twitter', tweet)
-                    
-                    # Monitor Facebook
-                    if self.facebook_client:
-                        posts = await self.get_facebook_feed(since=last_facebook_time)
-                        if posts:
-                            last_facebook_time = posts[0]['created_time']
-                            for post in posts:
-                                await callback('facebook', post)
-                    
-                    await asyncio.sleep(interval)
-                except Exception as e:
-                    logger.error(f"Error in social media monitoring: {str(e)}")
-                    await asyncio.sleep(60)  # Wait before retrying
+        by_id = {post['id']: post for post in posts}
+        unseen = set(self.state.unseen(name, by_id))
+        # Refresh posts seen before, so retention only forgets ones that left
+        # the feed, and record baselines without delivering them
+        self.state.mark_seen(name, [post_id for post_id, post in by_id.items()
+                                    if post_id not in unseen or post.get('baseline')])
+        fresh = sorted((post for post_id, post in by_id.items()
+                        if post_id in unseen and not post.get('baseline')),
+                       key=platform.sort_key)
+        for post in fresh:
+            await callback(name, post)
+            self.state.mark_seen(name, [post['id']])
         
-        asyncio.create_task(monitor_loop())
+        if new_checkpoint and new_checkpoint != checkpoint:
+            self.state.set_checkpoint(name, new_checkpoint)
+        return len(fresh)
+    
+    async def _poll(self, name: str, callback, interval: float) -> None:
+        """Poll one platform on its own adaptive interval.
+
+        The interval halves (down to min_interval) after a poll that found
+        new posts and grows by half (up to max_interval) after an idle one;
+        errors back off exponentially to max_interval.
+        """
+        config = self.platforms[name].config
+        base = config.get('poll_interval', interval)
+        min_interval = config.get('min_interval', base / 4)
+        max_interval = config.get('max_interval', base * 4)
+        current = base
+        while self.monitoring:
+            try:
+                delivered = await self.ingest(name, callback)
+                current = max(min_interval, current / 2) if delivered else min(max_interval, current * 1.5)
+            except Exception as e:
+                current = min(max_interval, current * 2)
+                logger.error(f"Error in {name} monitoring, next poll in {current:.0f}s: {str(e)}")
+            await asyncio.sleep(current)
+    
+    async def start_monitoring(self, callback, interval: int = 300) -> None:
+        """Start monitoring social media feeds, each platform concurrently"""
+        self.monitoring = True
+        self._tasks = [asyncio.create_task(self._poll(name, callback, interval))
+                       for name in self.platforms]
+        self._tasks.append(asyncio.create_task(self._prune(interval)))
+    
+    async def _prune(self, interval: float) -> None:
+        while self.monitoring:
+            self.state.prune()
+            await asyncio.sleep(max(interval, 3600))
     
     async def stop_monitoring(self) -> None:
         """Stop monitoring social media feeds"""
-        self.monitoring = False 
\ No newline at end of file
+        self.monitoring = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
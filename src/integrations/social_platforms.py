@@ -0,0 +1,378 @@
+import re
+import html
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any, Optional, Tuple, Type
+from xml.etree import ElementTree
+
+from .social_http import SocialHTTPClient, TwitterClient, FacebookClient, MastodonClient
+
+logger = logging.getLogger(__name__)
+
+TWITTER_TIME_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+FACEBOOK_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S%z'
+TAG_RE = re.compile(r'<[^>]+>')
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+PLATFORMS: Dict[str, Type['SocialPlatform']] = {}
+
+
+def register_platform(name: str):
+    """Class decorator adding a platform under its config key"""
+    def decorator(cls: Type['SocialPlatform']) -> Type['SocialPlatform']:
+        cls.name = name
+        PLATFORMS[name] = cls
+        return cls
+    return decorator
+
+
+class SocialPlatform(ABC):
+    """A pollable social feed.
+
+    A platform turns its config section into a client and implements
+    ``fetch_since``: every post newer than an opaque checkpoint string,
+    plus the checkpoint to store once they are delivered. Deduplication,
+    persistence and scheduling are handled by SocialMediaIntegration, so a
+    new platform only needs to know how to page through its own API. Posts
+    flagged ``baseline`` are recorded as seen without being delivered.
+    """
+
+    name = ''
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.client = self.create_client(config)
+
+    @abstractmethod
+    def create_client(self, config: Dict[str, Any]) -> SocialHTTPClient:
+        pass
+
+    @abstractmethod
+    async def fetch_since(self,
+                          checkpoint: Optional[str],
+                          page_size: int,
+                          max_pages: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        pass
+
+    def sort_key(self, post: Dict[str, Any]) -> Any:
+        """Chronological ordering for delivery"""
+        return post['created_at']
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+@register_platform('twitter')
+class TwitterPlatform(SocialPlatform):
+    def create_client(self, config: Dict[str, Any]) -> SocialHTTPClient:
+        return TwitterClient(config)
+
+    @staticmethod
+    def parse(tweet: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': tweet['id_str'],
+            'text': tweet.get('full_text') or tweet.get('text', ''),
+            'created_at': datetime.strptime(tweet['created_at'], TWITTER_TIME_FORMAT),
+            'user': tweet['user']['screen_name'],
+            'retweet_count': tweet.get('retweet_count', 0),
+            'favorite_count': tweet.get('favorite_count', 0)
+        }
+
+    async def timeline(self,
+                       count: int = 20,
+                       since_id: Optional[str] = None,
+                       max_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Home timeline page, newest first"""
+        params = {'count': count, 'tweet_mode': 'extended'}
+        if since_id:
+            params['since_id'] = since_id
+        if max_id:
+            params['max_id'] = max_id
+        tweets = await self.client.request('GET', '/statuses/home_timeline.json', params=params)
+        return [self.parse(tweet) for tweet in tweets]
+
+    async def post(self, text: str) -> Dict[str, Any]:
+        tweet = await self.client.request('POST', '/statuses/update.json', data={'status': text})
+        return {
+            'id': tweet['id_str'],
+            'text': tweet['text'],
+            'created_at': datetime.strptime(tweet['created_at'], TWITTER_TIME_FORMAT)
+        }
+
+    async def fetch_since(self, checkpoint, page_size, max_pages):
+        """Walk back from the newest tweet to since_id with max_id.
+
+        One page when there is no checkpoint. A backlog longer than
+        ``max_pages`` is not skipped: the checkpoint then records the
+        unfinished walk as ``since_id:max_id:newest`` and the next poll
+        resumes it below max_id. Only once the walk reaches since_id does
+        the checkpoint move up to the newest tweet seen.
+        """
+        if not checkpoint:
+            page = await self.timeline(count=page_size)
+            newest = max((int(tweet['id']) for tweet in page), default=None)
+            return page, str(newest) if newest is not None else None
+
+        since_id, _, resume = checkpoint.partition(':')
+        max_id, _, newest = resume.partition(':')
+        max_id = max_id or None
+        tweets: List[Dict[str, Any]] = []
+        complete = False
+        for _ in range(max_pages):
+            page = await self.timeline(count=page_size, since_id=since_id, max_id=max_id)
+            if not page:
+                complete = True
+                break
+            tweets.extend(page)
+            max_id = str(min(int(tweet['id']) for tweet in page) - 1)
+        top = max([int(tweet['id']) for tweet in tweets] + [int(newest or since_id)])
+        if complete:
+            return tweets, str(top)
+        logger.info(f"Twitter backlog exceeds {max_pages} pages; resuming below {max_id} next poll")
+        return tweets, f"{since_id}:{max_id}:{top}"
+
+    def sort_key(self, post: Dict[str, Any]) -> Any:
+        return int(post['id'])
+
+
+@register_platform('facebook')
+class FacebookPlatform(SocialPlatform):
+    def create_client(self, config: Dict[str, Any]) -> SocialHTTPClient:
+        return FacebookClient(config)
+
+    @staticmethod
+    def parse(post: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': post['id'],
+            'message': post.get('message', ''),
+            'created_time': datetime.strptime(post['created_time'], FACEBOOK_TIME_FORMAT),
+            'likes': post.get('likes', {}).get('summary', {}).get('total_count', 0)
+        }
+
+    async def feed(self, limit: int = 20, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        params = {'limit': limit}
+        if since:
+            params['since'] = int(since.timestamp())
+        feed = await self.client.request('GET', '/me/feed', params=params)
+        return [self.parse(post) for post in feed['data']]
+
+    async def post(self, message: str) -> Dict[str, Any]:
+        post = await self.client.request('POST', '/me/feed', data={'message': message})
+        return {'id': post['id'], 'message': message}
+
+    async def fetch_since(self, checkpoint, page_size, max_pages):
+        """Posts since a timestamp, newest first, following Graph paging links.
+
+        One page when there is no checkpoint. A backlog longer than
+        ``max_pages`` is not skipped: the checkpoint then records the
+        unfinished walk as ``since:newest:next`` (the paging link to
+        continue from) and the next poll resumes there. Only once paging
+        runs out does the checkpoint move up to the newest post seen.
+        """
+        if not checkpoint:
+            feed = await self.client.request('GET', '/me/feed', params={'limit': page_size})
+            posts = [self.parse(post) for post in feed.get('data', [])]
+            newest = max((int(post['created_time'].timestamp()) for post in posts), default=None)
+            return posts, str(newest) if newest is not None else None
+
+        since, _, resume = checkpoint.partition(':')
+        newest, _, next_url = resume.partition(':')
+        if next_url:
+            feed = await self.client.request('GET', next_url)
+        else:
+            feed = await self.client.request('GET', '/me/feed', params={'limit': page_size, 'since': int(since)})
+        posts = [self.parse(post) for post in feed.get('data', [])]
+        complete = False
+        for page in range(1, max_pages + 1):
+            next_url = feed.get('paging', {}).get('next')
+            if not next_url or not feed.get('data'):
+                complete = True
+                break
+            if page == max_pages:
+                break
+            feed = await self.client.request('GET', next_url)
+            posts.extend(self.parse(post) for post in feed.get('data', []))
+        top = max([int(post['created_time'].timestamp()) for post in posts] + [int(newest or since)])
+        if complete:
+            return posts, str(top)
+        logger.info(f"Facebook backlog exceeds {max_pages} pages; resuming from the next page next poll")
+        return posts, f"{since}:{top}:{next_url}"
+
+    def sort_key(self, post: Dict[str, Any]) -> Any:
+        return post['created_time']
+
+
+@register_platform('mastodon')
+class MastodonPlatform(SocialPlatform):
+    def create_client(self, config: Dict[str, Any]) -> SocialHTTPClient:
+        return MastodonClient(config)
+
+    @staticmethod
+    def parse(status: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': status['id'],
+            'text': html.unescape(TAG_RE.sub('', status.get('content', ''))),
+            'created_at': datetime.fromisoformat(status['created_at'].replace('Z', '+00:00')),
+            'user': status['account']['acct'],
+            'url': status.get('url')
+        }
+
+    async def timeline(self,
+                       limit: int = 20,
+                       since_id: Optional[str] = None,
+                       max_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Home timeline page, newest first (max_id is exclusive)"""
+        params = {'limit': min(limit, 40)}
+        if since_id:
+            params['since_id'] = since_id
+        if max_id:
+            params['max_id'] = max_id
+        page = await self.client.request('GET', '/api/v1/timelines/home', params=params)
+        return [self.parse(status) for status in page]
+
+    async def fetch_since(self, checkpoint, page_size, max_pages):
+        """Walk back from the newest status to since_id with max_id.
+
+        One page when there is no checkpoint. A backlog longer than
+        ``max_pages`` is resumed like Twitter's: the checkpoint records the
+        unfinished walk as ``since_id:max_id:newest`` and only moves up to
+        the newest status once the walk reaches since_id.
+        """
+        if not checkpoint:
+            page = await self.timeline(limit=page_size)
+            newest = max((int(status['id']) for status in page), default=None)
+            return page, str(newest) if newest is not None else None
+
+        since_id, _, resume = checkpoint.partition(':')
+        max_id, _, newest = resume.partition(':')
+        max_id = max_id or None
+        statuses: List[Dict[str, Any]] = []
+        complete = False
+        for _ in range(max_pages):
+            page = await self.timeline(limit=page_size, since_id=since_id, max_id=max_id)
+            if not page:
+                complete = True
+                break
+            statuses.extend(page)
+            max_id = str(min(int(status['id']) for status in page))
+        top = max([int(status['id']) for status in statuses] + [int(newest or since_id)])
+        if complete:
+            return statuses, str(top)
+        logger.info(f"Mastodon backlog exceeds {max_pages} pages; resuming below {max_id} next poll")
+        return statuses, f"{since_id}:{max_id}:{top}"
+
+    def sort_key(self, post: Dict[str, Any]) -> Any:
+        return int(post['id'])
+
+
+@register_platform('rss')
+class RSSPlatform(SocialPlatform):
+    """RSS 2.0 and Atom feeds, fetched with conditional GET.
+
+    Feeds are snapshots, so every poll returns every item currently in each
+    feed (the last parsed items when the server answers 304) and delivered
+    IDs are deduplicated. The checkpoint lists the feeds already polled: a
+    feed's first fetch is a baseline and its items are not delivered.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.feeds: List[str] = config.get('feeds', [])
+        self._validators: Dict[str, Dict[str, str]] = {}
+        self._items: Dict[str, List[Dict[str, Any]]] = {}
+
+    def create_client(self, config: Dict[str, Any]) -> SocialHTTPClient:
+        return SocialHTTPClient(
+            '',
+            max_connections=config.get('max_connections', 10),
+            timeout=config.get('timeout', 30.0),
+            max_retries=config.get('max_retries', 3),
+            requests_per_second=config.get('requests_per_second', 2.0)
+        )
+
+    @staticmethod
+    def _parse_date(value: Optional[str]) -> datetime:
+        parsed = None
+        if value:
+            try:
+                parsed = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                try:
+                    parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+                except ValueError:
+                    pass
+        if parsed is None:
+            return datetime.now(timezone.utc)
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+    def parse(self, feed_url: str, content: bytes) -> List[Dict[str, Any]]:
+        root = ElementTree.fromstring(content)
+        items = []
+        for item in root.iter('item'):
+            link = item.findtext('link')
+            items.append({
+                'id': item.findtext('guid') or link or item.findtext('title'),
+                'title': item.findtext('title', ''),
+                'text': html.unescape(TAG_RE.sub('', item.findtext('description', ''))),
+                'url': link,
+                'created_at': self._parse_date(item.findtext('pubDate')),
+                'feed': feed_url
+            })
+        for entry in root.iter(f'{ATOM}entry'):
+            link = entry.find(f'{ATOM}link')
+            url = link.get('href') if link is not None else None
+            items.append({
+                'id': entry.findtext(f'{ATOM}id') or url,
+                'title': entry.findtext(f'{ATOM}title', ''),
+                'text': html.unescape(TAG_RE.sub('', entry.findtext(f'{ATOM}summary', ''))),
+                'url': url,
+                'created_at': self._parse_date(entry.findtext(f'{ATOM}updated')
+                                               or entry.findtext(f'{ATOM}published')),
+                'feed': feed_url
+            })
+        return items
+
+    async def fetch_since(self, checkpoint, page_size, max_pages):
+        """Every item in every feed; items of feeds polled for the first time are a baseline"""
+        polled = set(json.loads(checkpoint)) if checkpoint else set()
+        items: List[Dict[str, Any]] = []
+        for url in self.feeds:
+            headers = {}
+            validators = self._validators.get(url, {})
+            if 'etag' in validators:
+                headers['If-None-Match'] = validators['etag']
+            if 'last-modified' in validators:
+                headers['If-Modified-Since'] = validators['last-modified']
+            try:
+                response = await self.client.request('GET', url, decode=False, headers=headers)
+                if response.status_code == 304:
+                    # Still in the feed, which keeps them from expiring as seen
+                    items.extend(self._items.get(url, []))
+                    continue
+                parsed = self.parse(url, response.content)
+            except Exception as e:
+                logger.error(f"Error fetching feed {url}: {str(e)}")
+                continue
+            # Only after a successful parse, or a bad response would be 304'd for good
+            self._validators[url] = {key: response.headers[key] for key in ('etag', 'last-modified')
+                                     if key in response.headers}
+            self._items[url] = parsed
+            if url in polled:
+                items.extend(parsed)
+            else:
+                items.extend({**item, 'baseline': True} for item in parsed)
+                polled.add(url)
+        return items, json.dumps(sorted(polled))
+
+
+def create_platforms(config: Dict[str, Any]) -> Dict[str, SocialPlatform]:
+    """Instantiate every registered platform that has a config section"""
+    platforms = {}
+    for name, cls in PLATFORMS.items():
+        section = config.get(name)
+        if isinstance(section, dict) and section.get('enabled', True):
+            platforms[name] = cls(section)
+    return platforms
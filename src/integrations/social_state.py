@@ -0,0 +1,88 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import List, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    platform TEXT PRIMARY KEY,
+    cursor TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen_posts (
+    platform TEXT NOT NULL,
+    post_id TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (platform, post_id)
+);
+CREATE INDEX IF NOT EXISTS idx_seen_posts_seen_at ON seen_posts (seen_at);
+"""
+
+
+class SocialStateStore:
+    """Persisted ingestion state for social feeds.
+
+    Holds one checkpoint per platform (the newest ID or timestamp fully
+    ingested) and the IDs of recently delivered posts, so restarts resume
+    where they stopped and overlapping pages never deliver a post twice.
+    """
+
+    def __init__(self, path: str = './data/social_state.db', retention: float = 30 * 86400):
+        self.retention = retention
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def get_checkpoint(self, platform: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT cursor FROM checkpoints WHERE platform = ?', (platform,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_checkpoint(self, platform: str, cursor: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO checkpoints (platform, cursor, updated_at) VALUES (?, ?, ?)',
+                (platform, cursor, time.time())
+            )
+
+    def unseen(self, platform: str, post_ids: Iterable[str]) -> List[str]:
+        """The subset of post_ids not delivered before, in the given order"""
+        post_ids = list(post_ids)
+        seen = set()
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(post_ids), 500):
+                batch = post_ids[start:start + 500]
+                seen.update(row[0] for row in self._conn.execute(
+                    f"SELECT post_id FROM seen_posts WHERE platform = ? "
+                    f"AND post_id IN ({','.join('?' * len(batch))})",
+                    (platform, *batch)
+                ))
+        return [post_id for post_id in post_ids if post_id not in seen]
+
+    def mark_seen(self, platform: str, post_ids: Iterable[str]) -> None:
+        """Record posts as seen now; refreshes posts seen before"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO seen_posts (platform, post_id, seen_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (platform, post_id) DO UPDATE SET seen_at = excluded.seen_at',
+                [(platform, post_id, now) for post_id in post_ids]
+            )
+
+    def prune(self) -> int:
+        """Forget IDs not seen in a fetch for the retention period"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                'DELETE FROM seen_posts WHERE seen_at < ?', (time.time() - self.retention,)
+            ).rowcount
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import argparse
 import os
 from typing import Dict, Any
 import yaml
@@ -7,6 +8,8 @@ from dotenv import load_dotenv
 from core.llm_engine import LLMEngine, ModelConfig
 from memory.memory_system import MemorySystem
 from core.agent_system import AgentSystem, Task
+from core.metrics import configure_metrics
+from core.diagnostics import Diagnostics
 import uuid
 
 # Configure logging
@@ -26,12 +29,29 @@ def load_config() -> Dict[str, Any]:
         logger.error(f"Error loading config: {str(e)}")
         raise
 
-async def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the assistant")
+    parser.add_argument('--detect-stalls', type=float, nargs='?', const=0.1, metavar='SECONDS',
+                        help="log event-loop stalls longer than SECONDS (default 0.1) with their stack")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="sample the whole run and write folded stacks to PATH on exit")
+    return parser.parse_args(argv)
+
+async def main(args: argparse.Namespace):
     # Load environment variables
     load_dotenv()
     
     # Load configuration
     config = load_config()
+    configure_metrics(config.get('metrics'))
+    
+    diagnostics_config = dict(config.get('diagnostics') or {})
+    if args.detect_stalls is not None:
+        diagnostics_config['stall_threshold'] = args.detect_stalls
+    if args.profile:
+        diagnostics_config['profile_output'] = args.profile
+    diagnostics = Diagnostics(diagnostics_config)
+    diagnostics.start()
     
     try:
         # Initialize LLM Engine
@@ -46,7 +66,7 @@ async def main():
         memory_system = MemorySystem(config['memory'])
         
         # Initialize Agent System
-        agent_system = AgentSystem(llm_engine, memory_system)
+        agent_system = AgentSystem(llm_engine, memory_system, config['agents'])
         
         # Start the agent system
         await agent_system.start()
@@ -75,6 +95,8 @@ async def main():
     except Exception as e:
         logger.error(f"Error in main: {str(e)}")
         raise
+    finally:
+        diagnostics.stop()
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main(parse_args()))
\ No newline at end of file
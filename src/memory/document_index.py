@@ -0,0 +1,335 @@
+import os
+import re
+import sqlite3
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable, Iterable, Tuple
+
+from .memory_system import MemorySystem
+from .text_extraction import ExtractionPipeline, extract_text, file_hash
+
+logger = logging.getLogger(__name__)
+
+DOCUMENTS_COLLECTION = "documents"
+CHUNKS_COLLECTION = "document_chunks"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    content_hash TEXT NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    chunk_hash TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_path ON chunks (path);
+"""
+
+def _is_cut_point(piece: str, target: int) -> bool:
+    """Content-defined boundary after a paragraph.
+
+    Depends only on the paragraph itself: its hash decides, with a
+    probability proportional to its length, so a boundary falls every
+    ``target`` characters on average.
+    """
+    digest = int(hashlib.sha1(piece.encode('utf-8')).hexdigest()[:8], 16)
+    return digest < len(piece) / target * 0x100000000
+
+
+def chunk_text(text: str, chunk_size: int = 1000) -> List[str]:
+    """Split text into chunks of whole paragraphs, at most ``chunk_size`` characters.
+
+    A chunk ends after a paragraph chosen by that paragraph's content
+    alone, or when the next paragraph would not fit. An edit therefore
+    only changes the chunks from the edited paragraph to the next
+    content-defined boundary; chunks before and after keep their text
+    (and hashes) even when the edit shifts everything behind it.
+    """
+    target = max(chunk_size // 2, 1)
+    pieces: List[str] = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        # Hard-split paragraphs that are larger than a chunk on their own
+        pieces.extend(paragraph[i:i + chunk_size] for i in range(0, len(paragraph), chunk_size))
+
+    chunks: List[str] = []
+    current: List[str] = []
+    length = 0
+    for index, piece in enumerate(pieces):
+        current.append(piece)
+        length += len(piece)
+        following = pieces[index + 1] if index + 1 < len(pieces) else None
+        if following is None or _is_cut_point(piece, target) or length + len(following) > chunk_size:
+            chunks.append('\n\n'.join(current))
+            current, length = [], 0
+    return chunks
+
+
+class DocumentIndexer:
+    """Change-aware document ingestion into the memory system.
+
+    Files are indexed at two levels: one embedding per document (its name
+    and opening text) in the ``documents`` collection, and one per chunk in
+    ``document_chunks``. A SQLite manifest records (path, size, mtime,
+    content hash) per file and the hash of every chunk, so a rescan skips
+    files whose size and mtime are unchanged, skips re-extraction when only
+    the mtime moved, and re-embeds only chunks whose content changed.
+    Before the first scan the manifest is checked against the vector
+    store, and files whose embeddings are missing there are indexed again.
+    """
+
+    def __init__(self,
+                 memory: MemorySystem,
+                 manifest_path: str = './data/document_manifest.db',
+                 chunk_size: int = 1000,
+                 supported_formats: Optional[Iterable[str]] = None,
+                 extractor: Callable[[str], Optional[str]] = extract_text,
+                 extract_concurrency: int = 1):
+        self.memory = memory
+        self.chunk_size = chunk_size
+        self.supported_formats = {fmt.lower() for fmt in (supported_formats or ('pdf', 'docx', 'txt'))}
+        self.extractor = extractor
+        self.extract_concurrency = extract_concurrency
+        os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(manifest_path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._reconciled = False
+
+    def reconcile(self) -> int:
+        """Forget files whose embeddings are missing from the vector store.
+
+        The manifest outlives the store when the vector database is deleted
+        or was never persisted; without this, those files would count as up
+        to date and never be embedded again. Returns the number forgotten.
+        """
+        with self._lock:
+            chunks = self._conn.execute('SELECT chunk_id, path FROM chunks').fetchall()
+            paths = [row[0] for row in self._conn.execute('SELECT path FROM files')]
+        present_chunks = self.memory.existing_document_ids(CHUNKS_COLLECTION, [row[0] for row in chunks])
+        present_documents = self.memory.existing_document_ids(DOCUMENTS_COLLECTION, paths)
+        stale = {path for chunk_id, path in chunks if chunk_id not in present_chunks}
+        stale.update(path for path in paths if path not in present_documents)
+        with self._lock, self._conn:
+            for table in ('chunks', 'files'):
+                self._conn.executemany(f'DELETE FROM {table} WHERE path = ?', [(path,) for path in stale])
+        self._reconciled = True
+        if stale:
+            logger.warning(f"{len(stale)} indexed files are missing from the vector store; re-indexing them")
+        return len(stale)
+
+    def _ensure_reconciled(self) -> None:
+        if not self._reconciled:
+            self.reconcile()
+
+    def _is_supported(self, path: str) -> bool:
+        return os.path.splitext(path)[1].lower().lstrip('.') in self.supported_formats
+
+    def _walk(self, directory: str) -> Iterable[Tuple[str, os.stat_result]]:
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file() and self._is_supported(entry.name):
+                            yield entry.path, entry.stat()
+            except OSError as e:
+                logger.error(f"Error scanning {current}: {str(e)}")
+
+    def scan(self, directories: List[str]) -> Dict[str, int]:
+        """Index new and changed files under the directories, drop deleted ones.
+
+        Changed files are extracted ``extract_concurrency`` at a time while
+        results are embedded as they complete.
+        """
+        stats = {'scanned': 0, 'unchanged': 0, 'indexed': 0, 'removed': 0, 'failed': 0,
+                 'chunks_embedded': 0, 'chunks_deleted': 0}
+        self._ensure_reconciled()
+        seen = set()
+        changed: List[Tuple[str, os.stat_result, str]] = []
+        for directory in directories:
+            if not os.path.isdir(directory):
+                logger.warning(f"Document directory not found: {directory}")
+                continue
+            for path, stat in self._walk(directory):
+                seen.add(path)
+                stats['scanned'] += 1
+                try:
+                    content_hash = self._changed_hash(path, stat)
+                except OSError as e:
+                    logger.error(f"Error hashing {path}: {str(e)}")
+                    stats['failed'] += 1
+                    continue
+                if content_hash is None:
+                    stats['unchanged'] += 1
+                else:
+                    changed.append((path, stat, content_hash))
+
+        with ThreadPoolExecutor(max_workers=self.extract_concurrency) as executor:
+            futures = {executor.submit(self._extract, path, content_hash): (path, stat, content_hash)
+                       for path, stat, content_hash in changed}
+            for future in as_completed(futures):
+                path, stat, content_hash = futures.pop(future)
+                try:
+                    result = self._store(path, stat, content_hash, future.result() or '')
+                except Exception as e:
+                    logger.error(f"Error indexing {path}: {str(e)}")
+                    stats['failed'] += 1
+                    continue
+                stats['indexed'] += 1
+                stats['chunks_embedded'] += result['chunks_embedded']
+                stats['chunks_deleted'] += result['chunks_deleted']
+
+        for path in self._indexed_paths(directories):
+            if path not in seen:
+                stats['chunks_deleted'] += self.remove_file(path)
+                stats['removed'] += 1
+        logger.info(f"Document scan complete: {stats}")
+        return stats
+
+    def _indexed_paths(self, directories: List[str]) -> List[str]:
+        with self._lock:
+            paths = [row[0] for row in self._conn.execute('SELECT path FROM files')]
+        roots = [os.path.join(os.path.abspath(directory), '') for directory in directories
+                 if os.path.isdir(directory)]
+        return [path for path in paths
+                if any(os.path.abspath(path).startswith(root) for root in roots)]
+
+    def _manifest_entry(self, path: str) -> Optional[Tuple[int, float, str]]:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT size, mtime, content_hash FROM files WHERE path = ?', (path,)
+            ).fetchone()
+
+    def _changed_hash(self, path: str, stat: os.stat_result) -> Optional[str]:
+        """Content hash of a file that needs indexing, or None if it is up to date"""
+        entry = self._manifest_entry(path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime:
+            return None
+        content_hash = file_hash(path)
+        if entry and entry[2] == content_hash:
+            self._record_file(path, stat, content_hash)
+            return None
+        return content_hash
+
+    def _extract(self, path: str, content_hash: str) -> Optional[str]:
+        if isinstance(self.extractor, ExtractionPipeline):
+            return self.extractor.extract(path, content_hash)
+        return self.extractor(path)
+
+    def _store(self, path: str, stat: os.stat_result, content_hash: str, text: str) -> Dict[str, int]:
+        result = self._sync_chunks(path, chunk_text(text, self.chunk_size))
+        self._store_document(path, text)
+        self._record_file(path, stat, content_hash)
+        return result
+
+    def index_file(self, path: str, stat: Optional[os.stat_result] = None) -> Optional[Dict[str, int]]:
+        """Index a single file; returns None when it was already up to date"""
+        try:
+            self._ensure_reconciled()
+            stat = stat or os.stat(path)
+            content_hash = self._changed_hash(path, stat)
+            if content_hash is None:
+                return None
+            return self._store(path, stat, content_hash, self._extract(path, content_hash) or '')
+        except Exception as e:
+            logger.error(f"Error indexing {path}: {str(e)}")
+            raise
+
+    def _sync_chunks(self, path: str, chunks: List[str]) -> Dict[str, int]:
+        path_key = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+        with self._lock:
+            existing = {row[0]: row[1] for row in self._conn.execute(
+                'SELECT chunk_id, position FROM chunks WHERE path = ?', (path,)
+            )}
+
+        # Chunk IDs are derived from content (plus occurrence for repeats), so
+        # unchanged chunks keep their IDs even when they shift position
+        wanted: Dict[str, Tuple[int, str, str]] = {}
+        occurrences: Dict[str, int] = {}
+        for position, chunk in enumerate(chunks):
+            chunk_hash = hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+            occurrence = occurrences.get(chunk_hash, 0)
+            occurrences[chunk_hash] = occurrence + 1
+            wanted[f"{path_key}:{chunk_hash[:24]}:{occurrence}"] = (position, chunk_hash, chunk)
+
+        added = [chunk_id for chunk_id in wanted if chunk_id not in existing]
+        moved = [chunk_id for chunk_id in wanted
+                 if chunk_id in existing and existing[chunk_id] != wanted[chunk_id][0]]
+        removed = [chunk_id for chunk_id in existing if chunk_id not in wanted]
+
+        def metadata(chunk_id: str) -> Dict[str, Any]:
+            position, chunk_hash, _ = wanted[chunk_id]
+            return {'path': path, 'position': position, 'chunk_hash': chunk_hash}
+
+        self.memory.delete_documents(CHUNKS_COLLECTION, removed)
+        self.memory.store_documents(
+            CHUNKS_COLLECTION,
+            added,
+            [wanted[chunk_id][2] for chunk_id in added],
+            [metadata(chunk_id) for chunk_id in added]
+        )
+        self.memory.update_document_metadata(
+            CHUNKS_COLLECTION, moved, [metadata(chunk_id) for chunk_id in moved]
+        )
+
+        with self._lock, self._conn:
+            self._conn.executemany('DELETE FROM chunks WHERE chunk_id = ?',
+                                   [(chunk_id,) for chunk_id in removed])
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO chunks (chunk_id, path, chunk_hash, position) VALUES (?, ?, ?, ?)',
+                [(chunk_id, path, wanted[chunk_id][1], wanted[chunk_id][0])
+                 for chunk_id in added + moved]
+            )
+        return {'chunks_embedded': len(added), 'chunks_deleted': len(removed)}
+
+    def _store_document(self, path: str, text: str) -> None:
+        summary = f"{os.path.basename(path)}\n\n{text[:self.chunk_size]}"
+        self.memory.store_documents(
+            DOCUMENTS_COLLECTION,
+            [path],
+            [summary],
+            [{'path': path, 'name': os.path.basename(path)}]
+        )
+
+    def _record_file(self, path: str, stat: os.stat_result, content_hash: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO files (path, size, mtime, content_hash, indexed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (path, stat.st_size, stat.st_mtime, content_hash, datetime.utcnow().isoformat())
+            )
+
+    def remove_file(self, path: str) -> int:
+        """Drop a deleted file from the index; returns the number of chunks removed"""
+        with self._lock:
+            chunk_ids = [row[0] for row in self._conn.execute(
+                'SELECT chunk_id FROM chunks WHERE path = ?', (path,)
+            )]
+        self.memory.delete_documents(CHUNKS_COLLECTION, chunk_ids)
+        self.memory.delete_documents(DOCUMENTS_COLLECTION, [path])
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM chunks WHERE path = ?', (path,))
+            self._conn.execute('DELETE FROM files WHERE path = ?', (path,))
+        return len(chunk_ids)
+
+    def search(self, query: str, limit: int = 5, document_limit: int = 10) -> List[Dict]:
+        """Coarse-to-fine search: rank documents, then chunks within the best ones"""
+        documents = self.memory.query_documents(DOCUMENTS_COLLECTION, query, limit=document_limit)
+        paths = [document['metadata']['path'] for document in documents]
+        if not paths:
+            return []
+        where = {'path': paths[0]} if len(paths) == 1 else {'path': {'$in': paths}}
+        return self.memory.query_documents(CHUNKS_COLLECTION, query, limit=limit, where=where)
@@ -1,40 +1,90 @@
-from typing import Dict, List, Any, Optional
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+from typing import Dict, List, Any, Optional, Set, TYPE_CHECKING
 import logging
+import threading
 from datetime import datetime
 import json
 
+from ..core.metrics import histogram, counter
+
+if TYPE_CHECKING:
+    import chromadb
+    from sentence_transformers import SentenceTransformer
+
 logger = logging.getLogger(__name__)
 
+EMBEDDING_SECONDS = histogram('embedding_seconds', "Time spent computing embeddings per call")
+EMBEDDED_TEXTS = counter('embedded_texts_total', "Texts passed to the embedding model")
+VECTOR_QUERY_SECONDS = histogram('vector_query_seconds', "Vector store query duration", ('collection',))
+VECTOR_WRITE_SECONDS = histogram('vector_write_seconds', "Vector store write duration", ('collection', 'operation'))
+
 class MemorySystem:
+    """Vector memory over chromadb with sentence-transformers embeddings.
+
+    Both libraries (and torch behind the embedding model) take seconds to
+    import and load, so they are loaded on first use rather than on
+    construction; ``warm_up`` loads them ahead of time, e.g. from a
+    background thread at startup.
+    """
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.vector_db = self._initialize_vector_db()
-        self.embedding_model = self._initialize_embedding_model()
+        self._vector_db = None
+        self._embedding_model = None
+        self._load_lock = threading.Lock()
+    
+    @property
+    def vector_db(self) -> 'chromadb.Client':
+        if self._vector_db is None:
+            with self._load_lock:
+                if self._vector_db is None:
+                    self._vector_db = self._initialize_vector_db()
+        return self._vector_db
+    
+    @property
+    def embedding_model(self) -> 'SentenceTransformer':
+        if self._embedding_model is None:
+            with self._load_lock:
+                if self._embedding_model is None:
+                    self._embedding_model = self._initialize_embedding_model()
+        return self._embedding_model
+    
+    def warm_up(self) -> None:
+        """Load the vector database and embedding model now (blocking)"""
+        self.vector_db
+        self.embedding_model
         
-    def _initialize_vector_db(self) -> chromadb.Client:
+    def _initialize_vector_db(self) -> 'chromadb.Client':
         try:
-            return chromadb.Client(Settings(
-                persist_directory=self.config.get('vector_db_path', './data/vector_db'),
-                anonymized_telemetry=False
-            ))
+            import chromadb
+            from chromadb.config import Settings
+            # Client(Settings(persist_directory=...)) is in-memory on
+            # current chromadb; the document manifest assumes the store persists
+            return chromadb.PersistentClient(
+                path=self.config.get('vector_db_path', './data/vector_db'),
+                settings=Settings(anonymized_telemetry=False)
+            )
         except Exception as e:
             logger.error(f"Failed to initialize vector database: {str(e)}")
             raise
     
-    def _initialize_embedding_model(self) -> SentenceTransformer:
+    def _initialize_embedding_model(self) -> 'SentenceTransformer':
         try:
+            from sentence_transformers import SentenceTransformer
             return SentenceTransformer('all-MiniLM-L6-v2')
         except Exception as e:
             logger.error(f"Failed to initialize embedding model: {str(e)}")
             raise
     
+    def _encode(self, texts, **kwargs):
+        with EMBEDDING_SECONDS.time():
+            embeddings = self.embedding_model.encode(texts, **kwargs)
+        EMBEDDED_TEXTS.inc(1 if isinstance(texts, str) else len(texts))
+        return embeddings
+    
     def store_memory(self, content: str, metadata: Optional[Dict] = None) -> str:
         try:
             # Generate embedding
-            embedding = self.embedding_model.encode(content)
+            embedding = self._encode(content)
             
             # Prepare metadata
             if metadata is None:
@@ -43,29 +93,39 @@ class MemorySystem:
             
             # Store in vector database
             collection = self.vector_db.get_or_create_collection("memories")
-            result = collection.add(
-                embeddings=[embedding.tolist()],
-                documents=[content],
-                metadatas=[metadata],
-                ids=[f"mem_{datetime.utcnow().timestamp()}"]
-            )
+            memory_id = f"mem_{datetime.utcnow().timestamp()}"
+            # add() returns nothing, so the ID is ours to hand back
+            with VECTOR_WRITE_SECONDS.labels("memories", 'add').time():
+                collection.add(
+                    embeddings=[embedding.tolist()],
+                    documents=[content],
+                    metadatas=[metadata],
+                    ids=[memory_id]
+                )
             
-            return result[0]  # Return the ID of the stored memory
+            return memory_id
         except Exception as e:
             logger.error(f"Error storing memory: {str(e)}")
             raise
     
-    def retrieve_memory(self, query: str, limit: int = 5) -> List[Dict]:
+    def embed(self, text: str) -> List[float]:
+        """Embedding of a query, reusable across several searches"""
+        return self._encode(text).tolist()
+    
+    def retrieve_memory(self, query: str, limit: int = 5,
+                        query_embedding: Optional[List[float]] = None) -> List[Dict]:
         try:
             # Generate query embedding
-            query_embedding = self.embedding_model.encode(query)
+            if query_embedding is None:
+                query_embedding = self.embed(query)
             
             # Search in vector database
             collection = self.vector_db.get_collection("memories")
-            results = collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=limit
-            )
+            with VECTOR_QUERY_SECONDS.labels("memories").time():
+                results = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=limit
+                )
             
             # Format results
             memories = []
@@ -85,7 +145,7 @@ class MemorySystem:
     def update_memory(self, memory_id: str, content: str, metadata: Optional[Dict] = None) -> None:
         try:
             # Generate new embedding
-            embedding = self.embedding_model.encode(content)
+            embedding = self._encode(content)
             
             # Update metadata
             if metadata is None:
@@ -94,12 +154,13 @@ class MemorySystem:
             
             # Update in vector database
             collection = self.vector_db.get_collection("memories")
-            collection.update(
-                ids=[memory_id],
-                embeddings=[embedding.tolist()],
-                documents=[content],
-                metadatas=[metadata]
-            )
+            with VECTOR_WRITE_SECONDS.labels("memories", 'update').time():
+                collection.update(
+                    ids=[memory_id],
+                    embeddings=[embedding.tolist()],
+                    documents=[content],
+                    metadatas=[metadata]
+                )
         except Exception as e:
             logger.error(f"Error updating memory: {str(e)}")
             raise
@@ -127,4 +188,92 @@ class MemorySystem:
             }
         except Exception as e:
             logger.error(f"Error getting memory by ID: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+    
+    def store_documents(self,
+                        collection_name: str,
+                        ids: List[str],
+                        documents: List[str],
+                        metadatas: List[Dict]) -> None:
+        """Embed and upsert a batch of documents into a collection"""
+        try:
+            if not ids:
+                return
+            embeddings = self._encode(
+                documents,
+                batch_size=self.config.get('embedding_batch_size', 32)
+            )
+            collection = self.vector_db.get_or_create_collection(collection_name)
+            with VECTOR_WRITE_SECONDS.labels(collection_name, 'upsert').time():
+                collection.upsert(
+                    ids=ids,
+                    embeddings=[embedding.tolist() for embedding in embeddings],
+                    documents=documents,
+                    metadatas=metadatas
+                )
+        except Exception as e:
+            logger.error(f"Error storing documents in {collection_name}: {str(e)}")
+            raise
+    
+    def update_document_metadata(self, collection_name: str, ids: List[str], metadatas: List[Dict]) -> None:
+        """Update metadata without re-embedding"""
+        try:
+            if not ids:
+                return
+            collection = self.vector_db.get_or_create_collection(collection_name)
+            with VECTOR_WRITE_SECONDS.labels(collection_name, 'update').time():
+                collection.update(ids=ids, metadatas=metadatas)
+        except Exception as e:
+            logger.error(f"Error updating metadata in {collection_name}: {str(e)}")
+            raise
+    
+    def existing_document_ids(self, collection_name: str, ids: List[str]) -> Set[str]:
+        """The subset of ``ids`` present in a collection"""
+        try:
+            collection = self.vector_db.get_or_create_collection(collection_name)
+            found: Set[str] = set()
+            for start in range(0, len(ids), 500):
+                found.update(collection.get(ids=ids[start:start + 500], include=[])['ids'])
+            return found
+        except Exception as e:
+            logger.error(f"Error looking up documents in {collection_name}: {str(e)}")
+            raise
+    
+    def delete_documents(self, collection_name: str, ids: List[str]) -> None:
+        try:
+            if not ids:
+                return
+            collection = self.vector_db.get_or_create_collection(collection_name)
+            with VECTOR_WRITE_SECONDS.labels(collection_name, 'delete').time():
+                collection.delete(ids=ids)
+        except Exception as e:
+            logger.error(f"Error deleting documents from {collection_name}: {str(e)}")
+            raise
+    
+    def query_documents(self,
+                        collection_name: str,
+                        query: str,
+                        limit: int = 5,
+                        where: Optional[Dict] = None,
+                        query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        """Semantic search over a document collection"""
+        try:
+            if query_embedding is None:
+                query_embedding = self.embed(query)
+            collection = self.vector_db.get_or_create_collection(collection_name)
+            with VECTOR_QUERY_SECONDS.labels(collection_name).time():
+                results = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=limit,
+                    where=where
+                )
+            
+            return [{
+                'id': results['ids'][0][i],
+                'content': results['documents'][0][i],
+                'metadata': results['metadatas'][0][i],
+                'similarity': results['distances'][0][i]
+            } for i in range(len(results['ids'][0]))]
+        except Exception as e:
+            logger.error(f"Error querying {collection_name}: {str(e)}")
+            raise
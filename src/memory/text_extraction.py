@@ -0,0 +1,254 @@
+import os
+import zipfile
+import hashlib
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from xml.etree import ElementTree
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extracted_text (
+    content_hash TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    pages INTEGER NOT NULL,
+    ocr_pages INTEGER NOT NULL,
+    extracted_at TEXT NOT NULL
+);
+"""
+
+IMAGE_FORMATS = {'png', 'jpg', 'jpeg', 'tif', 'tiff', 'bmp'}
+
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def file_hash(path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_text(path: str) -> Optional[str]:
+    """Extract plain text from txt, pdf and docx files"""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('txt', 'md'):
+        with open(path, 'rb') as f:
+            return f.read().decode('utf-8', errors='replace')
+    if extension == 'pdf':
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            return '\n\n'.join(page.extract_text() or '' for page in pdf.pages)
+    if extension == 'docx':
+        with zipfile.ZipFile(path) as archive:
+            root = ElementTree.fromstring(archive.read('word/document.xml'))
+        paragraphs = [
+            ''.join(node.text or '' for node in paragraph.iter(f'{WORD_NAMESPACE}t'))
+            for paragraph in root.iter(f'{WORD_NAMESPACE}p')
+        ]
+        return '\n\n'.join(paragraphs)
+    return None
+
+
+# Worker functions run in the process pool, so they are module level and
+# import their heavy dependencies lazily inside the worker.
+
+def _pdf_page_count(path: str) -> int:
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+class OCRUnavailable(RuntimeError):
+    """pytesseract or the tesseract binary is not installed"""
+
+
+def _ocr_image(image, language: str) -> str:
+    try:
+        import pytesseract
+    except ImportError:
+        raise OCRUnavailable("pytesseract is not installed")
+    try:
+        return pytesseract.image_to_string(image, lang=language)
+    except pytesseract.TesseractNotFoundError as e:
+        raise OCRUnavailable(str(e))
+
+
+def _extract_pdf_pages(path: str,
+                       start: int,
+                       end: int,
+                       ocr: bool,
+                       ocr_available: bool,
+                       min_chars: int,
+                       dpi: int,
+                       language: str) -> List[Tuple[str, Optional[bool]]]:
+    """Text of pages start..end-1 as (text, was_ocred).
+
+    Pages with a usable text layer are returned as is; only pages whose
+    text layer is missing or shorter than min_chars are rendered and OCRed.
+    ``was_ocred`` is None for pages that needed OCR when it is unavailable.
+    """
+    import pdfplumber
+    results = []
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages[start:end]:
+            text = page.extract_text() or ''
+            if ocr and len(text.strip()) < min_chars:
+                if ocr_available:
+                    try:
+                        image = page.to_image(resolution=dpi).original
+                        results.append((_ocr_image(image, language), True))
+                        continue
+                    except OCRUnavailable:
+                        ocr_available = False
+                results.append((text, None))
+                continue
+            results.append((text, False))
+    return results
+
+
+def _extract_image(path: str, language: str) -> str:
+    from PIL import Image
+    with Image.open(path) as image:
+        return _ocr_image(image, language)
+
+
+class ExtractionPipeline:
+    """Parallel text extraction with OCR fallback and a content-hash cache.
+
+    Work runs on a process pool sized to the machine's cores. PDFs are split
+    into page ranges that are extracted concurrently; each page keeps its
+    text layer when it has one and is only rasterized and OCRed with
+    Tesseract when it does not. Images are OCRed whole. Results are cached
+    by file content hash, so a renamed, copied or re-scanned file is never
+    extracted twice. If Tesseract turns out to be missing, OCR is skipped
+    from then on and files that needed it are not cached, so they are
+    extracted properly once it is installed.
+    """
+
+    def __init__(self,
+                 cache_path: str = './data/extraction_cache.db',
+                 workers: Optional[int] = None,
+                 ocr: bool = True,
+                 language: str = 'eng',
+                 dpi: int = 300,
+                 min_text_chars: int = 20,
+                 pages_per_task: int = 4):
+        self.workers = workers or os.cpu_count() or 1
+        self.ocr = ocr
+        self.ocr_available = True
+        self.language = language
+        self.dpi = dpi
+        self.min_text_chars = min_text_chars
+        self.pages_per_task = pages_per_task
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        if cache_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn: the pool is created from worker threads, where fork is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def close(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def _cached(self, content_hash: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT text FROM extracted_text WHERE content_hash = ?', (content_hash,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _store(self, content_hash: str, text: str, pages: int, ocr_pages: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO extracted_text (content_hash, text, pages, ocr_pages, extracted_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (content_hash, text, pages, ocr_pages, datetime.utcnow().isoformat())
+            )
+
+    def extract(self, path: str, content_hash: Optional[str] = None) -> Optional[str]:
+        """Extract text from a file, blocking until all its pages are done"""
+        if content_hash is None:
+            content_hash = file_hash(path)
+        cached = self._cached(content_hash)
+        if cached is not None:
+            return cached
+
+        extension = os.path.splitext(path)[1].lower().lstrip('.')
+        pages, ocr_pages = 1, 0
+        if extension == 'pdf':
+            text, pages, ocr_pages, ocr_missing = self._extract_pdf(path)
+            if ocr_missing:
+                self._ocr_unavailable(f"{ocr_missing} pages of {path} need OCR")
+                return text
+        elif extension in IMAGE_FORMATS:
+            if not self.ocr or not self.ocr_available:
+                return None
+            try:
+                text = self.executor.submit(_extract_image, path, self.language).result()
+            except OCRUnavailable as e:
+                self._ocr_unavailable(str(e))
+                return None
+            ocr_pages = 1
+        else:
+            # Plain text is cheaper to read here than to ship to a worker
+            text = extract_text(path) if extension in ('txt', 'md') \
+                else self.executor.submit(extract_text, path).result()
+            if text is None:
+                return None
+
+        self._store(content_hash, text, pages, ocr_pages)
+        if ocr_pages:
+            logger.info(f"OCRed {ocr_pages} of {pages} pages of {path}")
+        return text
+
+    def _ocr_unavailable(self, reason: str) -> None:
+        if self.ocr_available:
+            logger.warning(f"OCR is unavailable, skipping it until restart ({reason}); "
+                           f"install tesseract to extract scanned pages")
+            self.ocr_available = False
+
+    def _extract_pdf(self, path: str) -> Tuple[str, int, int, int]:
+        """(text, pages, OCRed pages, pages that needed OCR but could not get it)"""
+        count = self.executor.submit(_pdf_page_count, path).result()
+        futures = [
+            self.executor.submit(
+                _extract_pdf_pages, path, start, min(start + self.pages_per_task, count),
+                self.ocr, self.ocr_available, self.min_text_chars, self.dpi, self.language
+            )
+            for start in range(0, count, self.pages_per_task)
+        ]
+        pages = [page for future in futures for page in future.result()]
+        text = '\n\n'.join(page_text for page_text, _ in pages)
+        return (text, count, sum(1 for _, ocred in pages if ocred),
+                sum(1 for _, ocred in pages if ocred is None))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(pages), 0), COALESCE(SUM(ocr_pages), 0) FROM extracted_text'
+            ).fetchone()
+        return {'cached_files': row[0], 'pages': row[1], 'ocr_pages': row[2]}
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+from src.api.cluster import EventBus
+
+
+def test_bus_delivers_events_in_order_off_the_loop(tmp_path):
+    bus = EventBus(str(tmp_path / 'bus.db'), poll_interval=0.01)
+    threads = {}
+    publish = bus.publish
+
+    def recording_publish(event):
+        threads[event['n']] = threading.current_thread().name
+        publish(event)
+
+    bus.publish = recording_publish
+
+    async def run():
+        received = []
+
+        async def handler(event):
+            received.append(event['n'])
+
+        bus.publish({'n': 0})
+        await bus.start(handler)
+        await bus.publish_async({'n': 1})
+        bus.publish_nowait({'n': 2})
+        await bus.publish_async({'n': 3})
+        for _ in range(100):
+            if len(received) == 3:
+                break
+            await asyncio.sleep(0.01)
+        await bus.stop()
+        return received
+
+    assert asyncio.run(run()) == [1, 2, 3]
+    assert all(threads[n].startswith('event-bus') for n in (1, 2, 3))
@@ -0,0 +1,84 @@
+import random
+
+from src.memory.document_index import DocumentIndexer, chunk_text, CHUNKS_COLLECTION
+
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta', 'iota', 'kappa']
+
+
+def paragraphs(count, size, seed=0):
+    rng = random.Random(seed)
+    return [' '.join(rng.choice(WORDS) for _ in range(size))[:size] for _ in range(count)]
+
+
+class FakeMemory:
+    """In-memory stand-in for the collections DocumentIndexer writes to"""
+
+    def __init__(self):
+        self.collections = {}
+
+    def store_documents(self, collection_name, ids, documents, metadatas):
+        self.collections.setdefault(collection_name, {}).update(zip(ids, documents))
+
+    def update_document_metadata(self, collection_name, ids, metadatas):
+        pass
+
+    def delete_documents(self, collection_name, ids):
+        for document_id in ids:
+            self.collections.get(collection_name, {}).pop(document_id, None)
+
+    def existing_document_ids(self, collection_name, ids):
+        return set(ids) & set(self.collections.get(collection_name, {}))
+
+
+def test_chunks_respect_chunk_size():
+    text = '\n\n'.join(paragraphs(50, 300) + ['x' * 2500])
+    assert all(len(chunk) <= 1000 + 2 * 3 for chunk in chunk_text(text, 1000))
+
+
+def test_prepend_keeps_existing_chunks():
+    original = paragraphs(10, 400)
+    before = chunk_text('\n\n'.join(original), 1000)
+    after = chunk_text('\n\n'.join(paragraphs(1, 400, seed=1) + original), 1000)
+    # Only the chunk the new paragraph joins changes
+    assert set(before[1:]) <= set(after)
+
+
+def test_middle_edit_only_changes_nearby_chunks():
+    original = paragraphs(40, 400)
+    edited = list(original)
+    edited[20] = paragraphs(1, 250, seed=2)[0]
+    before = chunk_text('\n\n'.join(original), 1000)
+    after = chunk_text('\n\n'.join(edited), 1000)
+    changed = [chunk for chunk in before if chunk not in after]
+    assert changed and all(original[20] in chunk or original[19] in chunk or original[21] in chunk
+                           for chunk in changed)
+
+
+def test_rescan_embeds_only_changed_chunks(tmp_path):
+    documents = tmp_path / 'documents'
+    documents.mkdir()
+    path = documents / 'notes.txt'
+    original = paragraphs(10, 400)
+    path.write_text('\n\n'.join(original))
+    memory = FakeMemory()
+    indexer = DocumentIndexer(memory, manifest_path=str(tmp_path / 'manifest.db'))
+    first = indexer.scan([str(documents)])
+
+    path.write_text('\n\n'.join(paragraphs(1, 400, seed=1) + original))
+    second = indexer.scan([str(documents)])
+    assert first['chunks_embedded'] > 5
+    assert second['chunks_embedded'] == 1 and second['chunks_deleted'] <= 1
+
+
+def test_missing_embeddings_are_reindexed(tmp_path):
+    documents = tmp_path / 'documents'
+    documents.mkdir()
+    (documents / 'notes.txt').write_text('\n\n'.join(paragraphs(10, 400)))
+    manifest = str(tmp_path / 'manifest.db')
+    DocumentIndexer(FakeMemory(), manifest_path=manifest).scan([str(documents)])
+
+    # A new process whose vector store came up empty
+    memory = FakeMemory()
+    stats = DocumentIndexer(memory, manifest_path=manifest).scan([str(documents)])
+    assert stats['indexed'] == 1
+    assert memory.collections[CHUNKS_COLLECTION]
@@ -0,0 +1,30 @@
+import asyncio
+
+from benchmarks.fakes.imap import FakeIMAPServer, synthetic_mailbox
+from src.integrations.email_integration import EmailIntegration
+from src.integrations.email_store import EmailMetadataStore
+
+
+def test_fetching_leaves_messages_unread(tmp_path):
+    server = FakeIMAPServer().start()
+    try:
+        server.add_messages(synthetic_mailbox(3, threads=2))
+        host, port = server.address
+        email = EmailIntegration(
+            {'server': host, 'port': port, 'use_ssl': False, 'username': 'user', 'password': 'secret',
+             'fetch_chunk_size': 256},
+            store=EmailMetadataStore(str(tmp_path / 'index.db'))
+        )
+
+        async def fetch():
+            assert await email.connect()
+            try:
+                return await email.fetch_emails(limit=10)
+            finally:
+                await email.disconnect()
+
+        emails = asyncio.run(fetch())
+        assert len(emails) == 3 and all(message['body'] for message in emails)
+        assert all('\\Seen' not in message.flags for message in server.mailbox('INBOX').messages)
+    finally:
+        server.stop()
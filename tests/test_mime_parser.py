@@ -0,0 +1,107 @@
+import base64
+import quopri
+import hashlib
+
+import pytest
+
+from src.integrations.mime_parser import StreamingMimeParser, AttachmentStore, decode_header_value
+
+CHUNK_SIZES = [1, 7, 100, 65536]
+
+TEXT = 'Grüße aus München — the budget is attached.\n' * 40
+ATTACHMENT = bytes(range(256)) * 50
+
+
+def quoted_printable(text):
+    return quopri.encodestring(text.encode('utf-8'))
+
+
+def build_message():
+    encoded = base64.encodebytes(ATTACHMENT)
+    return b''.join([
+        b'From: Someone <someone@example.com>\r\n',
+        b'Subject: =?utf-8?q?Gr=C3=BC=C3=9Fe?=\r\n',
+        b' =?utf-8?q?_aus_M=C3=BCnchen?=\r\n',
+        b'MIME-Version: 1.0\r\n',
+        b'Content-Type: multipart/mixed;\r\n',
+        b'\tboundary="outer-boundary"\r\n',
+        b'\r\n',
+        b'This is the preamble.\r\n',
+        b'--outer-boundary\r\n',
+        b'Content-Type: multipart/alternative; boundary="inner-boundary"\r\n',
+        b'\r\n',
+        b'--inner-boundary\r\n',
+        b'Content-Type: text/plain; charset=utf-8\r\n',
+        b'Content-Transfer-Encoding: quoted-printable\r\n',
+        b'\r\n',
+        quoted_printable(TEXT).replace(b'\n', b'\r\n'),
+        b'\r\n--inner-boundary\r\n',
+        b'Content-Type: text/html; charset=utf-8\r\n',
+        b'\r\n',
+        b'<html><head><style>p {}</style></head><body><p>Hello</p><p>World</p></body></html>\r\n',
+        b'--inner-boundary--\r\n',
+        b'--outer-boundary\r\n',
+        b'Content-Type: application/octet-stream\r\n',
+        b'Content-Disposition: attachment; filename="data.bin"\r\n',
+        b'Content-Transfer-Encoding: base64\r\n',
+        b'\r\n',
+        encoded.replace(b'\n', b'\r\n'),
+        b'--outer-boundary--\r\n',
+        b'Epilogue.\r\n',
+    ])
+
+
+def parse(data, chunk_size, store=None):
+    parser = StreamingMimeParser(attachment_store=store)
+    for start in range(0, len(data), chunk_size):
+        parser.feed(data[start:start + chunk_size])
+    return parser.close()
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_folded_headers(chunk_size):
+    result = parse(build_message(), chunk_size)
+    assert decode_header_value(result.headers['subject']) == 'Grüße aus München'
+    assert result.headers.get_boundary() == 'outer-boundary'
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_quoted_printable_body(chunk_size):
+    result = parse(build_message(), chunk_size)
+    # The multibyte characters and soft line breaks survive any split
+    assert result.body == TEXT.replace('\n', '\r\n')
+    assert not result.truncated
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_html_part(chunk_size):
+    assert parse(build_message(), chunk_size).html_text == 'Hello\nWorld'
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_base64_attachment(chunk_size, tmp_path):
+    result = parse(build_message(), chunk_size, AttachmentStore(str(tmp_path)))
+    [attachment] = result.attachments
+    digest = hashlib.sha256(ATTACHMENT).hexdigest()
+    assert attachment['sha256'] == digest
+    assert attachment['size'] == len(ATTACHMENT)
+    assert attachment['filename'] == 'data.bin'
+    with open(attachment['path'], 'rb') as f:
+        assert f.read() == ATTACHMENT
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_boundary_lookalikes_stay_in_the_body(chunk_size):
+    data = (b'Content-Type: multipart/mixed; boundary="b"\r\n\r\n'
+            b'--b\r\nContent-Type: text/plain\r\n\r\n'
+            b'--bogus line\r\n-- b\r\nlast line\r\n--b--\r\n')
+    assert parse(data, chunk_size).body == '--bogus line\r\n-- b\r\nlast line'
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_identical_results_for_every_chunk_size(chunk_size):
+    expected = parse(build_message(), len(build_message()))
+    result = parse(build_message(), chunk_size)
+    assert result.body == expected.body
+    assert result.html_text == expected.html_text
+    assert [a['sha256'] for a in result.attachments] == [a['sha256'] for a in expected.attachments]
@@ -0,0 +1,41 @@
+import asyncio
+
+from src.integrations.nas_events import EventCoalescer, NASEvent
+
+
+def coalesce(*events):
+    delivered = []
+
+    async def callback(*args):
+        delivered.append(args)
+
+    async def run():
+        coalescer = EventCoalescer(callback, window=60.0)
+        await coalescer.start()
+        for event in events:
+            coalescer.submit(event)
+        await coalescer.stop()
+
+    asyncio.run(run())
+    return delivered
+
+
+def test_move_then_delete_removes_the_source():
+    assert coalesce(
+        NASEvent('moved', 'docs/a.txt', 'docs/b.txt'),
+        NASEvent('deleted', 'docs/b.txt')
+    ) == [('deleted', 'docs/a.txt')]
+
+
+def test_move_then_modify_stays_a_move():
+    assert coalesce(
+        NASEvent('moved', 'docs/a.txt', 'docs/b.txt'),
+        NASEvent('modified', 'docs/b.txt')
+    ) == [('moved', 'docs/a.txt', 'docs/b.txt')]
+
+
+def test_create_then_move_is_a_create_at_the_destination():
+    assert coalesce(
+        NASEvent('created', 'docs/a.txt'),
+        NASEvent('moved', 'docs/a.txt', 'docs/b.txt')
+    ) == [('created', 'docs/b.txt')]
@@ -0,0 +1,133 @@
+import os
+import random
+import zlib
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fakes.nas import install_local_smbclient
+
+install_local_smbclient()
+
+from src.integrations import nas_sync  # noqa: E402
+from src.integrations.nas_sync import (  # noqa: E402
+    NASSyncEngine, block_signatures, changed_ranges, compute_delta, literal_ranges
+)
+
+BLOCK = 4096
+
+
+def random_bytes(size, seed=0):
+    return random.Random(seed).randbytes(size)
+
+
+def local_copy_chunks(source_path, target, chunks):
+    """What the server does for FSCTL_SRV_COPYCHUNK_WRITE"""
+    with open(source_path, 'rb') as source:
+        for target_offset, source_offset, length in chunks:
+            source.seek(source_offset)
+            target.seek(target_offset)
+            target.write(source.read(length))
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(nas_sync, 'copy_chunks', local_copy_chunks)
+    share = tmp_path / 'share'
+    share.mkdir()
+    nas = SimpleNamespace(mount_point=str(share), chunk_size=BLOCK * 4)
+    return NASSyncEngine(nas, str(tmp_path / 'manifest.db'), block_size=BLOCK)
+
+
+def delta(old, new):
+    return compute_delta(new, block_signatures(old, BLOCK), BLOCK, len(old))
+
+
+def test_unchanged_data_matches_in_place():
+    data = random_bytes(BLOCK * 10 + 123)
+    matches = delta(data, data)
+    assert all(target == source for target, source, _ in matches)
+    assert sum(length for _, _, length in matches) == len(data)
+    assert changed_ranges(len(data), matches) == []
+
+
+@pytest.mark.parametrize('offset', [0, 1, BLOCK - 1, BLOCK * 3 + 17])
+def test_rolling_checksum_finds_shifted_blocks(offset):
+    old = random_bytes(BLOCK * 10)
+    inserted = random_bytes(1290, seed=1)
+    new = old[:offset] + inserted + old[offset:]
+    matches = delta(old, new)
+    for target, source, length in matches:
+        assert new[target:target + length] == old[source:source + length]
+    literal = sum(length for _, length in literal_ranges(len(new), matches))
+    assert literal <= len(inserted) + BLOCK
+
+
+def test_rolling_checksum_matches_adler32():
+    # A block found only by rolling the checksum byte by byte from offset 0
+    old = random_bytes(BLOCK)
+    new = random_bytes(5, seed=2) + old
+    assert delta(old, new) == [(5, 0, BLOCK)]
+    assert zlib.adler32(new[5:]) == block_signatures(old, BLOCK)[0][0]
+
+
+def test_unrelated_data_is_not_worth_a_delta():
+    assert delta(random_bytes(BLOCK * 10), random_bytes(BLOCK * 10, seed=3)) is None
+
+
+def test_changed_ranges_skip_only_blocks_in_place():
+    matches = [(0, 0, BLOCK), (BLOCK + 10, BLOCK, BLOCK), (BLOCK * 3, BLOCK * 3, BLOCK)]
+    assert changed_ranges(BLOCK * 4, matches) == [(BLOCK, BLOCK * 2)]
+    assert literal_ranges(BLOCK * 4, matches) == [(BLOCK, 10), (BLOCK * 2 + 10, BLOCK - 10)]
+
+
+def test_insertion_sends_only_the_inserted_bytes(engine, tmp_path):
+    old = random_bytes(BLOCK * 20)
+    inserted = random_bytes(1290, seed=4)
+    new = old[:BLOCK * 7 + 100] + inserted + old[BLOCK * 7 + 100:]
+    target = os.path.join(engine.nas.mount_point, 'file.bin')
+
+    assert engine.sync_buffer(old, 'file.bin')['bytes_sent'] == len(old)
+    stats = engine.sync_buffer(new, 'file.bin')
+
+    assert stats['patched'] == 1
+    assert stats['bytes_sent'] <= len(inserted) + BLOCK
+    with open(target, 'rb') as f:
+        assert f.read() == new
+    assert os.listdir(engine.nas.mount_point) == ['file.bin']
+
+
+def test_deletion_sends_almost_nothing(engine):
+    old = random_bytes(BLOCK * 20)
+    new = old[:BLOCK * 5 + 7] + old[BLOCK * 6:]
+    engine.sync_buffer(old, 'file.bin')
+    stats = engine.sync_buffer(new, 'file.bin')
+    assert stats['bytes_sent'] <= BLOCK
+    with open(os.path.join(engine.nas.mount_point, 'file.bin'), 'rb') as f:
+        assert f.read() == new
+
+
+def test_in_place_edit_patches_without_copying(engine, monkeypatch):
+    old = random_bytes(BLOCK * 8)
+    new = old[:BLOCK * 2] + random_bytes(BLOCK, seed=5) + old[BLOCK * 3:]
+    engine.sync_buffer(old, 'file.bin')
+    monkeypatch.setattr(nas_sync, 'copy_chunks', None)
+    stats = engine.sync_buffer(new, 'file.bin')
+    assert stats['bytes_sent'] == BLOCK
+    with open(os.path.join(engine.nas.mount_point, 'file.bin'), 'rb') as f:
+        assert f.read() == new
+
+
+def test_failed_server_side_copy_falls_back_to_patching(engine, monkeypatch):
+    def unsupported(source_path, target, chunks):
+        raise OSError('copy-chunk is not supported')
+
+    old = random_bytes(BLOCK * 6)
+    new = b'prefix' + old
+    engine.sync_buffer(old, 'file.bin')
+    monkeypatch.setattr(nas_sync, 'copy_chunks', unsupported)
+    stats = engine.sync_buffer(new, 'file.bin')
+    assert stats['patched'] == 1
+    with open(os.path.join(engine.nas.mount_point, 'file.bin'), 'rb') as f:
+        assert f.read() == new
+    assert os.listdir(engine.nas.mount_point) == ['file.bin']
@@ -0,0 +1,84 @@
+import time
+import asyncio
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.rag_pipeline import RAGPipeline, ContextItem
+
+
+def message(message_id, subject, body):
+    return {'message_id': message_id, 'subject': subject, 'body': body,
+            'from': 'someone@example.com', 'date': '2026-01-01', 'account': 'inbox'}
+
+
+def test_email_search_ignores_stopwords():
+    messages = [message('1', 'Budget', 'the report is attached'), message('2', 'The', 'what is it')]
+    pipeline = RAGPipeline(None, None, SimpleNamespace(recent_messages=lambda limit: messages))
+    results = pipeline._search_email('what is the budget of the project')
+    assert [item.metadata['message_id'] for item in results] == ['1']
+
+
+def test_scores_are_normalized_per_source():
+    items = RAGPipeline._collect(
+        [[ContextItem('memory', 'a', 0.5), ContextItem('memory', 'b', 0.25)], [ContextItem('email', 'c', 0.2)]],
+        ('memory', 'email')
+    )
+    assert [item.score for item in items] == [1.0, 0.5, 1.0]
+
+
+def test_generation_stops_when_the_consumer_does():
+    produced = []
+
+    class SlowLLM:
+        def stream_response(self, prompt, context):
+            for index in range(100):
+                time.sleep(0.01)
+                produced.append(index)
+                yield str(index)
+
+    async def consume():
+        stream = RAGPipeline(SlowLLM(), None).stream_answer('question', [], {})
+        async for _ in stream:
+            break
+        await stream.aclose()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(consume())
+    assert len(produced) < 10
+
+
+def test_generation_ends_quietly_when_the_loop_closes():
+    produced = []
+    closed = []
+    submitted = []
+
+    class SlowLLM:
+        def stream_response(self, prompt, context):
+            try:
+                for index in range(100):
+                    time.sleep(0.01)
+                    produced.append(index)
+                    yield str(index)
+            finally:
+                closed.append(True)
+
+    class RecordingExecutor(ThreadPoolExecutor):
+        def submit(self, *args, **kwargs):
+            future = super().submit(*args, **kwargs)
+            submitted.append(future)
+            return future
+
+    async def first_token(stream):
+        async for part in stream:
+            return part
+
+    executor = RecordingExecutor(max_workers=1)
+    loop = asyncio.new_event_loop()
+    loop.set_default_executor(executor)
+    stream = RAGPipeline(SlowLLM(), None).stream_answer('question', [], {})
+    assert loop.run_until_complete(first_token(stream)) == '0'
+    # Closed with the producer still running and the stream never closed
+    loop.close()
+    executor.shutdown(wait=True)
+    assert closed and len(produced) < 10
+    assert submitted[0].exception() is None
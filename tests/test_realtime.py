@@ -0,0 +1,88 @@
+import json
+import asyncio
+
+from src.api.main import replay_notifications
+from src.api.notifications import NotificationStore, NotificationBatcher
+from src.api.realtime import ClientConnection, COALESCE, coalesce_key, coalesce_barrier
+
+
+def queued(client):
+    return [json.loads(message) for _, message in client._queue.values()]
+
+
+def nas_event(event, path, dest_path=None):
+    data = {'type': 'nas_event', 'event': event, 'path': path}
+    if dest_path:
+        data['dest_path'] = dest_path
+    return data
+
+
+def publish(client, event):
+    client.enqueue(json.dumps(event), coalesce_key(event), coalesce_barrier(event))
+
+
+def test_replay_fits_the_client_queue():
+    store = NotificationStore(':memory:')
+    for index in range(20):
+        store.append('file', f'title {index}', 'message')
+    client = ClientConnection(None, max_queue=8)
+    client.enqueue(json.dumps({'type': 'live'}))
+
+    asyncio.run(replay_notifications(client, store, 0))
+
+    messages = queued(client)
+    assert client.dropped == 0
+    assert len(messages) == 8
+    replayed = [message['notification']['id'] for message in messages if message['type'] == 'notification']
+    assert replayed == list(range(1, 7))
+    assert messages[-1] == {'type': 'replayed', 'count': 6, 'complete': False, 'last_id': 6}
+
+
+def test_replay_continues_from_last_id():
+    store = NotificationStore(':memory:')
+    for index in range(5):
+        store.append('file', f'title {index}', 'message')
+    client = ClientConnection(None, max_queue=8)
+
+    asyncio.run(replay_notifications(client, store, 3))
+
+    assert queued(client)[-1] == {'type': 'replayed', 'count': 2, 'complete': True, 'last_id': 5}
+
+
+def test_coalesce_only_when_full():
+    client = ClientConnection(None, max_queue=3, policy=COALESCE)
+    publish(client, nas_event('created', 'a'))
+    publish(client, nas_event('created', 'b'))
+    publish(client, nas_event('modified', 'a'))
+    assert [message['event'] for message in queued(client)] == ['created', 'created', 'modified']
+
+    publish(client, nas_event('deleted', 'a'))
+    assert [(message['event'], message['path']) for message in queued(client)] == [
+        ('created', 'a'), ('created', 'b'), ('deleted', 'a')
+    ]
+
+
+def test_moves_are_never_coalesced():
+    client = ClientConnection(None, max_queue=2, policy=COALESCE)
+    publish(client, nas_event('created', 'a'))
+    publish(client, nas_event('moved', 'a', 'b'))
+    publish(client, nas_event('deleted', 'a'))
+    assert [message['event'] for message in queued(client)] == ['moved', 'deleted']
+
+
+def test_batcher_stores_a_digest_off_the_loop():
+    store = NotificationStore(':memory:')
+    delivered = []
+
+    async def deliver(notification):
+        delivered.append(notification)
+
+    async def run():
+        batcher = NotificationBatcher(store, deliver, window=60.0)
+        for index in range(3):
+            batcher.submit({'type': 'nas_event', 'event': 'created', 'path': f'docs/{index}.txt'})
+        await batcher.stop()
+
+    asyncio.run(run())
+    assert [notification['count'] for notification in delivered] == [3]
+    assert store.since(0) == delivered
@@ -0,0 +1,140 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+
+from src.api import response_cache
+from src.api.response_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(response_cache, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+class Upstream:
+    """A fetch that counts its calls and can be held open"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = None
+
+    async def fetch(self):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        return {'version': self.calls}
+
+
+def request(if_none_match=None):
+    headers = [(b'if-none-match', if_none_match.encode())] if if_none_match else []
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': headers})
+
+
+def test_etag_and_not_modified(clock):
+    async def run():
+        cache = ResponseCache(ttls={'feed': 60})
+        entry, _ = await cache.get('feed', (), Upstream().fetch)
+        full = cache.respond(request(), entry, 'miss')
+        assert full.status_code == 200 and full.headers['etag'] == entry.etag
+        assert cache.respond(request(entry.etag), entry, 'hit').status_code == 304
+        assert cache.respond(request(f'"other", W/{entry.etag}'), entry, 'hit').status_code == 304
+        assert cache.respond(request('"other"'), entry, 'hit').status_code == 200
+
+    asyncio.run(run())
+
+
+def test_ttl_expiry(clock):
+    async def run():
+        cache = ResponseCache(ttls={'feed': 60}, stale_while_revalidate=0)
+        upstream = Upstream()
+        assert (await cache.get('feed', (), upstream.fetch))[1] == 'miss'
+        clock.now += 59
+        assert (await cache.get('feed', (), upstream.fetch))[1] == 'hit'
+        clock.now += 2
+        entry, status = await cache.get('feed', (), upstream.fetch)
+        assert status == 'miss' and upstream.calls == 2
+
+    asyncio.run(run())
+
+
+def test_one_refresh_while_serving_stale(clock):
+    async def run():
+        cache = ResponseCache(ttls={'feed': 60}, stale_while_revalidate=300)
+        upstream = Upstream()
+        first, _ = await cache.get('feed', (), upstream.fetch)
+        clock.now += 100
+        upstream.release = asyncio.Event()
+        results = [await cache.get('feed', (), upstream.fetch) for _ in range(5)]
+        assert [status for _, status in results] == ['stale'] * 5
+        assert all(entry is first for entry, _ in results)
+        await asyncio.sleep(0)
+        assert upstream.calls == 2
+
+        upstream.release.set()
+        for _ in range(3):
+            await asyncio.sleep(0)
+        entry, status = await cache.get('feed', (), upstream.fetch)
+        assert status == 'hit' and entry is not first and upstream.calls == 2
+
+    asyncio.run(run())
+
+
+def test_concurrent_misses_share_one_fetch(clock):
+    async def run():
+        cache = ResponseCache(ttls={'feed': 60})
+        upstream = Upstream()
+        upstream.release = asyncio.Event()
+        waiting = [asyncio.create_task(cache.get('feed', (), upstream.fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        results = await asyncio.gather(*waiting)
+        assert upstream.calls == 1
+        assert len({entry.etag for entry, _ in results}) == 1
+
+    asyncio.run(run())
+
+
+def test_invalidation_by_endpoint_and_scope(clock):
+    async def run():
+        cache = ResponseCache(ttls={'nas_files': 60})
+        upstream = Upstream()
+        for path in ('docs', 'docs/reports', 'photos'):
+            await cache.get('nas_files', (path,), upstream.fetch, scope=path)
+        assert cache.invalidate('nas_files', 'docs/reports') == 2
+        assert (await cache.get('nas_files', ('photos',), upstream.fetch, scope='photos'))[1] == 'hit'
+        assert (await cache.get('nas_files', ('docs',), upstream.fetch, scope='docs'))[1] == 'miss'
+
+    asyncio.run(run())
+
+
+def test_invalidation_during_a_fetch_is_served_once_not_kept(clock):
+    async def run():
+        cache = ResponseCache(ttls={'feed': 60})
+        upstream = Upstream()
+        upstream.release = asyncio.Event()
+        pending = asyncio.create_task(cache.get('feed', (), upstream.fetch))
+        await asyncio.sleep(0)
+        cache.invalidate('feed')
+        upstream.release.set()
+        assert (await pending)[1] == 'miss'
+        upstream.release = None
+        assert (await cache.get('feed', (), upstream.fetch))[1] == 'miss'
+        assert upstream.calls == 2
+
+    asyncio.run(run())
+
+
+def test_nas_events_invalidate_the_parent_listing(clock):
+    async def run():
+        cache = ResponseCache(ttls={'nas_files': 60})
+        upstream = Upstream()
+        await cache.get('nas_files', ('docs',), upstream.fetch, scope='docs')
+        cache.invalidate_event({'type': 'nas_event', 'event': 'created', 'path': '/mnt/nas/docs/a.txt'},
+                               nas_root='/mnt/nas')
+        assert (await cache.get('nas_files', ('docs',), upstream.fetch, scope='docs'))[1] == 'miss'
+
+    asyncio.run(run())
@@ -0,0 +1,138 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from src.integrations import social_http
+from src.integrations.social_http import SocialHTTPClient, TokenBucket
+
+
+class FakeClock:
+    """Stands in for time.monotonic and asyncio.sleep in social_http"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(social_http, 'time', SimpleNamespace(
+        monotonic=clock.monotonic, time=social_http.time.time, perf_counter=social_http.time.perf_counter
+    ))
+    monkeypatch.setattr(social_http, 'asyncio', SimpleNamespace(sleep=clock.sleep, Lock=asyncio.Lock))
+    return clock
+
+
+def test_bucket_allows_a_burst_then_waits_for_refill(clock):
+    async def run():
+        bucket = TokenBucket(rate=2.0, capacity=3)
+        for _ in range(3):
+            await bucket.acquire()
+        assert clock.sleeps == []
+        await bucket.acquire()
+        assert clock.sleeps == [pytest.approx(0.5)]
+
+    asyncio.run(run())
+
+
+def test_bucket_refills_at_its_rate_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2.0, capacity=3)
+    bucket.tokens = 0
+    clock.now += 1.0
+    bucket._refill(clock.now)
+    assert bucket.tokens == pytest.approx(2.0)
+    clock.now += 10.0
+    bucket._refill(clock.now)
+    assert bucket.tokens == 3
+
+
+def test_bucket_spreads_the_reported_quota_and_pauses_when_exhausted(clock):
+    async def run():
+        bucket = TokenBucket(rate=10.0, capacity=5)
+        bucket.update(remaining=10, reset_in=20.0)
+        assert bucket.rate == pytest.approx(0.5)
+
+        bucket.update(remaining=0, reset_in=30.0)
+        start = clock.now
+        await bucket.acquire()
+        assert clock.now - start == pytest.approx(30.0)
+
+    asyncio.run(run())
+
+
+def send(clock, method, responses, **kwargs):
+    """Issue one request against scripted responses; returns (result, attempts)"""
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.method)
+        response = responses[min(len(attempts), len(responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def run():
+        client = SocialHTTPClient('http://api.test', max_retries=3, requests_per_second=1000.0, burst=100)
+        await client.client.aclose()
+        client.client = httpx.AsyncClient(base_url='http://api.test', transport=httpx.MockTransport(handler))
+        try:
+            return await client.request(method, '/resource', **kwargs)
+        finally:
+            await client.close()
+
+    try:
+        result = asyncio.run(run())
+    except Exception as e:
+        result = e
+    return result, len(attempts)
+
+
+def ok():
+    return httpx.Response(200, json={'ok': True})
+
+
+def test_get_is_retried_on_5xx(clock):
+    assert send(clock, 'GET', [httpx.Response(503), ok()]) == ({'ok': True}, 2)
+
+
+def test_post_is_not_retried_on_5xx(clock):
+    result, attempts = send(clock, 'POST', [httpx.Response(503), ok()])
+    assert isinstance(result, httpx.HTTPStatusError) and attempts == 1
+
+
+def test_post_marked_idempotent_is_retried_on_5xx(clock):
+    assert send(clock, 'POST', [httpx.Response(502), ok()], idempotent=True) == ({'ok': True}, 2)
+
+
+def test_post_is_retried_on_429_after_retry_after(clock):
+    result = send(clock, 'POST', [httpx.Response(429, headers={'Retry-After': '7'}), ok()])
+    assert result == ({'ok': True}, 2)
+    assert 7.0 in clock.sleeps
+
+
+def test_post_is_retried_when_it_never_reached_the_server(clock):
+    assert send(clock, 'POST', [httpx.ConnectError('refused'), ok()]) == ({'ok': True}, 2)
+
+
+def test_post_is_not_retried_after_a_failure_mid_request(clock):
+    result, attempts = send(clock, 'POST', [httpx.ReadTimeout('slow'), ok()])
+    assert isinstance(result, httpx.ReadTimeout) and attempts == 1
+
+
+def test_get_is_retried_after_a_failure_mid_request(clock):
+    assert send(clock, 'GET', [httpx.ReadTimeout('slow'), ok()]) == ({'ok': True}, 2)
+
+
+def test_retries_stop_after_max_retries(clock):
+    result, attempts = send(clock, 'GET', [httpx.Response(429)])
+    assert isinstance(result, social_http.RateLimitError) and attempts == 4
@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+
+from src.integrations.social_platforms import FacebookPlatform, MastodonPlatform
+
+
+def drain(platform, checkpoint=None, polls=10, page_size=10, max_pages=3):
+    """Poll repeatedly; returns every post ID delivered and the last checkpoint"""
+    async def run():
+        nonlocal checkpoint
+        seen = set()
+        for _ in range(polls):
+            posts, checkpoint = await platform.fetch_since(checkpoint, page_size, max_pages)
+            seen |= {post['id'] for post in posts}
+        return seen, checkpoint
+    return asyncio.run(run())
+
+
+class FakeGraph:
+    """/me/feed over posts with timestamps 1..n, newest first, offset paging"""
+
+    def __init__(self, count):
+        self.timestamps = list(range(1, count + 1))
+
+    def add(self, count):
+        top = self.timestamps[-1]
+        self.timestamps.extend(range(top + 1, top + count + 1))
+
+    async def request(self, method, path, params=None):
+        if path.startswith('http'):
+            query = {key: values[0] for key, values in parse_qs(urlparse(path).query).items()}
+        else:
+            query = dict(params or {})
+        limit, offset = int(query['limit']), int(query.get('offset', 0))
+        since = int(query['since']) if 'since' in query else 0
+        matching = sorted((ts for ts in self.timestamps if ts > since), reverse=True)
+        page = matching[offset:offset + limit]
+        feed = {'data': [{'id': str(ts), 'created_time': datetime.fromtimestamp(ts, timezone.utc)
+                          .strftime('%Y-%m-%dT%H:%M:%S+0000')} for ts in page]}
+        if offset + limit < len(matching):
+            feed['paging'] = {'next': f'https://graph.test/me/feed?limit={limit}&since={since}'
+                                      f'&offset={offset + limit}'}
+        return feed
+
+
+def facebook(graph):
+    platform = FacebookPlatform.__new__(FacebookPlatform)
+    platform.config = {}
+    platform.client = graph
+    return platform
+
+
+def test_facebook_first_poll_reads_one_page():
+    seen, checkpoint = drain(facebook(FakeGraph(100)), polls=1)
+    assert seen == {str(ts) for ts in range(91, 101)}
+    assert checkpoint == '100'
+
+
+def test_facebook_resumes_a_long_backlog():
+    graph = FakeGraph(20)
+    platform = facebook(graph)
+    _, checkpoint = drain(platform, polls=1)
+    graph.add(95)
+    seen, checkpoint = drain(platform, checkpoint)
+    assert seen == {str(ts) for ts in range(21, 116)}
+    assert checkpoint == '115'
+
+
+class FakeMastodon:
+    """/api/v1/timelines/home over statuses 1..n, newest first"""
+
+    def __init__(self, count):
+        self.ids = list(range(1, count + 1))
+
+    async def request(self, method, path, params=None):
+        since_id, max_id = int(params.get('since_id', 0)), params.get('max_id')
+        matching = sorted((i for i in self.ids if i > since_id and (max_id is None or i < int(max_id))),
+                          reverse=True)
+        return [{'id': str(i), 'content': f'<p>status {i}</p>', 'created_at': '2026-01-01T00:00:00Z',
+                 'account': {'acct': 'someone'}} for i in matching[:params['limit']]]
+
+
+def mastodon(server):
+    platform = MastodonPlatform.__new__(MastodonPlatform)
+    platform.config = {}
+    platform.client = server
+    return platform
+
+
+def test_mastodon_resumes_a_long_backlog():
+    server = FakeMastodon(20)
+    platform = mastodon(server)
+    seen, checkpoint = drain(platform, polls=1)
+    assert seen == {str(i) for i in range(11, 21)}
+    server.ids.extend(range(21, 116))
+    seen, checkpoint = drain(platform, checkpoint)
+    assert seen == {str(i) for i in range(21, 116)}
+    assert checkpoint == '115'